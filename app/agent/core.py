@@ -6,7 +6,7 @@ Main PharmacyAIAgent class for processing natural language commands
 import re
 from typing import Dict, List, Any, Optional
 from app.patterns import query_patterns, intent_patterns, entity_mappings
-from app.utils.confirmation_system import ConfirmationSystem
+from app.utils.confirmation_system import confirmation_system
 from app.utils.chatbot_database import ChatbotDatabaseManager
 from app.utils.database import log_activity
 from .handlers import handler_registry
@@ -30,7 +30,7 @@ class PharmacyAIAgent:
         self.clarification_options = query_patterns.get_clarification_options
 
         # Initialize subsystems
-        self.confirmation_system = ConfirmationSystem()
+        self.confirmation_system = confirmation_system
         self.chatbot_db = ChatbotDatabaseManager()
 
         # Legacy patterns for backward compatibility
@@ -4,8 +4,7 @@ Handles user login, logout, and session management
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from app.utils.database import get_users, validate_user, log_activity, get_user_activity_summary, get_departments, update_user, get_user_by_id, unlock_user_account, get_user_by_username
-from werkzeug.security import generate_password_hash
+from app.utils.database import get_users, validate_user, log_activity, get_user_activity_summary, get_departments, update_user, get_user_by_id, unlock_user_account, get_user_by_username, is_password_hash, hash_password
 from app.utils.decorators import login_required
 from app.utils.csrf import csrf_protect
 from app.utils.rate_limiter import login_rate_limit, get_rate_limit_status
@@ -252,9 +251,9 @@ def migrate_passwords():
         for user in users:
             password = user.get('password', '')
             # Check if password is already hashed
-            if password and not password.startswith('pbkdf2:sha256:'):
+            if password and not is_password_hash(password):
                 # Hash the plain text password
-                hashed_password = generate_password_hash(password)
+                hashed_password = hash_password(password)
                 update_user(user['id'], {'password': hashed_password})
                 migrated_count += 1
 
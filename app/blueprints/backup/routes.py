@@ -173,24 +173,30 @@ def restore():
                     metadata = json.loads(metadata_content)
                     flash(f'Backup created on: {metadata.get("backup_date", "Unknown")}', 'info')
 
-                # Extract data files
+                # Restore data files through save_data, so each table is written
+                # in whatever form it is stored (plain, gzip or SQLite)
+                names = set(zipf.namelist())
                 for file_type in DB_FILES.keys():
-                    json_filename = f'{file_type}.json'
-                    if json_filename in zipf.namelist():
-                        # Validate JSON content
-                        content = zipf.read(json_filename)
-                        try:
-                            json.loads(content)  # Validate JSON
-                            # Extract to data directory
-                            zipf.extract(json_filename, DATA_DIR)
-                            # Rename to proper filename
-                            extracted_path = os.path.join(DATA_DIR, json_filename)
-                            target_path = DB_FILES[file_type]
-                            if os.path.exists(extracted_path):
-                                os.replace(extracted_path, target_path)
-                                extracted_files.append(file_type)
-                        except json.JSONDecodeError:
-                            flash(f'Invalid JSON in {json_filename}', 'warning')
+                    json_filename = next(
+                        (name for name in (f'{file_type}.json', f'json/{file_type}.json') if name in names),
+                        None
+                    )
+                    if json_filename is None:
+                        continue
+
+                    try:
+                        data = json.loads(zipf.read(json_filename))
+                    except json.JSONDecodeError:
+                        flash(f'Invalid JSON in {json_filename}', 'warning')
+                        continue
+                    if not isinstance(data, list):
+                        flash(f'Invalid data in {json_filename}', 'warning')
+                        continue
+
+                    if save_data(file_type, data):
+                        extracted_files.append(file_type)
+                    else:
+                        flash(f'Could not restore {file_type}', 'warning')
 
             # Clean up
             os.remove(upload_path)
@@ -6,7 +6,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 import csv
 import io
 from app.utils.decorators import login_required, admin_required
-from app.utils.database import get_departments, save_department, update_department, delete_department, get_users, get_consumption, log_activity, save_department_with_user
+from app.utils.database import get_departments, save_department, update_department, delete_department, get_users, get_consumption, log_activity, save_department_with_user, bulk_operation
 
 departments_bp = Blueprint('departments', __name__)
 
@@ -188,31 +188,26 @@ def bulk_delete():
         deleted_count = 0
         failed_items = []
 
-        for department_id in ids:
-            try:
-                # Check if department has users or consumption
-                has_users = any(user.get('department_id') == department_id for user in users)
-                has_consumption = any(record.get('department_id') == department_id for record in consumption_records)
-
-                if has_users:
-                    failed_items.append(f"Department ID {department_id} has assigned users")
-                    continue
-                if has_consumption:
-                    failed_items.append(f"Department ID {department_id} has consumption records")
-                    continue
-
-                # Skip renumbering during bulk delete (will renumber once at the end)
-                delete_department(department_id, skip_renumber=True)
-                deleted_count += 1
-
-            except Exception as e:
-                failed_items.append(f"Department ID {department_id}: {str(e)}")
-
-        # Renumber once after all deletions are complete
-        if deleted_count > 0:
-            from app.utils.database import renumber_ids, cascade_update_department_references
-            id_mapping = renumber_ids('departments', protect_ids=['01'])
-            cascade_update_department_references(id_mapping)
+        # Renumbering is deferred until the block exits, then done once
+        with bulk_operation():
+            for department_id in ids:
+                try:
+                    # Check if department has users or consumption
+                    has_users = any(user.get('department_id') == department_id for user in users)
+                    has_consumption = any(record.get('department_id') == department_id for record in consumption_records)
+
+                    if has_users:
+                        failed_items.append(f"Department ID {department_id} has assigned users")
+                        continue
+                    if has_consumption:
+                        failed_items.append(f"Department ID {department_id} has consumption records")
+                        continue
+
+                    delete_department(department_id)
+                    deleted_count += 1
+
+                except Exception as e:
+                    failed_items.append(f"Department ID {department_id}: {str(e)}")
 
         # Log the bulk delete activity
         log_activity(
@@ -10,7 +10,7 @@ import re
 from datetime import datetime, timedelta
 from app.utils.decorators import login_required, admin_required
 from app.utils.upload import save_uploaded_photo
-from app.utils.database import get_medicines, save_medicine, update_medicine, delete_medicine, get_suppliers, get_stores, log_activity, migrate_medicine_fields, get_forms
+from app.utils.database import get_medicines, save_medicine, update_medicine, delete_medicine, delete_medicines, get_suppliers, get_stores, log_activity, migrate_medicine_fields, get_forms
 
 
 def convert_date_format(date_str):
@@ -345,32 +345,29 @@ def bulk_delete():
         # Delete each medicine
         deleted_count = 0
         failed_items = []
+        deletable_ids = []
+        stores = get_stores()
 
         for medicine_id in ids:
-            try:
-                # Check if medicine exists in any stores
-                stores = get_stores()
-                has_stock = any(
-                    store.get('medicine_id') == medicine_id and store.get('quantity', 0) > 0
-                    for store in stores
-                )
-
-                if has_stock:
-                    failed_items.append(f"Medicine ID {medicine_id} has stock in stores")
-                    continue
+            # Check if medicine exists in any stores
+            has_stock = any(
+                store.get('medicine_id') == medicine_id and store.get('quantity', 0) > 0
+                for store in stores
+            )
 
-                # Skip renumbering during bulk delete (will renumber once at the end)
-                delete_medicine(medicine_id, skip_renumber=True)
-                deleted_count += 1
+            if has_stock:
+                failed_items.append(f"Medicine ID {medicine_id} has stock in stores")
+                continue
 
-            except Exception as e:
-                failed_items.append(f"Medicine ID {medicine_id}: {str(e)}")
+            deletable_ids.append(medicine_id)
 
-        # Renumber once after all deletions are complete
-        if deleted_count > 0:
-            from app.utils.database import renumber_ids, cascade_update_medicine_references
-            id_mapping = renumber_ids('medicines', protect_ids=[])
-            cascade_update_medicine_references(id_mapping)
+        if deletable_ids:
+            try:
+                # Delete in one pass, then renumber once
+                deleted_count = delete_medicines(deletable_ids)
+
+            except Exception as e:
+                failed_items.append(f"Medicine IDs {', '.join(map(str, deletable_ids))}: {str(e)}")
 
         # Log the bulk delete activity
         log_activity(
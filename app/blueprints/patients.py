@@ -6,7 +6,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 import csv
 import io
 from app.utils.decorators import login_required, admin_required
-from app.utils.database import get_patients, save_patient, update_patient, delete_patient, get_departments, log_activity
+from app.utils.database import get_patients, save_patient, update_patient, delete_patient, delete_patients, get_departments, log_activity
 
 patients_bp = Blueprint('patients', __name__)
 
@@ -184,28 +184,19 @@ def bulk_delete():
 
         # First, count how many consumption records will be deleted
         from app.utils.database import get_consumption
-        consumption_records = get_consumption()
-        for patient_id in ids:
-            deleted_consumption_count += sum(
-                1 for record in consumption_records
-                if record.get('patient_id') == patient_id
-            )
-
-        for patient_id in ids:
-            try:
-                # Delete patient with cascading deletion (will delete consumption records automatically)
-                # Skip renumbering during bulk delete (will renumber once at the end)
-                delete_patient(patient_id, skip_renumber=True, cascade_delete=True)
-                deleted_count += 1
-
-            except Exception as e:
-                failed_items.append(f"Patient ID {patient_id}: {str(e)}")
-
-        # Renumber once after all deletions are complete
-        if deleted_count > 0:
-            from app.utils.database import renumber_ids, cascade_update_patient_references
-            id_mapping = renumber_ids('patients', protect_ids=[])
-            cascade_update_patient_references(id_mapping)
+        patient_ids = set(ids)
+        deleted_consumption_count = sum(
+            1 for record in get_consumption()
+            if record.get('patient_id') in patient_ids
+        )
+
+        try:
+            # Delete all patients with cascading deletion in one pass over each table,
+            # then renumber once
+            deleted_count = delete_patients(ids, cascade_delete=True)
+
+        except Exception as e:
+            failed_items.append(f"Patient IDs {', '.join(map(str, ids))}: {str(e)}")
 
         # Log the bulk delete activity
         log_activity(
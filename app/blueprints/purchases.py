@@ -4,7 +4,7 @@ Purchases Management Blueprint (Admin Only)
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, jsonify, session
 from app.utils.decorators import login_required, admin_required
-from app.utils.database import get_purchases, save_purchase, update_purchase, delete_purchase, log_activity, get_suppliers, get_medicines, update_main_store_inventory
+from app.utils.database import get_purchases, save_purchase, update_purchase, delete_purchase, log_activity, bulk_operation, get_suppliers, get_medicines, update_main_store_inventory
 from datetime import datetime
 
 purchases_bp = Blueprint('purchases', __name__)
@@ -177,26 +177,28 @@ def bulk_delete():
         deleted_count = 0
         failed_items = []
 
-        for purchase_id in ids:
-            try:
-                # Find the purchase to check if inventory adjustment is needed
-                purchase = next((p for p in purchases if p['id'] == purchase_id), None)
-
-                if purchase:
-                    # Handle inventory adjustment if purchase was delivered
-                    if purchase.get('status') == 'delivered':
-                        medicines_data = purchase.get('medicines', [])
-                        try:
-                            update_main_store_inventory(medicines_data, 'subtract')
-                        except Exception as inv_e:
-                            failed_items.append(f"Purchase ID {purchase_id}: Inventory adjustment failed - {str(inv_e)}")
-                            continue
-
-                delete_purchase(purchase_id)
-                deleted_count += 1
-
-            except Exception as e:
-                failed_items.append(f"Purchase ID {purchase_id}: {str(e)}")
+        # Renumbering is deferred until the block exits, then done once
+        with bulk_operation():
+            for purchase_id in ids:
+                try:
+                    # Find the purchase to check if inventory adjustment is needed
+                    purchase = next((p for p in purchases if p['id'] == purchase_id), None)
+
+                    if purchase:
+                        # Handle inventory adjustment if purchase was delivered
+                        if purchase.get('status') == 'delivered':
+                            medicines_data = purchase.get('medicines', [])
+                            try:
+                                update_main_store_inventory(medicines_data, 'subtract')
+                            except Exception as inv_e:
+                                failed_items.append(f"Purchase ID {purchase_id}: Inventory adjustment failed - {str(inv_e)}")
+                                continue
+
+                    delete_purchase(purchase_id)
+                    deleted_count += 1
+
+                except Exception as e:
+                    failed_items.append(f"Purchase ID {purchase_id}: {str(e)}")
 
         # Log the bulk delete activity
         log_activity(
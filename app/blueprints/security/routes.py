@@ -223,10 +223,11 @@ def create_backup():
         with tempfile.TemporaryDirectory() as temp_dir:
             # Create backup ZIP file
             with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as backup_zip:
-                # Add JSON files
-                for data_type, file_path in DB_FILES.items():
-                    if os.path.exists(file_path):
-                        backup_zip.write(file_path, f'json/{data_type}.json')
+                # Add JSON files, read through load_data so gzip and SQLite tables
+                # are backed up as plain JSON
+                for data_type in DB_FILES:
+                    backup_zip.writestr(f'json/{data_type}.json',
+                                        json.dumps(load_data(data_type), indent=2, ensure_ascii=False))
 
                 # Generate and add CSV files
                 csv_files = export_all_data_to_csv(temp_dir)
@@ -10,7 +10,7 @@ from app.utils.decorators import login_required, admin_required
 from app.utils.database import (
     get_medicines, get_patients, get_suppliers, get_departments,
     get_history, get_users, save_data, load_data, log_activity,
-    update_history_record
+    update_history_record, flush_activity
 )
 from flask import jsonify
 
@@ -85,7 +85,8 @@ def clear_history():
             details={'message': 'Activity history cleared by admin'}
         )
 
-        # Clear history
+        # Clear history, including entries still waiting to be written
+        flush_activity()
         save_data('history', [])
         flash('Activity history cleared successfully!', 'success')
 
@@ -107,6 +108,7 @@ def delete_history_records():
             return jsonify({'success': False, 'message': 'No records selected'}), 400
 
         # Load current history
+        flush_activity()
         history = load_data('history')
 
         # Create a list to track which records are being deleted
@@ -5,8 +5,9 @@ Stores Management Blueprint
 from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, jsonify, session
 import csv
 import io
+from collections import Counter
 from app.utils.decorators import login_required, admin_required, restrict_department_user_action
-from app.utils.database import get_stores, update_store, delete_store, log_activity, get_medicines, get_departments, get_store_by_id, delete_department_and_store
+from app.utils.database import get_stores, update_store, delete_store, log_activity, get_medicines, get_departments, get_store_by_id, delete_department_and_store, get_index, bulk_operation
 
 stores_bp = Blueprint('stores', __name__)
 
@@ -30,13 +31,14 @@ def index():
         user_department_id = session.get('department_id')
         stores = [s for s in stores if s.get('department_id') == user_department_id]
 
+    # Sum the shown stores' inventories once, then look up each medicine
+    stock_totals = Counter()
+    for store in stores:
+        stock_totals.update(store.get('inventory', {}))
+
     # Calculate total stock for each medicine (similar to medicines blueprint)
     for medicine in medicines:
-        total_stock = 0
-        for store in stores:
-            inventory = store.get('inventory', {})
-            stock = inventory.get(medicine['id'], 0)
-            total_stock += stock
+        total_stock = stock_totals[medicine['id']]
         medicine['total_stock'] = total_stock
 
         # Calculate stock status
@@ -92,8 +94,9 @@ def edit(store_id):
 def export_inventory():
     """Export inventory data to CSV (allowed for department users)"""
     stores = get_stores()
-    medicines = get_medicines()
-    departments = get_departments()
+    # Read-only id lookups from the cached tables
+    medicines_by_id = get_index('medicines')
+    departments_by_id = get_index('departments')
 
     # Filter stores based on user role
     if session.get('role') != 'admin':
@@ -109,11 +112,11 @@ def export_inventory():
 
     # Write data
     for store in stores:
-        department = next((d for d in departments if d['id'] == store.get('department_id')), None)
+        department = departments_by_id.get(store.get('department_id'))
         department_name = department['name'] if department else 'Unknown'
 
         for medicine_id, stock in store.get('inventory', {}).items():
-            medicine = next((m for m in medicines if m['id'] == medicine_id), None)
+            medicine = medicines_by_id.get(medicine_id)
             if medicine:
                 # Determine status
                 if stock == 0:
@@ -191,18 +194,20 @@ def bulk_delete():
         deleted_count = 0
         failed_items = []
 
-        for store_id in ids:
-            try:
-                # Protect main store (id='01')
-                if store_id == '01':
-                    failed_items.append(f"Main Store (ID 01) cannot be deleted")
-                    continue
+        # Renumbering is deferred until the block exits, then done once
+        with bulk_operation():
+            for store_id in ids:
+                try:
+                    # Protect main store (id='01')
+                    if store_id == '01':
+                        failed_items.append(f"Main Store (ID 01) cannot be deleted")
+                        continue
 
-                delete_store(store_id)
-                deleted_count += 1
+                    delete_store(store_id)
+                    deleted_count += 1
 
-            except Exception as e:
-                failed_items.append(f"Store ID {store_id}: {str(e)}")
+                except Exception as e:
+                    failed_items.append(f"Store ID {store_id}: {str(e)}")
 
         # Log the bulk delete activity
         log_activity(
@@ -6,7 +6,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 import csv
 import io
 from app.utils.decorators import login_required, admin_required
-from app.utils.database import get_suppliers, save_supplier, update_supplier, delete_supplier, get_medicines, log_activity
+from app.utils.database import get_suppliers, save_supplier, update_supplier, delete_supplier, get_medicines, log_activity, bulk_operation
 
 suppliers_bp = Blueprint('suppliers', __name__)
 
@@ -148,31 +148,26 @@ def bulk_delete():
         deleted_count = 0
         failed_items = []
 
-        for supplier_id in ids:
-            try:
-                # Check if supplier has medicines
-                medicines = get_medicines()
-                has_medicines = any(
-                    medicine.get('supplier_id') == supplier_id
-                    for medicine in medicines
-                )
-
-                if has_medicines:
-                    failed_items.append(f"Supplier ID {supplier_id} has associated medicines")
-                    continue
-
-                # Skip renumbering during bulk delete (will renumber once at the end)
-                delete_supplier(supplier_id, skip_renumber=True)
-                deleted_count += 1
-
-            except Exception as e:
-                failed_items.append(f"Supplier ID {supplier_id}: {str(e)}")
-
-        # Renumber once after all deletions are complete
-        if deleted_count > 0:
-            from app.utils.database import renumber_ids, cascade_update_supplier_references
-            id_mapping = renumber_ids('suppliers', protect_ids=[])
-            cascade_update_supplier_references(id_mapping)
+        # Renumbering is deferred until the block exits, then done once
+        with bulk_operation():
+            for supplier_id in ids:
+                try:
+                    # Check if supplier has medicines
+                    medicines = get_medicines()
+                    has_medicines = any(
+                        medicine.get('supplier_id') == supplier_id
+                        for medicine in medicines
+                    )
+
+                    if has_medicines:
+                        failed_items.append(f"Supplier ID {supplier_id} has associated medicines")
+                        continue
+
+                    delete_supplier(supplier_id)
+                    deleted_count += 1
+
+                except Exception as e:
+                    failed_items.append(f"Supplier ID {supplier_id}: {str(e)}")
 
         # Log the bulk delete activity
         log_activity(
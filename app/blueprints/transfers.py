@@ -5,7 +5,7 @@ Handles inventory transfers between stores
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from app.utils.database import (get_transfers, save_transfer, process_inventory_transfer, 
-                           get_stores, get_medicines, log_activity)
+                           get_stores, get_medicines, get_index, log_activity)
 from app.utils.decorators import login_required, admin_required
 
 transfers_bp = Blueprint('transfers', __name__)
@@ -15,20 +15,21 @@ transfers_bp = Blueprint('transfers', __name__)
 def index():
     """Inventory transfers list"""
     transfers = get_transfers()
-    stores = get_stores()
-    medicines = get_medicines()
+    # Read-only id lookups from the cached tables
+    stores_by_id = get_index('stores')
+    medicines_by_id = get_index('medicines')
     
     # Enrich transfer data with store and medicine names
     for transfer in transfers:
         # Add store names
-        source_store = next((s for s in stores if s['id'] == transfer.get('source_store_id')), None)
-        dest_store = next((s for s in stores if s['id'] == transfer.get('destination_store_id')), None)
+        source_store = stores_by_id.get(transfer.get('source_store_id'))
+        dest_store = stores_by_id.get(transfer.get('destination_store_id'))
         transfer['source_store_name'] = source_store['name'] if source_store else 'Unknown'
         transfer['destination_store_name'] = dest_store['name'] if dest_store else 'Unknown'
         
         # Add medicine names to transfer items
         for item in transfer.get('medicines', []):
-            medicine = next((m for m in medicines if m['id'] == item.get('medicine_id')), None)
+            medicine = medicines_by_id.get(item.get('medicine_id'))
             item['medicine_name'] = medicine['name'] if medicine else 'Unknown'
     
     return render_template('transfers/index.html', transfers=transfers)
@@ -130,18 +131,18 @@ def view(transfer_id):
         return redirect(url_for('transfers.index'))
     
     # Enrich with additional data
-    stores = get_stores()
-    medicines = get_medicines()
+    stores_by_id = get_index('stores')
+    medicines_by_id = get_index('medicines')
     
-    source_store = next((s for s in stores if s['id'] == transfer.get('source_store_id')), None)
-    dest_store = next((s for s in stores if s['id'] == transfer.get('destination_store_id')), None)
+    source_store = stores_by_id.get(transfer.get('source_store_id'))
+    dest_store = stores_by_id.get(transfer.get('destination_store_id'))
     
     transfer['source_store_name'] = source_store['name'] if source_store else 'Unknown'
     transfer['destination_store_name'] = dest_store['name'] if dest_store else 'Unknown'
     
     # Add medicine names
     for item in transfer.get('medicines', []):
-        medicine = next((m for m in medicines if m['id'] == item.get('medicine_id')), None)
+        medicine = medicines_by_id.get(item.get('medicine_id'))
         item['medicine_name'] = medicine['name'] if medicine else 'Unknown'
     
     # Log view activity
@@ -5,48 +5,85 @@ Provides clarifying questions and confirmation before executing queries
 
 import json
 import re
+import sys
+import threading
+from collections import Counter
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Dict, List, Optional, Any, Tuple
-from app.patterns import entity_mappings, query_patterns
+from app.patterns import entity_mappings, intent_patterns, query_patterns
+
+# Keywords used to detect which entity types a query mentions
+_ENTITY_KEYWORDS = MappingProxyType({
+    'medicines': ('medicine', 'medication', 'drug', 'pill', 'tablet', 'med'),
+    'patients': ('patient', 'person', 'individual', 'case', 'client'),
+    'suppliers': ('supplier', 'vendor', 'provider', 'company'),
+    'departments': ('department', 'dept', 'division', 'section', 'unit'),
+    'stores': ('store', 'storage', 'warehouse', 'inventory'),
+    'purchases': ('purchase', 'buy', 'order', 'procurement'),
+    'consumption': ('consumption', 'usage', 'use', 'taken', 'consumed'),
+    'transfers': ('transfer', 'move', 'shift', 'relocate')
+})
+
+# Interned (entity_type, keywords) pairs scanned by _count_entity_mentions
+_ENTITY_KEYWORD_ITEMS = tuple(
+    (sys.intern(entity_type), keywords) for entity_type, keywords in _ENTITY_KEYWORDS.items()
+)
+
+
+@lru_cache(maxsize=4)
+def _build_general_question(entity_types: Tuple[str, ...]) -> Tuple[str, Dict[str, str]]:
+    """Build the general question text and options for the given entity types"""
+    response = "I'd be happy to help! What would you like to know about?\n\n"
+    options = {}
+
+    for i, entity_type in enumerate(entity_types, 1):
+        letter = chr(ord('a') + i - 1)
+        options[letter] = entity_type.title()
+        response += f"**({letter})** {entity_type.title()}\n"
+
+    response += f"**({chr(ord('a') + len(entity_types))})** General database overview\n"
+    response += f"**({chr(ord('a') + len(entity_types) + 1)})** Something else\n\n"
+    response += "Please type the letter of your choice (a, b, c, etc.)"
+
+    return response, options
+
 
 class ConfirmationSystem:
     """Interactive confirmation system for chatbot queries"""
-    
+
+    __slots__ = ('pending_confirmations', '_lock')
+
+    entity_keywords = _ENTITY_KEYWORDS
+
     def __init__(self):
         self.pending_confirmations = {}  # Store pending confirmations by user_id
-        self.entity_keywords = {
-            'medicines': ['medicine', 'medication', 'drug', 'pill', 'tablet', 'med'],
-            'patients': ['patient', 'person', 'individual', 'case', 'client'],
-            'suppliers': ['supplier', 'vendor', 'provider', 'company'],
-            'departments': ['department', 'dept', 'division', 'section', 'unit'],
-            'stores': ['store', 'storage', 'warehouse', 'inventory'],
-            'purchases': ['purchase', 'buy', 'order', 'procurement'],
-            'consumption': ['consumption', 'usage', 'use', 'taken', 'consumed'],
-            'transfers': ['transfer', 'move', 'shift', 'relocate']
-        }
+        self._lock = threading.Lock()
     
     def needs_confirmation(self, user_input: str, user_id: str) -> bool:
         """Check if the query needs confirmation/clarification"""
         # Correct spelling first
         corrected_input = entity_mappings.correct_spelling(user_input)
 
+        # Very general queries always need confirmation; check them before
+        # the more expensive entity keyword scan
+        if self._is_general_query(corrected_input):
+            return True
+
         # Check if query is ambiguous
         entity_mentions = self._count_entity_mentions(corrected_input)
+        mention_count = len(entity_mentions)
 
-        # If multiple entities mentioned or query is very general, need confirmation
-        if len(entity_mentions) > 1 or self._is_general_query(corrected_input):
+        # If multiple entities mentioned, need confirmation
+        if mention_count > 1:
             return True
 
         # If single entity but no specific action, need confirmation
-        if len(entity_mentions) == 1:
-            entity_type = list(entity_mentions.keys())[0]
-            if not self._has_specific_action(corrected_input):
-                return True
+        if mention_count == 1:
+            return not self._has_specific_action(corrected_input)
 
         # If no clear entity or action detected, need confirmation
-        if len(entity_mentions) == 0 and not self._has_clear_intent(corrected_input):
-            return True
-
-        return False
+        return not self._has_clear_intent(corrected_input)
     
     def generate_confirmation_question(self, user_input: str, user_id: str) -> Dict[str, Any]:
         """Generate a confirmation question for ambiguous queries"""
@@ -54,18 +91,19 @@ class ConfirmationSystem:
         entity_mentions = self._count_entity_mentions(corrected_input)
 
         # Store the original query for later processing
-        self.pending_confirmations[user_id] = {
-            'original_query': user_input,
-            'corrected_query': corrected_input,
-            'timestamp': json.dumps({'timestamp': str(hash(user_input))})  # Simple timestamp
-        }
+        with self._lock:
+            self.pending_confirmations[user_id] = {
+                'original_query': user_input,
+                'corrected_query': corrected_input,
+                'timestamp': json.dumps({'timestamp': str(hash(user_input))})  # Simple timestamp
+            }
 
         if len(entity_mentions) > 1:
             # Multiple entities mentioned
             return self._generate_multi_entity_question(entity_mentions, user_id)
         elif len(entity_mentions) == 1:
             # Single entity, need action clarification
-            entity_type = list(entity_mentions.keys())[0]
+            entity_type = next(iter(entity_mentions))
             return self._generate_single_entity_question(entity_type, user_id)
         else:
             # No clear entity, ask what they want to know about
@@ -73,10 +111,11 @@ class ConfirmationSystem:
     
     def process_confirmation_response(self, response: str, user_id: str) -> Optional[Dict[str, Any]]:
         """Process the user's confirmation response"""
-        if user_id not in self.pending_confirmations:
+        with self._lock:
+            pending = self.pending_confirmations.get(user_id)
+        if pending is None:
             return None
-        
-        pending = self.pending_confirmations[user_id]
+
         response_lower = response.lower().strip()
         
         # Check if it's a letter choice (a, b, c, etc.)
@@ -92,15 +131,15 @@ class ConfirmationSystem:
     
     def _count_entity_mentions(self, text: str) -> Dict[str, int]:
         """Count mentions of different entity types in the text"""
-        mentions = {}
+        mentions = Counter()
         text_lower = text.lower()
-        
-        for entity_type, keywords in self.entity_keywords.items():
-            count = sum(1 for keyword in keywords if keyword in text_lower)
-            if count > 0:
-                mentions[entity_type] = count
-        
-        return mentions
+
+        for entity_type, keywords in _ENTITY_KEYWORD_ITEMS:
+            for keyword in keywords:
+                if keyword in text_lower:
+                    mentions[entity_type] += 1
+
+        return dict(mentions)
     
     def _is_general_query(self, text: str) -> bool:
         """Check if the query is very general"""
@@ -180,32 +219,21 @@ class ConfirmationSystem:
 
     def _generate_general_question(self, user_id: str) -> Dict[str, Any]:
         """Generate general question when no clear entity is detected"""
-        response = "I'd be happy to help! What would you like to know about?\n\n"
-
-        entity_types = query_patterns.get_all_entity_types()
-        options = {}
-
-        for i, entity_type in enumerate(entity_types, 1):
-            letter = chr(ord('a') + i - 1)
-            options[letter] = entity_type.title()
-            response += f"**({letter})** {entity_type.title()}\n"
-
-        response += f"**({chr(ord('a') + len(entity_types))})** General database overview\n"
-        response += f"**({chr(ord('a') + len(entity_types) + 1)})** Something else\n\n"
-        response += "Please type the letter of your choice (a, b, c, etc.)"
+        entity_types = tuple(query_patterns.get_all_entity_types())
+        response, options = _build_general_question(entity_types)
 
         return {
             'success': True,
             'response': response,
             'awaiting_confirmation': True,
             'confirmation_type': 'general',
-            'options': options
+            'options': dict(options)
         }
     
     def _process_letter_choice(self, choice: str, pending: Dict[str, Any], user_id: str) -> Dict[str, Any]:
         """Process a letter choice response"""
         # Clear the pending confirmation
-        del self.pending_confirmations[user_id]
+        self.clear_pending_confirmation(user_id)
         
         # Return the processed choice for the main agent to handle
         return {
@@ -234,7 +262,7 @@ class ConfirmationSystem:
         corrected_response = entity_mappings.correct_spelling(response)
 
         # Clear the pending confirmation
-        del self.pending_confirmations[user_id]
+        self.clear_pending_confirmation(user_id)
 
         # Return the new query for processing
         return {
@@ -250,8 +278,8 @@ class ConfirmationSystem:
     
     def clear_pending_confirmation(self, user_id: str):
         """Clear pending confirmation for a user"""
-        if user_id in self.pending_confirmations:
-            del self.pending_confirmations[user_id]
+        with self._lock:
+            self.pending_confirmations.pop(user_id, None)
 
 # Global instance
 confirmation_system = ConfirmationSystem()
@@ -18,10 +18,13 @@ CSRF_TOKEN_KEY = 'csrf_token'
 CSRF_TOKEN_HEADER = 'X-CSRF-Token'
 CSRF_FORM_KEY = 'csrf_token'
 
+# HTTP methods that never require CSRF validation
+_SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
 
 def generate_csrf_token():
     """Generate a CSRF token and store it in the session"""
-    token = secrets.token_urlsafe(32)
+    token = secrets.token_hex(32)
     session[CSRF_TOKEN_KEY] = token
     return token
 
@@ -43,8 +46,10 @@ def csrf_protect(f):
     """Decorator to protect endpoints with CSRF validation"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        method = request.method
+
         # Skip CSRF check for GET, HEAD, OPTIONS requests
-        if request.method in ['GET', 'HEAD', 'OPTIONS']:
+        if method in _SAFE_METHODS:
             return f(*args, **kwargs)
 
         # For AJAX requests, check the header
@@ -55,25 +60,22 @@ def csrf_protect(f):
             token = request.form.get(CSRF_FORM_KEY)
 
         # For JSON requests, check the JSON data
-        if not token:
-            try:
-                if request.is_json:
-                    data = request.get_json()
-                    if data:
-                        token = data.get(CSRF_FORM_KEY)
-            except Exception:
-                pass
+        # (parsed body is cached for the view that handles the request)
+        if not token and request.is_json:
+            data = request.get_json(silent=True, cache=True)
+            token = data.get(CSRF_FORM_KEY) if isinstance(data, dict) else None
 
         if not validate_csrf_token(token):
-            logger.warning(f"CSRF validation failed for {request.method} {request.url}")
-            
+            logger.warning("CSRF validation failed for %s %s", method, request.url)
+
             # Log reason for debugging
-            if not token:
-                logger.warning("CSRF failure: No token provided in request")
-            elif not session.get(CSRF_TOKEN_KEY):
-                logger.warning("CSRF failure: No token found in session (session expired or cookie missing)")
-            else:
-                logger.warning("CSRF failure: Token mismatch")
+            if logger.isEnabledFor(logging.DEBUG):
+                if not token:
+                    logger.debug("CSRF failure: No token provided in request")
+                elif not session.get(CSRF_TOKEN_KEY):
+                    logger.debug("CSRF failure: No token found in session (session expired or cookie missing)")
+                else:
+                    logger.debug("CSRF failure: Token mismatch")
 
             if request.is_json or is_ajax_request():
                 return jsonify({
@@ -93,7 +95,7 @@ def csrf_protect(f):
 
 def get_csrf_token():
     """Get or generate a CSRF token for the current session"""
-    return generate_csrf_token()
+    return session.get(CSRF_TOKEN_KEY) or generate_csrf_token()
 
 
 def get_csrf_token_for_ajax():
@@ -108,15 +110,15 @@ def get_csrf_token_for_ajax():
 
 def is_ajax_request():
     """Check if the current request is an AJAX request"""
-    return (request.headers.get('X-Requested-With') == 'XMLHttpRequest' or
-            request.headers.get('Accept', '').startswith('application/json') or
-            request.path.startswith('/api/'))
+    headers = request.headers
+    return (headers.get('X-Requested-With') == 'XMLHttpRequest' or
+            request.path.startswith('/api/') or
+            headers.get('Accept', '').startswith('application/json'))
 
 
 def require_csrf_token():
     """Ensure a CSRF token exists in the session (for JavaScript to retrieve)"""
-    if CSRF_TOKEN_KEY not in session:
-        generate_csrf_token()
+    get_csrf_token()
 
 
 class CSRFError(Exception):
@@ -126,7 +128,7 @@ class CSRFError(Exception):
 
 def handle_csrf_error(error):
     """Error handler for CSRF validation errors"""
-    logger.error(f"CSRF Error: {str(error)}")
+    logger.error("CSRF Error: %s", error)
     if request.is_json or is_ajax_request():
         return jsonify({
             'success': False,
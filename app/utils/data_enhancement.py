@@ -5,19 +5,31 @@ Fills empty fields across all database tables with realistic sample data
 
 import json
 import random
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import cached_property
 from typing import Dict, List
 from app.utils.database import (
     get_medicines, save_data, get_patients, get_suppliers, 
     get_consumption, get_purchases, get_transfers, get_departments
 )
 
+# Module-level generator so the enhancers don't dispatch through the
+# shared random module state on every draw
+_rng = random.Random()
+
+# Characters dropped from supplier names when building website hosts
+_WEBSITE_TRANS = str.maketrans('', '', ' .')
+
+# Note values treated as empty and replaced with generated notes
+_EMPTY_NOTES = frozenset({'', 'N/A'})
+
 class DataEnhancer:
     def __init__(self):
-        self.departments = get_departments()
-        self.medicines = get_medicines()
-        self.patients = get_patients()
-        self.suppliers = get_suppliers()
+        # Tables whose writes are deferred until the end of a transaction()
+        self._dirty_tables = {}
+        self._defer_writes = False
         
         # Medical data for realistic enhancement
         self.batch_prefixes = ['BATCH', 'LOT', 'MFG', 'PRD', 'MED']
@@ -62,101 +74,191 @@ class DataEnhancer:
             "Local medical equipment provider"
         ]
 
+    # Tables are loaded on first use so a single enhancer only reads what it needs
+    @cached_property
+    def departments(self) -> List[Dict]:
+        return get_departments()
+
+    @cached_property
+    def medicines(self) -> List[Dict]:
+        return get_medicines()
+
+    @cached_property
+    def patients(self) -> List[Dict]:
+        return get_patients()
+
+    @cached_property
+    def suppliers(self) -> List[Dict]:
+        return get_suppliers()
+
+    # Id indexes for the per-record lookups in consumption/purchase enhancement
+    @cached_property
+    def patients_by_id(self) -> Dict[str, Dict]:
+        return {p['id']: p for p in self.patients}
+
+    @cached_property
+    def suppliers_by_id(self) -> Dict[str, Dict]:
+        return {s['id']: s for s in self.suppliers}
+
+    def _save_table(self, table: str, records: List[Dict]):
+        """Save a table now, or mark it dirty while inside transaction()"""
+        if self._defer_writes:
+            self._dirty_tables[table] = records
+        else:
+            save_data(table, records)
+
+    def flush(self):
+        """Write every dirty table once"""
+        for table, records in self._dirty_tables.items():
+            save_data(table, records)
+        self._dirty_tables.clear()
+
+    @contextmanager
+    def transaction(self):
+        """Defer all table writes until the block exits, then flush them"""
+        self._defer_writes = True
+        try:
+            yield self
+        finally:
+            self._defer_writes = False
+            self.flush()
+
     def generate_expiry_date(self) -> str:
         """Generate realistic expiry date (6 months to 3 years from now)"""
-        days_ahead = random.randint(180, 1095)  # 6 months to 3 years
-        expiry = datetime.now() + timedelta(days=days_ahead)
-        return expiry.strftime('%Y-%m-%d')
+        days_ahead = _rng.randint(180, 1095)  # 6 months to 3 years
+        return (date.today() + timedelta(days=days_ahead)).isoformat()
 
     def generate_batch_number(self) -> str:
         """Generate realistic batch number"""
-        prefix = random.choice(self.batch_prefixes)
-        number = random.randint(1000, 9999)
-        year = random.choice(['24', '25', '26'])
+        prefix = _rng.choice(self.batch_prefixes)
+        number = _rng.randint(1000, 9999)
+        year = _rng.choice(['24', '25', '26'])
         return f"{prefix}{year}{number}"
 
     def generate_barcode(self) -> str:
         """Generate realistic barcode number"""
-        prefix = random.choice(self.barcode_prefixes)
-        suffix = ''.join([str(random.randint(0, 9)) for _ in range(4)])
+        prefix = _rng.choice(self.barcode_prefixes)
+        suffix = f"{_rng.randrange(10000):04d}"
         return f"{prefix}{suffix}"
 
+    def generate_expiry_dates(self, count: int) -> List[str]:
+        """Generate `count` expiry dates in one batch (6 months to 3 years from now)"""
+        today = date.today()
+        return [(today + timedelta(days=days_ahead)).isoformat()
+                for days_ahead in _rng.choices(range(180, 1096), k=count)]
+
+    def generate_batch_numbers(self, count: int) -> List[str]:
+        """Generate `count` batch numbers in one batch"""
+        prefixes = _rng.choices(self.batch_prefixes, k=count)
+        years = _rng.choices(['24', '25', '26'], k=count)
+        numbers = _rng.choices(range(1000, 10000), k=count)
+        return [f"{prefix}{year}{number}" for prefix, year, number in zip(prefixes, years, numbers)]
+
+    def generate_barcodes(self, count: int) -> List[str]:
+        """Generate `count` barcode numbers in one batch"""
+        prefixes = _rng.choices(self.barcode_prefixes, k=count)
+        suffixes = _rng.choices(range(10000), k=count)
+        return [f"{prefix}{suffix:04d}" for prefix, suffix in zip(prefixes, suffixes)]
+
     def enhance_medicines(self):
         """Fill empty fields in medicines table"""
         print("Enhancing medicines data...")
-        updated_count = 0
-        
-        for medicine in self.medicines:
-            updated = False
-            
-            # Fill expiry_date if null
-            if medicine.get('expiry_date') is None:
-                medicine['expiry_date'] = self.generate_expiry_date()
-                updated = True
-            
-            # Fill batch_number if null
-            if medicine.get('batch_number') is None:
-                medicine['batch_number'] = self.generate_batch_number()
-                updated = True
-            
-            # Fill barcode_number if null
-            if medicine.get('barcode_number') is None:
-                medicine['barcode_number'] = self.generate_barcode()
-                updated = True
-            
-            # Enhance notes if empty or generic
-            if not medicine.get('notes') or medicine.get('notes') in ['', 'N/A']:
-                medicine['notes'] = random.choice(self.medical_notes)
-                updated = True
-            
-            if updated:
-                medicine['updated_at'] = datetime.now().isoformat()
-                updated_count += 1
+
+        # Nothing to do on already-enhanced data; skip the column passes
+        if not any(
+            m.get('expiry_date') is None or m.get('batch_number') is None
+            or m.get('barcode_number') is None
+            or not m.get('notes') or m.get('notes') in _EMPTY_NOTES
+            for m in self.medicines
+        ):
+            return 0
+
+        # One timestamp for the whole batch
+        now_iso = datetime.now().isoformat()
+
+        # Work column by column: find the rows missing each field, then draw
+        # exactly that many values in one batch and write them back
+        medicines = self.medicines
+        updated_rows = set()
+
+        def fill(field, is_empty, generate):
+            rows = [i for i, medicine in enumerate(medicines) if is_empty(medicine.get(field))]
+            for i, value in zip(rows, generate(len(rows))):
+                medicines[i][field] = value
+            updated_rows.update(rows)
+
+        fill('expiry_date', lambda v: v is None, self.generate_expiry_dates)
+        fill('batch_number', lambda v: v is None, self.generate_batch_numbers)
+        fill('barcode_number', lambda v: v is None, self.generate_barcodes)
+        # Enhance notes if empty or generic
+        fill('notes', lambda v: not v or v in _EMPTY_NOTES,
+             lambda k: _rng.choices(self.medical_notes, k=k))
+
+        for i in updated_rows:
+            medicines[i]['updated_at'] = now_iso
+        updated_count = len(updated_rows)
         
         if updated_count > 0:
-            save_data('medicines', self.medicines)
+            self._save_table('medicines', self.medicines)
             print(f"Enhanced {updated_count} medicine records")
         return updated_count
 
     def enhance_patients(self):
         """Fill empty fields in patients table"""
         print("Enhancing patients data...")
+
+        # Nothing to do on already-enhanced data; skip the random draws
+        if all(
+            p.get('department_id') and p.get('notes') and p.get('file_no') and p.get('date_of_entry')
+            for p in self.patients
+        ):
+            return 0
+
         updated_count = 0
-        
-        for patient in self.patients:
+        # One timestamp for the whole batch
+        now = datetime.now()
+        now_iso = now.isoformat()
+        today = now.date()
+
+        # Draw the random values for every row up front instead of per field
+        count = len(self.patients)
+        notes = _rng.choices(self.patient_notes, k=count)
+        file_numbers = _rng.choices(range(1000, 10000), k=count)
+        entry_days_ago = _rng.choices(range(1, 181), k=count)
+
+        for i, patient in enumerate(self.patients):
             updated = False
             
             # Fill department_id if missing
             if not patient.get('department_id'):
                 # Assign random department
-                dept = random.choice(self.departments)
+                dept = _rng.choice(self.departments)
                 patient['department_id'] = dept['id']
                 updated = True
             
             # Fill notes if missing
             if not patient.get('notes'):
-                patient['notes'] = random.choice(self.patient_notes)
+                patient['notes'] = notes[i]
                 updated = True
             
             # Add file_no if missing
             if not patient.get('file_no'):
-                patient['file_no'] = f"P{random.randint(1000, 9999)}"
+                patient['file_no'] = f"P{file_numbers[i]}"
                 updated = True
             
             # Add date_of_entry if missing
             if not patient.get('date_of_entry'):
                 # Random date within last 6 months
-                days_ago = random.randint(1, 180)
-                entry_date = datetime.now() - timedelta(days=days_ago)
-                patient['date_of_entry'] = entry_date.strftime('%Y-%m-%d')
+                days_ago = entry_days_ago[i]
+                patient['date_of_entry'] = (today - timedelta(days=days_ago)).isoformat()
                 updated = True
             
             if updated:
-                patient['updated_at'] = datetime.now().isoformat()
+                patient['updated_at'] = now_iso
                 updated_count += 1
         
         if updated_count > 0:
-            save_data('patients', self.patients)
+            self._save_table('patients', self.patients)
             print(f"Enhanced {updated_count} patient records")
         return updated_count
 
@@ -164,39 +266,41 @@ class DataEnhancer:
         """Fill empty fields in suppliers table"""
         print("Enhancing suppliers data...")
         updated_count = 0
+        # One timestamp for the whole batch
+        now_iso = datetime.now().isoformat()
         
         for supplier in self.suppliers:
             updated = False
             
             # Fill empty notes
             if not supplier.get('notes') or supplier.get('notes') == '':
-                supplier['notes'] = random.choice(self.supplier_notes)
+                supplier['notes'] = _rng.choice(self.supplier_notes)
                 updated = True
             
             # Enhance contact person if generic
             if supplier.get('contact_person', '').startswith('Contact Person'):
                 names = ['John Smith', 'Sarah Johnson', 'Michael Brown', 'Emily Davis', 
                         'David Wilson', 'Lisa Anderson', 'Robert Taylor', 'Jennifer Martinez']
-                supplier['contact_person'] = random.choice(names)
+                supplier['contact_person'] = _rng.choice(names)
                 updated = True
             
             # Add website if missing
             if not supplier.get('website'):
-                company_name = supplier['name'].lower().replace(' ', '').replace('.', '')
+                company_name = supplier['name'].translate(_WEBSITE_TRANS).lower()
                 supplier['website'] = f"www.{company_name}.com"
                 updated = True
             
             # Add tax_id if missing
             if not supplier.get('tax_id'):
-                supplier['tax_id'] = f"TAX{random.randint(100000, 999999)}"
+                supplier['tax_id'] = f"TAX{_rng.randint(100000, 999999)}"
                 updated = True
             
             if updated:
-                supplier['updated_at'] = datetime.now().isoformat()
+                supplier['updated_at'] = now_iso
                 updated_count += 1
         
         if updated_count > 0:
-            save_data('suppliers', self.suppliers)
+            self._save_table('suppliers', self.suppliers)
             print(f"Enhanced {updated_count} supplier records")
         return updated_count
 
@@ -205,6 +309,8 @@ class DataEnhancer:
         print("Enhancing consumption records...")
         consumption_records = get_consumption()
         updated_count = 0
+        # One timestamp for the whole batch
+        now_iso = datetime.now().isoformat()
 
         for record in consumption_records:
             updated = False
@@ -212,12 +318,12 @@ class DataEnhancer:
             # Fill department_id if missing
             if not record.get('department_id'):
                 # Get department from patient if available
-                patient = next((p for p in self.patients if p['id'] == record.get('patient_id')), None)
+                patient = self.patients_by_id.get(record.get('patient_id'))
                 if patient and patient.get('department_id'):
                     record['department_id'] = patient['department_id']
                 else:
                     # Assign random department
-                    dept = random.choice(self.departments)
+                    dept = _rng.choice(self.departments)
                     record['department_id'] = dept['id']
                 updated = True
 
@@ -225,12 +331,12 @@ class DataEnhancer:
             if not record.get('prescribed_by'):
                 doctors = ['Dr. Smith', 'Dr. Johnson', 'Dr. Williams', 'Dr. Brown', 'Dr. Davis',
                           'Dr. Miller', 'Dr. Wilson', 'Dr. Moore', 'Dr. Taylor', 'Dr. Anderson']
-                record['prescribed_by'] = random.choice(doctors)
+                record['prescribed_by'] = _rng.choice(doctors)
                 updated = True
 
             # Fill notes if missing
             if not record.get('notes'):
-                patient = next((p for p in self.patients if p['id'] == record.get('patient_id')), None)
+                patient = self.patients_by_id.get(record.get('patient_id'))
                 if patient:
                     record['notes'] = f"Medication for {patient['name']}"
                 else:
@@ -238,11 +344,11 @@ class DataEnhancer:
                 updated = True
 
             if updated:
-                record['updated_at'] = datetime.now().isoformat()
+                record['updated_at'] = now_iso
                 updated_count += 1
 
         if updated_count > 0:
-            save_data('consumption', consumption_records)
+            self._save_table('consumption', consumption_records)
             print(f"Enhanced {updated_count} consumption records")
         return updated_count
 
@@ -251,6 +357,10 @@ class DataEnhancer:
         print("Enhancing purchase records...")
         purchase_records = get_purchases()
         updated_count = 0
+        # One timestamp for the whole batch
+        now = datetime.now()
+        now_iso = now.isoformat()
+        today = now.date()
 
         for record in purchase_records:
             updated = False
@@ -259,26 +369,25 @@ class DataEnhancer:
             if not record.get('delivery_date') and record.get('purchase_date'):
                 # Delivery usually 1-7 days after purchase
                 try:
-                    purchase_date = datetime.strptime(record['purchase_date'], '%Y-%m-%d')
-                    delivery_days = random.randint(1, 7)
-                    delivery_date = purchase_date + timedelta(days=delivery_days)
-                    record['delivery_date'] = delivery_date.strftime('%Y-%m-%d')
+                    purchase_date = datetime.strptime(record['purchase_date'], '%Y-%m-%d').date()
+                    delivery_days = _rng.randint(1, 7)
+                    record['delivery_date'] = (purchase_date + timedelta(days=delivery_days)).isoformat()
                     updated = True
                 except (ValueError, KeyError):
                     # If purchase_date is invalid, set delivery to recent date
-                    delivery_date = datetime.now() - timedelta(days=random.randint(1, 30))
-                    record['delivery_date'] = delivery_date.strftime('%Y-%m-%d')
+                    delivery_date = today - timedelta(days=_rng.randint(1, 30))
+                    record['delivery_date'] = delivery_date.isoformat()
                     updated = True
 
             # Fill payment_method if missing
             if not record.get('payment_method'):
                 methods = ['Bank Transfer', 'Credit Card', 'Cash', 'Check', 'Net 30']
-                record['payment_method'] = random.choice(methods)
+                record['payment_method'] = _rng.choice(methods)
                 updated = True
 
             # Fill notes if missing
             if not record.get('notes'):
-                supplier = next((s for s in self.suppliers if s['id'] == record.get('supplier_id')), None)
+                supplier = self.suppliers_by_id.get(record.get('supplier_id'))
                 if supplier:
                     record['notes'] = f"Purchase from {supplier['name']}"
                 else:
@@ -288,15 +397,15 @@ class DataEnhancer:
             # Fill received_by if missing
             if not record.get('received_by'):
                 staff = ['John Doe', 'Jane Smith', 'Mike Johnson', 'Sarah Wilson', 'Tom Brown']
-                record['received_by'] = random.choice(staff)
+                record['received_by'] = _rng.choice(staff)
                 updated = True
 
             if updated:
-                record['updated_at'] = datetime.now().isoformat()
+                record['updated_at'] = now_iso
                 updated_count += 1
 
         if updated_count > 0:
-            save_data('purchases', purchase_records)
+            self._save_table('purchases', purchase_records)
             print(f"Enhanced {updated_count} purchase records")
         return updated_count
 
@@ -305,6 +414,10 @@ class DataEnhancer:
         print("Enhancing transfer records...")
         transfer_records = get_transfers()
         updated_count = 0
+        # One timestamp for the whole batch
+        now = datetime.now()
+        now_iso = now.isoformat()
+        today = now.date()
 
         for record in transfer_records:
             updated = False
@@ -312,29 +425,28 @@ class DataEnhancer:
             # Fill transfer_date if missing
             if not record.get('transfer_date'):
                 # Random date within last 30 days
-                days_ago = random.randint(1, 30)
-                transfer_date = datetime.now() - timedelta(days=days_ago)
-                record['transfer_date'] = transfer_date.strftime('%Y-%m-%d')
+                days_ago = _rng.randint(1, 30)
+                record['transfer_date'] = (today - timedelta(days=days_ago)).isoformat()
                 updated = True
 
             # Fill requested_by if missing
             if not record.get('requested_by'):
                 staff = ['Dr. Smith', 'Nurse Johnson', 'Pharmacist Brown', 'Dr. Wilson', 'Nurse Davis']
-                record['requested_by'] = random.choice(staff)
+                record['requested_by'] = _rng.choice(staff)
                 updated = True
 
             # Fill approved_by if missing
             if not record.get('approved_by'):
                 managers = ['Pharmacy Manager', 'Department Head', 'Chief Pharmacist', 'Medical Director']
-                record['approved_by'] = random.choice(managers)
+                record['approved_by'] = _rng.choice(managers)
                 updated = True
 
             if updated:
-                record['updated_at'] = datetime.now().isoformat()
+                record['updated_at'] = now_iso
                 updated_count += 1
 
         if updated_count > 0:
-            save_data('transfers', transfer_records)
+            self._save_table('transfers', transfer_records)
             print(f"Enhanced {updated_count} transfer records")
         return updated_count
 
@@ -342,14 +454,28 @@ class DataEnhancer:
         """Run all data enhancement operations"""
         print("=== Starting Data Enhancement Process ===\n")
 
-        results = {
-            'medicines': self.enhance_medicines(),
-            'patients': self.enhance_patients(),
-            'suppliers': self.enhance_suppliers(),
-            'consumption': self.enhance_consumption_records(),
-            'purchases': self.enhance_purchase_records(),
-            'transfers': self.enhance_transfer_records()
-        }
+        # Each enhancer writes a different table, so they run concurrently.
+        # Consumption and purchase records read patient/supplier fields that
+        # the first wave fills in, so they run in a second wave.
+        waves = [
+            [('medicines', self.enhance_medicines),
+             ('patients', self.enhance_patients),
+             ('suppliers', self.enhance_suppliers)],
+            [('consumption', self.enhance_consumption_records),
+             ('purchases', self.enhance_purchase_records),
+             ('transfers', self.enhance_transfer_records)]
+        ]
+
+        # Load the shared tables up front so threads don't race to load them
+        for shared in ('departments', 'patients', 'suppliers', 'patients_by_id', 'suppliers_by_id'):
+            getattr(self, shared)
+
+        results = {}
+        with self.transaction(), ThreadPoolExecutor(max_workers=3) as executor:
+            for wave in waves:
+                futures = [(table, executor.submit(enhance)) for table, enhance in wave]
+                for table, future in futures:
+                    results[table] = future.result()
 
         print(f"\n=== Data Enhancement Summary ===")
         total_enhanced = sum(results.values())
@@ -25,28 +25,30 @@ from .activity import *
 
 __all__ = [
     # Base utilities
-    'load_data', 'save_data', 'generate_id', 'renumber_ids',
-    'ensure_main_entities', 'init_database',
+    'load_data', 'load_data_cached', 'get_derived', 'get_index', 'get_by_id',
+    'save_data', 'append_data', 'update_record', 'delete_records', 'generate_id', 'renumber_ids',
+    'renumber_after_delete', 'bulk_operation', 'batched_writes',
+    'ensure_main_entities', 'init_database', 'cascade_references',
     'cascade_update_medicine_references', 'cascade_update_patient_references',
     'cascade_update_supplier_references', 'cascade_update_department_references',
     'cascade_update_store_references', 'cascade_update_user_references',
-    'log_history',
+    'append_history', 'log_history',
     # Base constants
     'DB_FILES', 'DATA_DIR',
 
     # User management
     'get_users', 'validate_user', 'save_user', 'update_user', 'delete_user',
     'get_user_by_id', 'get_user_by_username', 'get_users_by_department',
-    'handle_failed_login', 'unlock_user_account', 'validate_password_strength',
-    'generate_username', 'generate_secure_password', 'create_department_user',
-    'delete_department_users',
+    'handle_failed_login', 'unlock_user_account', 'is_password_hash', 'hash_password',
+    'validate_password_strength', 'generate_username', 'generate_secure_password',
+    'create_department_user', 'delete_department_users',
 
     # Medicine management
-    'get_medicines', 'save_medicine', 'update_medicine', 'delete_medicine',
+    'get_medicines', 'save_medicine', 'update_medicine', 'delete_medicine', 'delete_medicines',
     'migrate_medicine_fields',
 
     # Patient management
-    'get_patients', 'save_patient', 'update_patient', 'delete_patient',
+    'get_patients', 'save_patient', 'update_patient', 'delete_patient', 'delete_patients',
 
     # Supplier management
     'get_suppliers', 'save_supplier', 'update_supplier', 'delete_supplier',
@@ -74,7 +76,7 @@ __all__ = [
     'get_medicine_name', 'delete_transfer', 'update_transfer',
 
     # Activity logging
-    'log_activity', 'get_history', 'get_user_activity_summary',
+    'log_activity', 'flush_activity', 'get_history', 'get_user_activity_summary',
 
     # Forms
     'get_forms',
@@ -3,25 +3,42 @@ Activity Logging Module
 Logging and history functions
 """
 
+import atexit
+import heapq
+import os
+import queue
+import threading
+from collections import Counter
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from flask import session
 
-from .base import load_data, save_data, generate_id
+from .base import load_data, save_data, append_history, _file_stamp
+
+# Write activity entries from a background thread instead of the request that
+# logged them, e.g. DB_ASYNC_ACTIVITY=True
+ASYNC_ACTIVITY = os.environ.get('DB_ASYNC_ACTIVITY', 'False') == 'True'
+
+# Entries waiting for the writer thread, and how many are not yet written
+_activity_queue = queue.SimpleQueue()
+_activity_pending = 0
+_activity_written = threading.Condition()
+_activity_writer = None
 
 
 def log_activity(action: str, entity_type: str, entity_id: str = None, details: Dict = None):
     """Log user activity for audit trail"""
     try:
-        history = load_data('history')
+        # Resolve the session proxy once instead of on every field lookup
+        current_session = session._get_current_object()
 
         log_entry = {
-            'id': generate_id('history'),
+            'id': None,
             'timestamp': datetime.now().isoformat(),
-            'user_id': session.get('user_id', 'system'),
-            'username': session.get('username', 'system'),
-            'role': session.get('role', 'system'),
-            'department_id': session.get('department_id'),
+            'user_id': current_session.get('user_id', 'system'),
+            'username': current_session.get('username', 'system'),
+            'role': current_session.get('role', 'system'),
+            'department_id': current_session.get('department_id'),
             'action': action,  # CREATE, UPDATE, DELETE, LOGIN, LOGOUT, VIEW
             'entity_type': entity_type,  # medicine, patient, supplier, etc.
             'entity_id': entity_id,
@@ -30,95 +47,178 @@ def log_activity(action: str, entity_type: str, entity_id: str = None, details:
             'user_agent': 'Flask App'   # Could be enhanced with real user agent
         }
 
-        history.append(log_entry)
-        save_data('history', history)
+        if ASYNC_ACTIVITY:
+            _queue_activity(log_entry)
+        else:
+            append_history(log_entry)
 
     except Exception as e:
         # Don't let logging errors break the main functionality
         print(f"Logging error: {e}")
 
 
+def _queue_activity(log_entry: Dict):
+    """Hand a log entry to the writer thread, starting it on first use"""
+    global _activity_pending, _activity_writer
+
+    with _activity_written:
+        if _activity_writer is None:
+            _activity_writer = threading.Thread(
+                target=_write_queued_activity, name='activity-writer', daemon=True
+            )
+            _activity_writer.start()
+            atexit.register(flush_activity)
+        _activity_pending += 1
+    _activity_queue.put(log_entry)
+
+
+def _write_queued_activity():
+    """Writer thread: append queued entries, taking everything queued at once"""
+    global _activity_pending
+
+    while True:
+        batch = [_activity_queue.get()]
+        try:
+            while True:
+                batch.append(_activity_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        for log_entry in batch:
+            try:
+                append_history(log_entry)
+            except Exception as e:
+                print(f"Logging error: {e}")
+
+        with _activity_written:
+            _activity_pending -= len(batch)
+            _activity_written.notify_all()
+
+
+def flush_activity(timeout: float = 5.0) -> bool:
+    """Wait until queued activity entries are written to the history table
+
+    Returns False if entries are still pending after timeout seconds.
+    """
+    with _activity_written:
+        return _activity_written.wait_for(lambda: _activity_pending == 0, timeout)
+
+
 def get_history(limit: int = 100, user_id: str = None, entity_type: str = None) -> List[Dict]:
     """Get activity history with optional filtering"""
+    flush_activity()
     history = load_data('history')
 
-    # Apply filters
-    if user_id:
-        history = [h for h in history if h.get('user_id') == user_id]
-
-    if entity_type:
-        history = [h for h in history if h.get('entity_type') == entity_type]
+    # Apply filters lazily so no intermediate filtered lists are built
+    if user_id or entity_type:
+        history = (
+            h for h in history
+            if (not user_id or h.get('user_id') == user_id)
+            and (not entity_type or h.get('entity_type') == entity_type)
+        )
 
-    # Sort by timestamp (newest first) and limit
-    history.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-
-    return history[:limit]
+    # Newest first, limited; a bounded heap avoids sorting the whole history
+    return heapq.nlargest(limit, history, key=lambda x: x.get('timestamp', ''))
 
 
 def get_user_activity_summary(user_id: str) -> Dict:
     """Get activity summary for a specific user"""
+    flush_activity()
     history = load_data('history')
-    user_history = [h for h in history if h.get('user_id') == user_id]
-
-    if not user_history:
-        return {
-            'total_actions': 0,
-            'last_login': None,
-            'most_common_action': None,
-            'entities_modified': 0
-        }
 
-    # Count actions
-    action_counts = {}
+    # Count actions in a single pass over the history
+    action_counts = Counter()
     entities = set()
     last_login = None
 
-    for entry in user_history:
+    for entry in history:
+        if entry.get('user_id') != user_id:
+            continue
+
         action = entry.get('action', 'UNKNOWN')
-        action_counts[action] = action_counts.get(action, 0) + 1
+        action_counts[action] += 1
 
-        if entry.get('entity_id'):
-            entities.add(f"{entry.get('entity_type', '')}:{entry.get('entity_id', '')}")
+        entity_id = entry.get('entity_id')
+        if entity_id:
+            entities.add((entry.get('entity_type', ''), entity_id))
 
         if action == 'LOGIN':
             if not last_login or entry.get('timestamp', '') > last_login:
                 last_login = entry.get('timestamp')
 
-    most_common_action = max(action_counts.items(), key=lambda x: x[1])[0] if action_counts else None
+    if not action_counts:
+        return {
+            'total_actions': 0,
+            'last_login': None,
+            'most_common_action': None,
+            'entities_modified': 0
+        }
 
     return {
-        'total_actions': len(user_history),
+        'total_actions': sum(action_counts.values()),
         'last_login': last_login,
-        'most_common_action': most_common_action,
+        'most_common_action': action_counts.most_common(1)[0][0],
         'entities_modified': len(entities),
-        'action_breakdown': action_counts
+        'action_breakdown': dict(action_counts)
     }
 
 
 __all__ = [
-    'log_activity', 'get_history', 'get_user_activity_summary', 'update_history_record'
+    'log_activity', 'flush_activity', 'get_history', 'get_user_activity_summary',
+    'update_history_record'
 ]
 
 
+# Positions of history records by id/timestamp, valid while the file stamp matches
+_history_index = {'stamp': None, 'positions': {}}
+
+
+def _history_positions(history: List[Dict]) -> Dict[str, int]:
+    """Map history ids and timestamps to list positions, rebuilding only on change"""
+    stamp = _file_stamp('history')
+    if stamp is None or stamp != _history_index['stamp']:
+        positions = {}
+        for i, record in enumerate(history):
+            # History IDs might be timestamps or generated IDs
+            # We index both 'id' and 'timestamp' for backward compatibility
+            for key in (record.get('id'), record.get('timestamp')):
+                if key is not None:
+                    positions.setdefault(key, i)
+        _history_index['stamp'] = stamp
+        _history_index['positions'] = positions
+    return _history_index['positions']
+
+
 def update_history_record(record_id: str, new_details: Dict) -> bool:
     """Update details of a history record (e.g. adding notes)"""
     try:
+        flush_activity()
         history = load_data('history')
-        for i, record in enumerate(history):
-            # History IDs might be timestamps or generated IDs
-            # We check both 'id' and 'timestamp' for backward compatibility
-            if record.get('id') == record_id or record.get('timestamp') == record_id:
-                # Merge new details
-                if 'details' not in history[i]:
-                    history[i]['details'] = {}
-                
-                # Update details
-                history[i]['details'].update(new_details)
-                
-                save_data('history', history)
-                return True
-                
-        return False
+        i = _history_positions(history).get(record_id)
+
+        if i is None:
+            return False
+
+        # Rebuild the index if the file changed underneath it
+        if i >= len(history) or record_id not in (history[i].get('id'), history[i].get('timestamp')):
+            _history_index['stamp'] = None
+            i = _history_positions(history).get(record_id)
+            if i is None:
+                return False
+
+        # Merge new details
+        if 'details' not in history[i]:
+            history[i]['details'] = {}
+
+        # Update details
+        history[i]['details'].update(new_details)
+
+        if not save_data('history', history):
+            return False
+
+        # Updating details does not move records, so the index stays valid
+        _history_index['stamp'] = _file_stamp('history')
+        return True
     except Exception as e:
         print(f"Error updating history: {e}")
         return False
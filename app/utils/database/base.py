@@ -3,10 +3,30 @@ Base Repository Module
 Core database utilities and functions
 """
 
+import gzip
 import json
 import os
+import stat
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterable, Optional
+
+from flask import g, has_request_context
+
+from . import sqlite_store
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib encoder/decoder
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: table locks only cover threads of this process
+    fcntl = None
 
 # Database file paths
 DATA_DIR = 'data'
@@ -25,16 +45,61 @@ DB_FILES = {
     'forms': os.path.join(DATA_DIR, 'forms.json')
 }
 
+# Tables stored gzip-compressed as <name>.json.gz, e.g. DB_GZIP_TABLES=stores,purchases
+GZIP_TABLES = frozenset(
+    name.strip() for name in os.environ.get('DB_GZIP_TABLES', '').split(',') if name.strip()
+)
+for _file_type in GZIP_TABLES & DB_FILES.keys():
+    DB_FILES[_file_type] += '.gz'
+
+# Parsed tables shared by read-only callers:
+# file_type -> (file stamp, data, {name: value derived from data})
+_table_cache = {}
+
+# Write tables compactly unless indented files are wanted for hand inspection
+PRETTY_JSON = os.environ.get('DB_PRETTY_JSON', 'False') == 'True'
+
+# Tables kept in SQLite (DATA_DIR/app.db) instead of their JSON file,
+# e.g. DB_SQLITE_TABLES=consumption,history
+SQLITE_TABLES = frozenset(
+    name.strip() for name in os.environ.get('DB_SQLITE_TABLES', '').split(',') if name.strip()
+)
+_sqlite_imported = set()
+
+# Highest numeric id per table: file_type -> (file stamp, max id)
+_max_ids = {}
+
+# Shared worker pool for cascade_references, created on first use
+_cascade_executor = None
+_cascade_executor_lock = threading.Lock()
+
+# Per-thread bulk_operation() nesting depth and tables waiting to be renumbered
+_bulk_state = threading.local()
+
+# Per-thread batched_writes() buffer: file_type -> data held until the block ends
+_batch_state = threading.local()
+
+# Tables batched_writes() never holds: other threads keep appending history
+# entries, and writing back a held copy at the end would drop theirs
+_UNBATCHED_TABLES = frozenset({'history'})
+
+# How much of a file's end append_data reads to find the closing bracket
+_APPEND_TAIL_BYTES = 4096
+
+# Table files each thread holds the exclusive lock for, so nested calls don't wait on it
+_held_locks = threading.local()
+
+# In-process stand-ins for the file locks when fcntl is unavailable: lock path -> Lock
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
 
 def ensure_main_entities():
     """Ensure main department and main store always exist"""
-    # Import here to avoid circular dependencies
-    from .departments import get_departments
-    from .stores import get_stores
-    from . import save_data
+    now = _now_iso()
 
     # Check and create main department if missing
-    departments = get_departments()
+    departments = load_data('departments')
     main_dept_exists = any(dept.get('id') == '01' for dept in departments)
 
     if not main_dept_exists:
@@ -45,14 +110,14 @@ def ensure_main_entities():
             'responsible_person': 'Madam Tina',
             'telephone': '+1234567890',
             'notes': 'Main hospital pharmacy department - System Protected',
-            'created_at': datetime.now().isoformat()
+            'created_at': now
         }
         departments.append(main_department)
         save_data('departments', departments)
         print("Main department recreated")
 
     # Check and create main store if missing
-    stores = get_stores()
+    stores = load_data('stores')
     main_store_exists = any(store.get('id') == '01' for store in stores)
 
     if not main_store_exists:
@@ -63,19 +128,30 @@ def ensure_main_entities():
             'location': 'Main Building, Ground Floor',
             'description': 'Main pharmacy store - System Protected',
             'inventory': {},
-            'created_at': datetime.now().isoformat()
+            'created_at': now
         }
         stores.append(main_store)
         save_data('stores', stores)
         print("Main store recreated")
 
 
-def init_database():
-    """Initialize database with default data"""
+def _main_entity_stamps() -> List[list]:
+    """Stamps of the tables ensure_main_entities checks, in JSON-friendly form"""
+    return [list(_file_stamp(file_type) or ()) for file_type in ('departments', 'stores')]
+
+
+def init_database(force: bool = False):
+    """Initialize database with default data
+
+    The main entity check is skipped while the departments and stores tables
+    are unchanged since it last passed, as recorded in DATA_DIR/.initialized;
+    force=True always runs it.
+    """
     # Create data directory if it doesn't exist
     os.makedirs(DATA_DIR, exist_ok=True)
 
     # Initialize each database file with default data
+    now = _now_iso()
     default_data = {
         'users': [
             {
@@ -86,7 +162,7 @@ def init_database():
                 'name': 'Administrator',
                 'email': 'admin@hospital.com',
                 'department_id': None,
-                'created_at': datetime.now().isoformat()
+                'created_at': now
             },
             {
                 'id': '02',
@@ -96,7 +172,7 @@ def init_database():
                 'name': 'Pharmacy User',
                 'email': 'pharmacy@hospital.com',
                 'department_id': '01',
-                'created_at': datetime.now().isoformat()
+                'created_at': now
             }
         ],
         'medicines': [],
@@ -111,7 +187,7 @@ def init_database():
                 'responsible_person': 'Madam Tina',
                 'telephone': '+1234567890',
                 'notes': 'Main hospital pharmacy department - System Protected',
-                'created_at': datetime.now().isoformat()
+                'created_at': now
             }
         ],
         'stores': [
@@ -122,7 +198,7 @@ def init_database():
                 'location': 'Main Building, Ground Floor',
                 'description': 'Main pharmacy store - System Protected',
                 'inventory': {},  # {medicine_id: quantity}
-                'created_at': datetime.now().isoformat()
+                'created_at': now
             }
         ],
         'purchases': [],
@@ -132,83 +208,604 @@ def init_database():
         'forms': []
     }
 
-    # Create files if they don't exist
+    # Create files if they don't exist; exclusive mode checks and creates in
+    # one open, and never clobbers a file another worker just created
     for file_type, file_path in DB_FILES.items():
-        if not os.path.exists(file_path):
-            with open(file_path, 'w') as f:
-                json.dump(default_data[file_type], f, indent=2)
+        if _is_gzip(file_path) and os.path.exists(file_path[:-3]):
+            continue  # Read from the uncompressed file until the next save
+        try:
+            with open(file_path, 'xb') as f:
+                f.write(_encode_file(file_path, _dumps(default_data[file_type])))
+        except FileExistsError:
+            pass
 
     # Ensure main entities always exist
+    marker = os.path.join(DATA_DIR, '.initialized')
+    if not force:
+        try:
+            with open(marker, 'rb') as f:
+                if _loads(f.read()) == _main_entity_stamps():
+                    return
+        except (OSError, ValueError):
+            pass
+
     ensure_main_entities()
 
+    try:
+        with open(marker, 'wb') as f:
+            f.write(_dumps(_main_entity_stamps()))
+    except OSError:
+        pass
+
+
+def _loads(raw: bytes) -> Any:
+    """Decode JSON table contents"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps(data: Any) -> bytes:
+    """Encode table contents as UTF-8 JSON, compact or 2-space indented per PRETTY_JSON"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if PRETTY_JSON:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if PRETTY_JSON:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+# First bytes of every gzip stream
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _is_gzip(file_path: str) -> bool:
+    """Whether a table file is stored gzip-compressed"""
+    return file_path.endswith('.gz')
+
+
+def _encode_file(file_path: str, payload: bytes) -> bytes:
+    """File contents for encoded JSON, compressed for .gz files
+
+    Level 1 keeps most of the size reduction for very little CPU time.
+    """
+    if _is_gzip(file_path):
+        return gzip.compress(payload, compresslevel=1, mtime=0)
+    return payload
+
+
+def _read_table_file(file_path: str) -> bytes:
+    """Encoded JSON of a table file, decompressing gzip contents
+
+    Compression is detected from the gzip magic bytes rather than the file
+    name, so plain JSON written to a .gz path (or gzip written to a .json
+    path) is still read correctly. A missing .gz file falls back to the
+    uncompressed file it replaces, so a table switched to gzip keeps its
+    data until the next save writes it.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        if not _is_gzip(file_path):
+            raise
+        with open(file_path[:-3], 'rb') as f:
+            raw = f.read()
+
+    if raw[:2] == _GZIP_MAGIC:
+        return gzip.decompress(raw)
+    return raw
+
+
+@contextmanager
+def _file_lock(file_path: str, shared: bool = False):
+    """Lock a table file against writers in other threads and worker processes
+
+    The lock is held on <file>.lock next to the table, because save_data
+    replaces the table file itself. A thread already holding the exclusive
+    lock passes straight through. Shared locks are for readers and are
+    skipped if the lock file cannot be opened, e.g. in a read-only data
+    directory. Without fcntl only threads of this process are excluded,
+    and readers are not locked.
+    """
+    held = getattr(_held_locks, 'paths', None)
+    if held is None:
+        held = _held_locks.paths = set()
+    if file_path in held:
+        yield
+        return
+
+    lock_path = f"{file_path}.lock"
+    if fcntl is None:
+        if shared:
+            yield
+            return
+        with _thread_locks_guard:
+            lock = _thread_locks.setdefault(lock_path, threading.Lock())
+        with lock:
+            held.add(file_path)
+            try:
+                yield
+            finally:
+                held.discard(file_path)
+        return
+
+    try:
+        lock_file = open(lock_path, 'ab')
+    except OSError:
+        if not shared:
+            raise
+        lock_file = None
+
+    if lock_file is None:
+        yield
+        return
+
+    with lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        if shared:
+            yield
+            return
+        held.add(file_path)
+        try:
+            yield
+        finally:
+            held.discard(file_path)
+
+
+def _file_stamp(file_type: str) -> Optional[tuple]:
+    """Return (path, mtime_ns, size) for a table file, or None if it is missing
+
+    Used to tell whether in-process derived state for a table is still valid.
+    Tables kept in SQLite report the database version instead.
+    """
+    db_path = _sqlite_db(file_type)
+    if db_path:
+        return sqlite_store.stamp(db_path)
+
+    file_path = DB_FILES.get(file_type)
+    if not file_path:
+        return None
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        if not _is_gzip(file_path):
+            return None
+        # Not migrated yet: stamp the uncompressed file being read instead
+        file_path = file_path[:-3]
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+    return (file_path, st.st_mtime_ns, st.st_size)
+
+
+def _sqlite_db(file_type: str) -> Optional[str]:
+    """Database path if file_type is kept in SQLite, else None
+
+    The first use of a table copies its JSON file into the database once;
+    from then on the database is the table's only copy.
+    """
+    if file_type not in SQLITE_TABLES:
+        return None
+
+    db_path = os.path.join(DATA_DIR, 'app.db')
+    if (db_path, file_type) not in _sqlite_imported:
+        if not sqlite_store.is_imported(db_path, file_type):
+            sqlite_store.replace(db_path, file_type, _sqlite_rows(_load_json_file(file_type)))
+        _sqlite_imported.add((db_path, file_type))
+    return db_path
+
+
+def _sqlite_rows(records: List[Dict]):
+    """(id, encoded record) pairs as stored by sqlite_store"""
+    return [(record.get('id'), _dumps(record)) for record in records]
+
 
 def load_data(file_type: str) -> List[Dict]:
     """Load data from JSON file"""
+    pending = _pending_writes()
+    if pending and file_type in pending:
+        # A private copy of the held data, as if it had been read back
+        return _loads(_dumps(pending[file_type]))
+
+    db_path = _sqlite_db(file_type)
+    if db_path:
+        return _loads(sqlite_store.load(db_path, file_type))
+    return _load_json_file(file_type)
+
+
+def _load_json_file(file_type: str) -> List[Dict]:
+    """Load a table from its JSON file, or [] if it is missing or not valid JSON
+
+    A corrupt gzip file raises instead of reading as empty, so the next save
+    cannot overwrite the table with nothing.
+    """
     file_path = DB_FILES.get(file_type)
-    if not file_path or not os.path.exists(file_path):
+    if not file_path:
         return []
 
+    # Open directly instead of checking existence first; missing is rare
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        with _file_lock(file_path, shared=True):
+            raw = _read_table_file(file_path)
+        return _loads(raw)
     except (json.JSONDecodeError, FileNotFoundError):
         return []
 
 
+def load_data_cached(file_type: str) -> List[Dict]:
+    """Load a table through an in-process cache, reparsing only when the file changes
+
+    The returned list and its records are shared between callers, so they
+    must be treated as read-only. Use load_data to get a copy to modify
+    and save.
+    """
+    pending = _pending_writes()
+    if pending and file_type in pending:
+        return pending[file_type]
+
+    stamp = _file_stamp(file_type)
+    if stamp is None:
+        return []
+
+    cached = _table_cache.get(file_type)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    data = load_data(file_type)
+    _table_cache[file_type] = (stamp, data, {})
+    return data
+
+
+def get_derived(file_type: str, name: Any, build: Callable[[List[Dict]], Any]) -> Any:
+    """Value computed from a cached table, rebuilt only when the table changes
+
+    build receives the read-only cached records; its result is shared the
+    same way and must not be modified by callers.
+    """
+    data = load_data_cached(file_type)
+    cached = _table_cache.get(file_type)
+    if cached is None or cached[1] is not data:
+        return build(data)
+
+    derived = cached[2]
+    if name not in derived:
+        derived[name] = build(data)
+    return derived[name]
+
+
+def get_index(file_type: str, field: str = 'id') -> Dict[Any, Dict]:
+    """Map field values to records of a cached table, e.g. id -> record
+
+    Built once per table version and shared like load_data_cached, so the
+    records are read-only. When several records share a value, the first
+    one wins, matching a next(...) scan over the list.
+    """
+    def build(data: List[Dict]) -> Dict[Any, Dict]:
+        index = {}
+        for record in data:
+            index.setdefault(record.get(field), record)
+        return index
+
+    return get_derived(file_type, ('index', field), build)
+
+
+def get_by_id(file_type: str, record_id: str) -> Optional[Dict]:
+    """Look up a record by id in a cached table (read-only)"""
+    return get_index(file_type).get(record_id)
+
+
 def save_data(file_type: str, data: List[Dict]):
-    """Save data to JSON file"""
+    """Save data to JSON file
+
+    The data is encoded once and written to a temporary file next to the
+    target in a single write, synced to disk, and moved into place with
+    os.replace, so readers never see a half-written file and a crash
+    leaves either the old or the new table. Tables listed in GZIP_TABLES
+    are compressed first. Tables kept in SQLite are replaced in one
+    transaction instead.
+    """
     file_path = DB_FILES.get(file_type)
     if not file_path:
         return False
 
+    _table_cache.pop(file_type, None)
+    _max_ids.pop(file_type, None)
+
+    pending = _pending_writes()
+    if pending is not None and file_type not in _UNBATCHED_TABLES:
+        pending[file_type] = data
+        return True
+
+    if file_type in SQLITE_TABLES:
+        try:
+            sqlite_store.replace(_sqlite_db(file_type), file_type, _sqlite_rows(data))
+            _max_ids[file_type] = (_file_stamp(file_type), _max_id(data))
+            return True
+        except Exception as e:
+            print(f"Error saving data: {e}")
+            return False
+
     try:
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        payload = _encode_file(file_path, _dumps(data))
+        with _file_lock(file_path):
+            _replace_file(file_path, payload)
+            _max_ids[file_type] = (_file_stamp(file_type), _max_id(data))
         return True
     except Exception as e:
         print(f"Error saving data: {e}")
         return False
 
 
-def generate_id(file_type: str) -> str:
-    """Generate auto-increment ID"""
+def _replace_file(file_path: str, payload: bytes):
+    """Write payload to a temporary file next to file_path and move it into place
+
+    Each call gets its own temporary file, so concurrent saves of the same
+    table never write into or move each other's file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or '.', suffix='.tmp')
+    try:
+        try:
+            f = open(fd, 'wb')
+        except BaseException:
+            os.close(fd)
+            raise
+        with f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file owner-only; keep the permissions of the file it replaces
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _append_json_file(file_path: str, entry: bytes) -> bool:
+    """Write an encoded record in place of the closing bracket of a JSON array
+
+    Returns False when the file is missing, compressed, or does not end
+    with an array.
+    """
+    if _is_gzip(file_path):
+        return False
+
+    if PRETTY_JSON:
+        entry = entry.replace(b'\n', b'\n  ')
+        first_separator, separator, closing = b'\n  ', b',\n  ', b'\n]'
+    else:
+        first_separator, separator, closing = b'', b',', b']'
+
+    try:
+        with open(file_path, 'r+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            tail_start = max(0, size - _APPEND_TAIL_BYTES)
+            f.seek(tail_start)
+            tail = f.read().rstrip()
+            head = tail[:-1].rstrip()
+
+            if tail.endswith(b']') and (head or tail_start == 0):
+                if head.endswith(b'['):
+                    separator = first_separator
+                f.seek(tail_start + len(head))
+                f.write(separator + entry + closing)
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+                return True
+    except FileNotFoundError:
+        pass
+    return False
+
+
+def append_data(file_type: str, record: Dict) -> bool:
+    """Append a single record to a JSON table without rewriting the file
+
+    The record is written in place of the closing bracket of the array, so
+    the cost depends on the record size rather than the table size. Falls
+    back to a full load and save when the file is missing or does not end
+    with a JSON array, but refuses (returns False) if an existing file
+    cannot be parsed. Tables kept in SQLite get a single row insert.
+
+    The table's file lock is held throughout, so appends and saves from
+    other threads and worker processes neither interleave with it nor
+    replace the file underneath it.
+    """
+    file_path = DB_FILES.get(file_type)
+    if not file_path:
+        return False
+
+    pending = _pending_writes()
+    if pending is not None and file_type not in _UNBATCHED_TABLES:
+        if file_type not in pending:
+            pending[file_type] = load_data(file_type)
+        pending[file_type].append(record)
+        return True
+
+    _table_cache.pop(file_type, None)
+    try:
+        with _file_lock(file_path):
+            return _append_locked(file_type, record)
+    except Exception as e:
+        print(f"Error appending data: {e}")
+        return False
+
+
+def _append_locked(file_type: str, record: Dict) -> bool:
+    """Body of append_data, run while holding the table's file lock"""
+    file_path = DB_FILES[file_type]
+    stamp_before = _file_stamp(file_type)
+    cached_max = _max_ids.pop(file_type, None)
+    entry = _dumps(record)
+
+    db_path = _sqlite_db(file_type)
+    if db_path:
+        sqlite_store.append(db_path, file_type, record.get('id'), entry)
+    elif not _append_json_file(file_path, entry):
+        return _append_by_rewrite(file_type, record)
+
+    # Carry the known max id forward if nothing else touched the file
+    if cached_max is not None and cached_max[0] == stamp_before:
+        _max_ids[file_type] = (_file_stamp(file_type), max(cached_max[1], _max_id([record])))
+    return True
+
+
+def _append_by_rewrite(file_type: str, record: Dict) -> bool:
+    """Fallback for append_data: read the whole table, add record and save it
+
+    A missing or empty file starts a new table. A file that exists but is
+    not a JSON array is left alone, since saving would replace every
+    record in it with this one.
+    """
+    file_path = DB_FILES[file_type]
+    try:
+        raw = _read_table_file(file_path)
+        data = _loads(raw) if raw.strip() else []
+    except FileNotFoundError:
+        data = []
+    except Exception as e:
+        print(f"Error appending data: cannot read {file_path}, leaving it unchanged: {e}")
+        return False
+
+    if not isinstance(data, list):
+        print(f"Error appending data: {file_path} is not a JSON array, leaving it unchanged")
+        return False
+
+    data.append(record)
+    return save_data(file_type, data)
+
+
+def update_record(file_type: str, record_id: str, changes: Dict) -> bool:
+    """Merge changes into the record with record_id, keeping its id and stamping updated_at
+
+    Returns False if there is no such record. Tables kept in SQLite rewrite
+    just that row; JSON tables are loaded and saved as a whole.
+    """
+    def merge(record: Dict) -> Dict:
+        record.update(changes)
+        record['id'] = record_id
+        record['updated_at'] = _now_iso()
+        return record
+
+    db_path = _sqlite_db(file_type)
+    if db_path and _pending_writes() is None:
+        _table_cache.pop(file_type, None)
+        _max_ids.pop(file_type, None)
+        return sqlite_store.update(
+            db_path, file_type, record_id, lambda data: _dumps(merge(_loads(data)))
+        )
+
+    data = load_data(file_type)
+    record = next((r for r in data if r.get('id') == record_id), None)
+    if record is None:
+        return False
+    merge(record)
+    return save_data(file_type, data)
+
+
+def delete_records(file_type: str, record_ids: Iterable[str]) -> int:
+    """Delete every record whose id is in record_ids with one load and one save
+
+    Returns the number of records removed; the file is only rewritten if
+    something was removed. Tables kept in SQLite delete just those rows.
+    """
+    record_ids = set(record_ids)
+    db_path = _sqlite_db(file_type)
+    if db_path and _pending_writes() is None:
+        _table_cache.pop(file_type, None)
+        _max_ids.pop(file_type, None)
+        return sqlite_store.delete(db_path, file_type, list(record_ids))
+
     data = load_data(file_type)
-    if not data:
-        return '01'
+    positions = [i for i, record in enumerate(data) if record.get('id') in record_ids]
+
+    # Remove from the back so earlier positions stay valid
+    for position in reversed(positions):
+        del data[position]
+
+    if positions:
+        save_data(file_type, data)
+    return len(positions)
 
-    # Find the highest ID and increment
+
+def _max_id(records: Iterable[Dict]) -> int:
+    """Highest numeric id among records, ignoring ids that are not numbers"""
     max_id = 0
-    for item in data:
+    for item in records:
         try:
-            current_id = int(item.get('id', '0'))
-            max_id = max(max_id, current_id)
-        except ValueError:
+            max_id = max(max_id, int(item.get('id', '0')))
+        except (TypeError, ValueError):
             continue
+    return max_id
+
+
+def generate_id(file_type: str) -> str:
+    """Generate auto-increment ID
 
+    The highest id is remembered per table and only rescanned when the file
+    changed outside save_data/append_data, which keep it up to date.
+    """
+    pending = _pending_writes()
+    if pending and file_type in pending:
+        return f"{_max_id(pending[file_type]) + 1:02d}"
+
+    stamp = _file_stamp(file_type)
+    cached = _max_ids.get(file_type)
+    if stamp is not None and cached is not None and cached[0] == stamp:
+        return f"{cached[1] + 1:02d}"
+
+    max_id = _max_id(load_data(file_type))
+    if stamp is not None:
+        _max_ids[file_type] = (stamp, max_id)
     return f"{max_id + 1:02d}"
 
 
-def renumber_ids(file_type: str, protect_ids: List[str] = None) -> Dict[str, str]:
+def _now_iso() -> str:
+    """Current time as an ISO string, shared by all records written in one request"""
+    if not has_request_context():
+        return datetime.now().isoformat()
+
+    now = getattr(g, '_now_iso', None)
+    if now is None:
+        now = g._now_iso = datetime.now().isoformat()
+    return now
+
+
+def renumber_ids(file_type: str, protect_ids: List[str] = None,
+                 data: Optional[List[Dict]] = None) -> Dict[str, str]:
     """
     Renumber IDs sequentially after deletion to maintain 1, 2, 3, 4... sequence.
 
     Args:
         file_type: Type of data file (e.g., 'medicines', 'patients')
         protect_ids: List of IDs that should not be renumbered (e.g., ['01'] for main entities)
+        data: The table as already loaded and changed by the caller; it is
+            renumbered in place and always saved, instead of loading the file
 
     Returns:
         Dictionary mapping old_id -> new_id for cascade updates
     """
-    if protect_ids is None:
-        protect_ids = []
+    # Set membership for the per-record protected-id checks below
+    protect_ids = set(protect_ids or ())
 
-    data = load_data(file_type)
-    if not data:
-        return {}
+    supplied = data is not None
+    if not supplied:
+        data = load_data(file_type)
 
     # Create mapping of old IDs to new IDs
     id_mapping = {}
     new_id_counter = 1
+    changed = False
 
     # Sort data by existing ID to maintain some order
     sorted_data = sorted(data, key=lambda x: int(x.get('id', '0')))
@@ -230,202 +827,276 @@ def renumber_ids(file_type: str, protect_ids: List[str] = None) -> Dict[str, str
             new_id = f"{new_id_counter:02d}"
 
         id_mapping[old_id] = new_id
-        item['id'] = new_id
+        if new_id != old_id:
+            item['id'] = new_id
+            changed = True
         new_id_counter += 1
 
-    # Save renumbered data
-    save_data(file_type, data)
+    # Save renumbered data, unless every record kept its id and the file is current
+    if changed or supplied:
+        save_data(file_type, data)
 
     return id_mapping
 
 
-def cascade_update_supplier_references(id_mapping: Dict[str, str]):
-    """Update supplier_id references in medicines after supplier ID renumbering"""
-    if not id_mapping:
-        return
+def renumber_after_delete(file_type: str, protect_ids: List[str] = None,
+                          cascade: Optional[Callable[[Dict[str, str]], None]] = None,
+                          data: Optional[List[Dict]] = None):
+    """Renumber a table after a deletion and update references to it
 
-    from .medicines import get_medicines
-    medicines = get_medicines()
-    updated = False
+    Callers that removed records from a loaded table can pass it as data to
+    have it renumbered and saved in one write. Inside bulk_operation() the
+    work is deferred and done once per table when the outermost block exits.
+    """
+    if getattr(_bulk_state, 'depth', 0):
+        if data is not None:
+            save_data(file_type, data)
+        _bulk_state.pending[file_type] = (protect_ids, cascade)
+        return
 
-    for medicine in medicines:
-        old_supplier_id = medicine.get('supplier_id')
-        if old_supplier_id and old_supplier_id in id_mapping:
-            medicine['supplier_id'] = id_mapping[old_supplier_id]
-            updated = True
+    id_mapping = renumber_ids(file_type, protect_ids=protect_ids, data=data)
+    if cascade is not None:
+        cascade(id_mapping)
 
-    if updated:
-        save_data('medicines', medicines)
 
+@contextmanager
+def bulk_operation():
+    """Defer renumbering for deletes made inside the block to a single pass on exit
 
-def cascade_update_department_references(id_mapping: Dict[str, str]):
-    """Update department_id references after department ID renumbering"""
-    if not id_mapping:
+    Usage:
+        with bulk_operation():
+            for supplier_id in ids:
+                delete_supplier(supplier_id)
+    """
+    depth = getattr(_bulk_state, 'depth', 0)
+    if depth == 0:
+        _bulk_state.pending = {}
+    _bulk_state.depth = depth + 1
+    try:
+        yield
+    finally:
+        _bulk_state.depth = depth
+        if depth == 0:
+            pending, _bulk_state.pending = _bulk_state.pending, {}
+            for file_type, (protect_ids, cascade) in pending.items():
+                renumber_after_delete(file_type, protect_ids, cascade)
+
+
+def _pending_writes() -> Optional[Dict[str, List[Dict]]]:
+    """Tables held by this thread's batched_writes() block, or None outside one"""
+    return getattr(_batch_state, 'pending', None)
+
+
+@contextmanager
+def batched_writes():
+    """Hold save_data writes made inside the block and write each table once on exit
+
+    Reads inside the block see the held data, so an operation that saves
+    the same table several times (e.g. delete, then renumber) only writes
+    it at the end, and the tables are written in parallel since they are
+    separate files. If the block raises, the held writes are dropped and
+    those tables are left as they were; history entries are not held and
+    stay written. Raises OSError if any held table fails to save. Nested
+    blocks join the outer one.
+
+    Usage:
+        with batched_writes():
+            save_data('stores', stores)
+            renumber_after_delete('stores', protect_ids=['01'])
+    """
+    if _pending_writes() is not None:
+        yield
         return
 
-    from .users import get_users
-    from .stores import get_stores
-    from .patients import get_patients
-    from .consumption import get_consumption
-
-    # Update users
-    users = get_users()
-    for user in users:
-        old_dept_id = user.get('department_id')
-        if old_dept_id and old_dept_id in id_mapping:
-            user['department_id'] = id_mapping[old_dept_id]
-    save_data('users', users)
-
-    # Update stores
-    stores = get_stores()
-    for store in stores:
-        old_dept_id = store.get('department_id')
-        if old_dept_id and old_dept_id in id_mapping:
-            store['department_id'] = id_mapping[old_dept_id]
-    save_data('stores', stores)
-
-    # Update patients
-    patients = get_patients()
-    for patient in patients:
-        old_dept_id = patient.get('department_id')
-        if old_dept_id and old_dept_id in id_mapping:
-            patient['department_id'] = id_mapping[old_dept_id]
-    save_data('patients', patients)
-
-    # Update consumption records
-    consumption = get_consumption()
-    for record in consumption:
-        old_dept_id = record.get('department_id')
-        if old_dept_id and old_dept_id in id_mapping:
-            record['department_id'] = id_mapping[old_dept_id]
-    save_data('consumption', consumption)
+    _batch_state.pending = {}
+    try:
+        yield
+        pending = _batch_state.pending
+    finally:
+        _batch_state.pending = None
+
+    if len(pending) == 1:
+        saved = {file_type: save_data(file_type, data) for file_type, data in pending.items()}
+    else:
+        futures = {
+            file_type: _cascade_pool().submit(save_data, file_type, data)
+            for file_type, data in pending.items()
+        }
+        saved = {file_type: future.result() for file_type, future in futures.items()}
 
+    failed = [file_type for file_type, ok in saved.items() if not ok]
+    if failed:
+        raise OSError(f"Failed to write batched tables: {', '.join(failed)}")
 
-def cascade_update_medicine_references(id_mapping: Dict[str, str]):
-    """Update medicine_id references after medicine ID renumbering"""
-    if not id_mapping:
-        return
 
-    from .stores import get_stores
-    from .purchases import get_purchases
-    from .consumption import get_consumption
-    from .transfers import get_transfers
-
-    # Update store inventories (keys are medicine IDs)
-    stores = get_stores()
-    for store in stores:
-        if 'inventory' in store and store['inventory']:
-            new_inventory = {}
-            for old_med_id, quantity in store['inventory'].items():
-                new_med_id = id_mapping.get(old_med_id, old_med_id)
-                new_inventory[new_med_id] = quantity
-            store['inventory'] = new_inventory
-    save_data('stores', stores)
-
-    # Update purchases
-    purchases = get_purchases()
-    for purchase in purchases:
-        if 'medicines' in purchase:
-            for medicine_item in purchase['medicines']:
-                old_med_id = medicine_item.get('medicine_id')
-                if old_med_id and old_med_id in id_mapping:
-                    medicine_item['medicine_id'] = id_mapping[old_med_id]
-    save_data('purchases', purchases)
-
-    # Update consumption
-    consumption = get_consumption()
-    for record in consumption:
-        if 'medicines' in record:
-            for medicine_item in record['medicines']:
-                old_med_id = medicine_item.get('medicine_id')
-                if old_med_id and old_med_id in id_mapping:
-                    medicine_item['medicine_id'] = id_mapping[old_med_id]
-    save_data('consumption', consumption)
-
-    # Update transfers
-    transfers = get_transfers()
-    for transfer in transfers:
-        if 'medicines' in transfer:
-            for medicine_item in transfer['medicines']:
-                old_med_id = medicine_item.get('medicine_id')
-                if old_med_id and old_med_id in id_mapping:
-                    medicine_item['medicine_id'] = id_mapping[old_med_id]
-    save_data('transfers', transfers)
+def _changed_ids(id_mapping: Dict[str, str]) -> Dict[str, str]:
+    """Drop entries that keep their id (e.g. protected ids) from a renumber mapping"""
+    return {old_id: new_id for old_id, new_id in id_mapping.items() if old_id != new_id}
 
 
-def cascade_update_patient_references(id_mapping: Dict[str, str]):
-    """Update patient_id references after patient ID renumbering"""
-    if not id_mapping:
-        return
+def _remap_field(field: str, only_if: tuple = None) -> Callable[[Dict, Dict[str, str]], bool]:
+    """Remapper for a reference stored directly on the record
+
+    only_if is an optional (field, value) pair the record must match.
+    """
+    def remap(record: Dict, id_mapping: Dict[str, str]) -> bool:
+        if only_if and record.get(only_if[0]) != only_if[1]:
+            return False
+        old_id = record.get(field)
+        if old_id and old_id in id_mapping:
+            record[field] = id_mapping[old_id]
+            return True
+        return False
+    return remap
 
-    from .consumption import get_consumption
-    consumption = get_consumption()
+
+def _remap_line_field(lines: str, field: str) -> Callable[[Dict, Dict[str, str]], bool]:
+    """Remapper for a reference stored on each item of a list on the record"""
+    remap_item = _remap_field(field)
+
+    def remap(record: Dict, id_mapping: Dict[str, str]) -> bool:
+        updated = False
+        for item in record.get(lines) or ():
+            updated = remap_item(item, id_mapping) or updated
+        return updated
+    return remap
+
+
+def _remap_inventory_keys(record: Dict, id_mapping: Dict[str, str]) -> bool:
+    """Remapper for store inventories, whose keys are medicine IDs"""
+    inventory = record.get('inventory')
+    # Key-view set test runs in C and skips stores with no renumbered medicine
+    if inventory and not inventory.keys().isdisjoint(id_mapping):
+        record['inventory'] = {
+            id_mapping.get(old_med_id, old_med_id): quantity
+            for old_med_id, quantity in inventory.items()
+        }
+        return True
+    return False
+
+
+# Where each table's IDs are referenced: source table -> {target table: remappers}
+CASCADE_PLAN = {
+    'suppliers': {
+        'medicines': (_remap_field('supplier_id'),),
+    },
+    'departments': {
+        'users': (_remap_field('department_id'),),
+        'stores': (_remap_field('department_id'),),
+        'patients': (_remap_field('department_id'),),
+        'consumption': (_remap_field('department_id'),),
+    },
+    'medicines': {
+        'stores': (_remap_inventory_keys,),
+        'purchases': (_remap_line_field('medicines', 'medicine_id'),),
+        'consumption': (_remap_line_field('medicines', 'medicine_id'),),
+        'transfers': (_remap_line_field('medicines', 'medicine_id'),),
+    },
+    'patients': {
+        'consumption': (_remap_field('patient_id'),),
+    },
+    'stores': {
+        'transfers': (_remap_field('source_store_id'), _remap_field('destination_store_id')),
+    },
+    'users': {
+        'history': (_remap_field('user_id'), _remap_field('entity_id', only_if=('entity_type', 'user'))),
+    },
+}
+
+
+def _cascade_pool() -> ThreadPoolExecutor:
+    """Worker pool shared by all cascades, so threads are started only once"""
+    global _cascade_executor
+    with _cascade_executor_lock:
+        if _cascade_executor is None:
+            _cascade_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cascade')
+        return _cascade_executor
+
+
+def _cascade_table(target_table: str, remappers: tuple, id_mapping: Dict[str, str]):
+    """Apply remappers to every record of one referencing table, saving if changed"""
+    records = load_data(target_table)
     updated = False
 
-    for record in consumption:
-        old_patient_id = record.get('patient_id')
-        if old_patient_id and old_patient_id in id_mapping:
-            record['patient_id'] = id_mapping[old_patient_id]
-            updated = True
+    for record in records:
+        for remap in remappers:
+            updated = remap(record, id_mapping) or updated
 
     if updated:
-        save_data('consumption', consumption)
+        save_data(target_table, records)
 
 
-def cascade_update_store_references(id_mapping: Dict[str, str]):
-    """Update store_id references after store ID renumbering"""
+def cascade_references(source_table: str, id_mapping: Dict[str, str]):
+    """Update references to source_table after its IDs were renumbered
+
+    Walks CASCADE_PLAN with one pass per referencing table, and only
+    writes back tables in which a reference changed. The referencing
+    tables are independent files, so they are updated concurrently.
+    """
+    id_mapping = _changed_ids(id_mapping)
     if not id_mapping:
         return
 
-    from .transfers import get_transfers
-    transfers = get_transfers()
-    updated = False
+    targets = CASCADE_PLAN[source_table]
+    if len(targets) == 1 or _pending_writes() is not None:
+        # Held batched writes are per thread, so a batch cascades inline
+        for target_table, remappers in targets.items():
+            _cascade_table(target_table, remappers, id_mapping)
+        return
 
-    for transfer in transfers:
-        old_source_id = transfer.get('source_store_id')
-        if old_source_id and old_source_id in id_mapping:
-            transfer['source_store_id'] = id_mapping[old_source_id]
-            updated = True
+    futures = [
+        _cascade_pool().submit(_cascade_table, target_table, remappers, id_mapping)
+        for target_table, remappers in targets.items()
+    ]
+    for future in futures:
+        future.result()
 
-        old_dest_id = transfer.get('destination_store_id')
-        if old_dest_id and old_dest_id in id_mapping:
-            transfer['destination_store_id'] = id_mapping[old_dest_id]
-            updated = True
 
-    if updated:
-        save_data('transfers', transfers)
+def cascade_update_supplier_references(id_mapping: Dict[str, str]):
+    """Update supplier_id references in medicines after supplier ID renumbering"""
+    cascade_references('suppliers', id_mapping)
+
+
+def cascade_update_department_references(id_mapping: Dict[str, str]):
+    """Update department_id references after department ID renumbering"""
+    cascade_references('departments', id_mapping)
+
+
+def cascade_update_medicine_references(id_mapping: Dict[str, str]):
+    """Update medicine_id references after medicine ID renumbering"""
+    cascade_references('medicines', id_mapping)
+
+
+def cascade_update_patient_references(id_mapping: Dict[str, str]):
+    """Update patient_id references after patient ID renumbering"""
+    cascade_references('patients', id_mapping)
+
+
+def cascade_update_store_references(id_mapping: Dict[str, str]):
+    """Update store_id references after store ID renumbering"""
+    cascade_references('stores', id_mapping)
 
 
 def cascade_update_user_references(id_mapping: Dict[str, str]):
     """Update user_id references in history after user ID renumbering"""
-    if not id_mapping:
-        return
+    cascade_references('users', id_mapping)
 
-    history = load_data('history')
-    updated = False
 
-    for entry in history:
-        old_user_id = entry.get('user_id')
-        if old_user_id and old_user_id in id_mapping:
-            entry['user_id'] = id_mapping[old_user_id]
-            updated = True
+def append_history(entry: Dict) -> bool:
+    """Give a history entry the next id and append it to the history table
 
-        # Also update entity_id if it references a user
-        if entry.get('entity_type') == 'user':
-            old_entity_id = entry.get('entity_id')
-            if old_entity_id and old_entity_id in id_mapping:
-                entry['entity_id'] = id_mapping[old_entity_id]
-                updated = True
-
-    if updated:
-        save_data('history', history)
+    The id is picked and the entry written under the table's file lock, so
+    threads and worker processes logging at the same time never reuse an id.
+    """
+    with _file_lock(DB_FILES['history']):
+        entry['id'] = generate_id('history')
+        return append_data('history', entry)
 
 
 def log_history(action: str, table: str, record_id: str, user_id: str, details: str = ''):
     """Log action to history"""
-    history = load_data('history')
-    history.append({
-        'id': generate_id('history'),
+    append_history({
+        'id': None,
         'action': action,
         'table': table,
         'record_id': record_id,
@@ -433,7 +1104,6 @@ def log_history(action: str, table: str, record_id: str, user_id: str, details:
         'details': details,
         'timestamp': datetime.now().isoformat()
     })
-    save_data('history', history)
 
 
 def get_forms() -> List[Dict]:
@@ -442,10 +1112,12 @@ def get_forms() -> List[Dict]:
 
 
 __all__ = [
-    'load_data', 'save_data', 'generate_id', 'renumber_ids',
-    'ensure_main_entities', 'init_database',
+    'load_data', 'load_data_cached', 'get_derived', 'get_index', 'get_by_id',
+    'save_data', 'append_data', 'update_record', 'delete_records', 'generate_id', 'renumber_ids',
+    'renumber_after_delete', 'bulk_operation', 'batched_writes',
+    'ensure_main_entities', 'init_database', 'cascade_references',
     'cascade_update_medicine_references', 'cascade_update_patient_references',
     'cascade_update_supplier_references', 'cascade_update_department_references',
     'cascade_update_store_references', 'cascade_update_user_references',
-    'log_history', 'get_forms',
+    'append_history', 'log_history', 'get_forms',
 ]
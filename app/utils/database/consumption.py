@@ -3,11 +3,15 @@ Consumption Repository Module
 Consumption management functions
 """
 
-from datetime import datetime
+from collections import Counter
 from typing import List, Dict
 
-from .base import load_data, save_data, generate_id, renumber_ids
+from .base import (
+    load_data, load_data_cached, get_derived, get_index, get_by_id,
+    save_data, update_record, generate_id, renumber_after_delete, _now_iso
+)
 from .medicines import get_medicines
+from .stores import get_stores, _apply_inventory_change
 
 
 def get_consumption() -> List[Dict]:
@@ -20,7 +24,7 @@ def save_consumption(consumption_data: Dict) -> str:
     consumption = get_consumption()
     consumption_id = generate_id('consumption')
     consumption_data['id'] = consumption_id
-    consumption_data['created_at'] = datetime.now().isoformat()
+    consumption_data['created_at'] = _now_iso()
     consumption.append(consumption_data)
     save_data('consumption', consumption)
 
@@ -33,14 +37,7 @@ def save_consumption(consumption_data: Dict) -> str:
 
 def update_consumption(consumption_id: str, consumption_data: Dict):
     """Update existing consumption"""
-    consumption = get_consumption()
-    for i, record in enumerate(consumption):
-        if record['id'] == consumption_id:
-            consumption_data['id'] = consumption_id
-            consumption_data['updated_at'] = datetime.now().isoformat()
-            consumption[i] = {**record, **consumption_data}
-            break
-    save_data('consumption', consumption)
+    update_record('consumption', consumption_id, consumption_data)
 
 
 def delete_consumption(consumption_id: str):
@@ -50,58 +47,55 @@ def delete_consumption(consumption_id: str):
     save_data('consumption', consumption)
 
     # Renumber consumption (no cascade needed - consumption doesn't have foreign keys referencing it)
-    renumber_ids('consumption', protect_ids=[])
+    renumber_after_delete('consumption', protect_ids=[])
 
 
 def update_store_inventory(department_id: str, medicines: list, operation: str):
     """Update specific store inventory"""
-    from .stores import get_stores
+    if not medicines:
+        return
+
     stores = get_stores()
     store = next((s for s in stores if s['department_id'] == department_id), None)
 
     if store:
-        for medicine in medicines:
-            medicine_id = medicine['medicine_id']
-            quantity = medicine['quantity']
-
-            current_stock = store['inventory'].get(medicine_id, 0)
-
-            if operation == 'add':
-                store['inventory'][medicine_id] = current_stock + quantity
-            elif operation == 'subtract':
-                store['inventory'][medicine_id] = max(0, current_stock - quantity)
-
+        _apply_inventory_change(store['inventory'], medicines, operation)
         save_data('stores', stores)
 
 
 def get_medicine_stock(medicine_id: str, department_id: str = None) -> int:
     """Get current stock for a medicine in a specific store or all stores"""
-    from .stores import get_stores
-    stores = get_stores()
+    return _stock_levels(department_id).get(medicine_id, 0)
+
 
+def _total_inventory(stores: List[Dict]) -> Counter:
+    """Stock per medicine id summed over all stores"""
+    totals = Counter()
+    for store in stores:
+        totals.update(store.get('inventory', {}))
+    return totals
+
+
+def _stock_levels(department_id: str = None) -> Dict[str, int]:
+    """Stock per medicine id for one department's store, or summed over all stores
+
+    Read-only; the all-stores totals are cached until stores.json changes.
+    """
     if department_id:
-        # Get stock for specific department store
-        store = next((s for s in stores if s.get('department_id') == department_id), None)
-        if store:
-            return store.get('inventory', {}).get(medicine_id, 0)
-        return 0
-    else:
-        # Get total stock across all stores
-        total_stock = 0
-        for store in stores:
-            total_stock += store.get('inventory', {}).get(medicine_id, 0)
-        return total_stock
+        store = get_index('stores', 'department_id').get(department_id)
+        return store.get('inventory', {}) if store else {}
+
+    return get_derived('stores', 'total_inventory', _total_inventory)
 
 
 def get_low_stock_medicines(department_id: str = None) -> List[Dict]:
     """Get medicines that are at or below low stock limit"""
-    from .stores import get_stores
     medicines = get_medicines()
-    stores = get_stores()
+    stock_levels = _stock_levels(department_id)
     low_stock_medicines = []
 
     for medicine in medicines:
-        current_stock = get_medicine_stock(medicine['id'], department_id)
+        current_stock = stock_levels.get(medicine['id'], 0)
         if current_stock <= medicine.get('low_stock_limit', 0):
             low_stock_medicines.append({
                 'medicine': medicine,
@@ -114,8 +108,7 @@ def get_low_stock_medicines(department_id: str = None) -> List[Dict]:
 
 def get_stock_status(medicine_id: str, department_id: str = None) -> Dict:
     """Get stock status for a medicine"""
-    medicines = get_medicines()
-    medicine = next((m for m in medicines if m['id'] == medicine_id), None)
+    medicine = get_by_id('medicines', medicine_id)
 
     if not medicine:
         return {'status': 'unknown', 'color': 'secondary', 'message': 'Medicine not found'}
@@ -134,15 +127,16 @@ def get_stock_status(medicine_id: str, department_id: str = None) -> Dict:
 def validate_consumption_stock(medicines: list, department_id: str) -> Dict:
     """Validate if consumption is possible with current stock"""
     validation_result = {'valid': True, 'errors': []}
+    stock_levels = _stock_levels(department_id)
+    medicines_by_id = get_index('medicines')
 
     for medicine_item in medicines:
         medicine_id = medicine_item['medicine_id']
         requested_qty = medicine_item['quantity']
-        available_stock = get_medicine_stock(medicine_id, department_id)
+        available_stock = stock_levels.get(medicine_id, 0)
 
         if requested_qty > available_stock:
-            medicines_list = get_medicines()
-            medicine = next((m for m in medicines_list if m['id'] == medicine_id), None)
+            medicine = medicines_by_id.get(medicine_id)
             medicine_name = medicine['name'] if medicine else f'Medicine ID {medicine_id}'
 
             validation_result['valid'] = False
@@ -155,11 +149,12 @@ def validate_consumption_stock(medicines: list, department_id: str) -> Dict:
 
 def get_available_medicines_for_consumption(department_id: str = None) -> List[Dict]:
     """Get medicines available for consumption with stock > 0"""
-    medicines = get_medicines()
+    medicines = load_data_cached('medicines')
+    stock_levels = _stock_levels(department_id)
     available_medicines = []
 
     for medicine in medicines:
-        stock = get_medicine_stock(medicine['id'], department_id)
+        stock = stock_levels.get(medicine['id'], 0)
         if stock > 0:
             medicine_with_stock = medicine.copy()
             medicine_with_stock['available_stock'] = stock
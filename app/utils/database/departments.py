@@ -3,10 +3,12 @@ Department Repository Module
 Department management functions
 """
 
-from datetime import datetime
 from typing import List, Dict
 
-from .base import load_data, save_data, generate_id, renumber_ids, cascade_update_department_references
+from .base import (
+    load_data, save_data, update_record, generate_id, renumber_after_delete,
+    cascade_update_department_references, _now_iso
+)
 from .activity import log_activity
 from .stores import create_store_for_department
 from .users import create_department_user
@@ -22,7 +24,7 @@ def save_department(department_data: Dict) -> str:
     departments = get_departments()
     department_id = generate_id('departments')
     department_data['id'] = department_id
-    department_data['created_at'] = datetime.now().isoformat()
+    department_data['created_at'] = _now_iso()
     departments.append(department_data)
     save_data('departments', departments)
 
@@ -55,14 +57,7 @@ def save_department_with_user(department_data: Dict) -> Dict:
 
 def update_department(department_id: str, department_data: Dict):
     """Update existing department"""
-    departments = get_departments()
-    for i, department in enumerate(departments):
-        if department['id'] == department_id:
-            department_data['id'] = department_id
-            department_data['updated_at'] = datetime.now().isoformat()
-            departments[i] = {**department, **department_data}
-            break
-    save_data('departments', departments)
+    update_record('departments', department_id, department_data)
 
 
 def delete_department(department_id: str, skip_renumber: bool = False):
@@ -73,8 +68,8 @@ def delete_department(department_id: str, skip_renumber: bool = False):
 
     # Renumber departments and cascade update all references (protect Main Pharmacy) (unless skipped for bulk operations)
     if not skip_renumber:
-        id_mapping = renumber_ids('departments', protect_ids=['01'])
-        cascade_update_department_references(id_mapping)
+        renumber_after_delete('departments', protect_ids=['01'],
+                              cascade=cascade_update_department_references)
 
 
 __all__ = [
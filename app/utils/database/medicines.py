@@ -3,10 +3,12 @@ Medicine Repository Module
 Medicine management functions
 """
 
-from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Iterable
 
-from .base import load_data, save_data, generate_id, renumber_ids, cascade_update_medicine_references
+from .base import (
+    load_data, save_data, update_record, delete_records,
+    generate_id, renumber_after_delete, cascade_update_medicine_references, _now_iso
+)
 
 
 def get_medicines() -> List[Dict]:
@@ -19,7 +21,7 @@ def save_medicine(medicine_data: Dict) -> str:
     medicines = get_medicines()
     medicine_id = generate_id('medicines')
     medicine_data['id'] = medicine_id
-    medicine_data['created_at'] = datetime.now().isoformat()
+    medicine_data['created_at'] = _now_iso()
     medicines.append(medicine_data)
     save_data('medicines', medicines)
     return medicine_id
@@ -27,14 +29,7 @@ def save_medicine(medicine_data: Dict) -> str:
 
 def update_medicine(medicine_id: str, medicine_data: Dict):
     """Update existing medicine"""
-    medicines = get_medicines()
-    for i, medicine in enumerate(medicines):
-        if medicine['id'] == medicine_id:
-            medicine_data['id'] = medicine_id
-            medicine_data['updated_at'] = datetime.now().isoformat()
-            medicines[i] = {**medicine, **medicine_data}
-            break
-    save_data('medicines', medicines)
+    update_record('medicines', medicine_id, medicine_data)
 
 
 def migrate_medicine_fields():
@@ -76,19 +71,26 @@ def migrate_medicine_fields():
     return False
 
 
-def delete_medicine(medicine_id: str, skip_renumber: bool = False):
-    """Delete medicine and optionally renumber remaining records"""
-    medicines = get_medicines()
-    medicines = [m for m in medicines if m['id'] != medicine_id]
-    save_data('medicines', medicines)
+def delete_medicines(medicine_ids: Iterable[str], skip_renumber: bool = False) -> int:
+    """Delete several medicines in one pass and optionally renumber remaining records
 
-    # Renumber medicines and cascade update all references (unless skipped for bulk operations)
+    Returns the number of medicine records deleted.
+    """
+    deleted_count = delete_records('medicines', medicine_ids)
+
+    # Renumber medicines and cascade update all references (unless skipped)
     if not skip_renumber:
-        id_mapping = renumber_ids('medicines', protect_ids=[])
-        cascade_update_medicine_references(id_mapping)
+        renumber_after_delete('medicines', protect_ids=[], cascade=cascade_update_medicine_references)
+
+    return deleted_count
+
+
+def delete_medicine(medicine_id: str, skip_renumber: bool = False):
+    """Delete medicine and optionally renumber remaining records"""
+    delete_medicines([medicine_id], skip_renumber=skip_renumber)
 
 
 __all__ = [
-    'get_medicines', 'save_medicine', 'update_medicine', 'delete_medicine',
+    'get_medicines', 'save_medicine', 'update_medicine', 'delete_medicine', 'delete_medicines',
     'migrate_medicine_fields',
 ]
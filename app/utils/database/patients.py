@@ -3,10 +3,12 @@ Patient Repository Module
 Patient management functions
 """
 
-from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Iterable
 
-from .base import load_data, save_data, generate_id, renumber_ids, cascade_update_patient_references
+from .base import (
+    load_data, save_data, update_record, delete_records,
+    generate_id, renumber_after_delete, cascade_update_patient_references, _now_iso
+)
 from .consumption import get_consumption
 
 
@@ -20,7 +22,7 @@ def save_patient(patient_data: Dict) -> str:
     patients = get_patients()
     patient_id = generate_id('patients')
     patient_data['id'] = patient_id
-    patient_data['created_at'] = datetime.now().isoformat()
+    patient_data['created_at'] = _now_iso()
     patients.append(patient_data)
     save_data('patients', patients)
     return patient_id
@@ -28,47 +30,56 @@ def save_patient(patient_data: Dict) -> str:
 
 def update_patient(patient_id: str, patient_data: Dict):
     """Update existing patient"""
-    patients = get_patients()
-    for i, patient in enumerate(patients):
-        if patient['id'] == patient_id:
-            patient_data['id'] = patient_id
-            patient_data['updated_at'] = datetime.now().isoformat()
-            patients[i] = {**patient, **patient_data}
-            break
-    save_data('patients', patients)
+    update_record('patients', patient_id, patient_data)
 
 
-def delete_patient(patient_id: str, skip_renumber: bool = False, cascade_delete: bool = True):
-    """Delete patient and optionally renumber remaining records
+def delete_patients(patient_ids: Iterable[str], skip_renumber: bool = False,
+                    cascade_delete: bool = True) -> int:
+    """Delete several patients in one pass over each table
 
     Args:
-        patient_id: ID of the patient to delete
-        skip_renumber: If True, skip renumbering (used in bulk operations)
+        patient_ids: IDs of the patients to delete
+        skip_renumber: If True, skip renumbering
         cascade_delete: If True, delete associated consumption records first (default: True)
+
+    Returns:
+        Number of patient records deleted
     """
+    patient_ids = set(patient_ids)
+
     # Step 1: Delete associated consumption records if cascade_delete is enabled
     if cascade_delete:
         consumption_records = get_consumption()
-        # Filter out consumption records for this patient
+        # Filter out consumption records for these patients
         updated_consumption = [
             record for record in consumption_records
-            if record.get('patient_id') != patient_id
+            if record.get('patient_id') not in patient_ids
         ]
         # Save updated consumption data
         if len(updated_consumption) < len(consumption_records):
             save_data('consumption', updated_consumption)
 
-    # Step 2: Delete the patient record
-    patients = get_patients()
-    patients = [p for p in patients if p['id'] != patient_id]
-    save_data('patients', patients)
+    # Step 2: Delete the patient records
+    deleted_count = delete_records('patients', patient_ids)
 
-    # Step 3: Renumber patients and cascade update all references (unless skipped for bulk operations)
+    # Step 3: Renumber patients and cascade update all references (unless skipped)
     if not skip_renumber:
-        id_mapping = renumber_ids('patients', protect_ids=[])
-        cascade_update_patient_references(id_mapping)
+        renumber_after_delete('patients', protect_ids=[], cascade=cascade_update_patient_references)
+
+    return deleted_count
+
+
+def delete_patient(patient_id: str, skip_renumber: bool = False, cascade_delete: bool = True):
+    """Delete patient and optionally renumber remaining records
+
+    Args:
+        patient_id: ID of the patient to delete
+        skip_renumber: If True, skip renumbering (used in bulk operations)
+        cascade_delete: If True, delete associated consumption records first (default: True)
+    """
+    delete_patients([patient_id], skip_renumber=skip_renumber, cascade_delete=cascade_delete)
 
 
 __all__ = [
-    'get_patients', 'save_patient', 'update_patient', 'delete_patient',
+    'get_patients', 'save_patient', 'update_patient', 'delete_patient', 'delete_patients',
 ]
@@ -3,10 +3,12 @@ Purchase Repository Module
 Purchase management functions
 """
 
-from datetime import datetime
 from typing import List, Dict
 
-from .base import load_data, save_data, generate_id, renumber_ids
+from .base import (
+    load_data, update_record, append_data, delete_records, generate_id, renumber_after_delete,
+    _now_iso
+)
 from .stores import update_main_store_inventory
 
 
@@ -17,12 +19,10 @@ def get_purchases() -> List[Dict]:
 
 def save_purchase(purchase_data: Dict) -> str:
     """Save new purchase and update inventory"""
-    purchases = get_purchases()
     purchase_id = generate_id('purchases')
     purchase_data['id'] = purchase_id
-    purchase_data['created_at'] = datetime.now().isoformat()
-    purchases.append(purchase_data)
-    save_data('purchases', purchases)
+    purchase_data['created_at'] = _now_iso()
+    append_data('purchases', purchase_data)
 
     # Update main store inventory
     update_main_store_inventory(purchase_data['medicines'], 'add')
@@ -32,24 +32,16 @@ def save_purchase(purchase_data: Dict) -> str:
 
 def update_purchase(purchase_id: str, purchase_data: Dict):
     """Update existing purchase"""
-    purchases = get_purchases()
-    for i, purchase in enumerate(purchases):
-        if purchase['id'] == purchase_id:
-            purchase_data['id'] = purchase_id
-            purchase_data['updated_at'] = datetime.now().isoformat()
-            purchases[i] = {**purchase, **purchase_data}
-            break
-    save_data('purchases', purchases)
-
-
-def delete_purchase(purchase_id: str):
-    """Delete purchase and renumber remaining records"""
-    purchases = get_purchases()
-    purchases = [p for p in purchases if p['id'] != purchase_id]
-    save_data('purchases', purchases)
+    update_record('purchases', purchase_id, purchase_data)
+
+
+def delete_purchase(purchase_id: str, skip_renumber: bool = False):
+    """Delete purchase and optionally renumber remaining records"""
+    delete_records('purchases', [purchase_id])
 
     # Renumber purchases (no cascade needed - purchases don't have foreign keys referencing them)
-    renumber_ids('purchases', protect_ids=[])
+    if not skip_renumber:
+        renumber_after_delete('purchases', protect_ids=[])
 
 
 __all__ = [
@@ -4,7 +4,7 @@ Defines the interface for repository pattern implementation
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Tuple
 
 
 class BaseRepository(ABC):
@@ -95,6 +95,40 @@ class BaseRepository(ABC):
         pass
 
 
+# Source for each filter op; {field} is a string literal, {value} a bound argument
+_FILTER_TEMPLATES = {
+    'eq': '(r.get({field}) == {value})',
+    'in': '(r.get({field}) in {value})',
+    # Unhashable field values cannot be in a set and would raise, so skip them
+    'in_set': '((_x := r.get({field})).__hash__ is not None and _x in {value})',
+    'contains': "({value} in str(r.get({field}, '')).lower())",
+}
+
+# Compiled predicate factories, keyed by the (op, field) shape of a filter chain
+_compiled_filters: Dict[Tuple[Tuple[str, str], ...], Callable[..., Callable]] = {}
+
+
+def _compile_filters(signature: Tuple[Tuple[str, str], ...]) -> Callable[..., Callable]:
+    """Build a factory returning one predicate that applies every filter in signature
+
+    The generated predicate tests all filters in a single expression, so a
+    record costs one call instead of one per filter. Filter values are
+    passed to the factory as arguments and never appear in the source.
+    """
+    factory = _compiled_filters.get(signature)
+    if factory is None:
+        names = [f'_v{i}' for i in range(len(signature))]
+        body = ' and '.join(
+            _FILTER_TEMPLATES[op].format(field=repr(field), value=name)
+            for (op, field), name in zip(signature, names)
+        )
+        source = f"def _factory({', '.join(names)}):\n    return lambda r: {body}\n"
+        namespace = {}
+        exec(compile(source, '<QueryBuilder filters>', 'exec'), namespace)
+        factory = _compiled_filters[signature] = namespace['_factory']
+    return factory
+
+
 class QueryBuilder:
     """
     Helper class for building database queries.
@@ -104,24 +138,29 @@ class QueryBuilder:
 
     def __init__(self, data: List[Dict[str, Any]]):
         self._data = data
-        self._filters = []
+        self._filters = []  # (op, field, value) tuples, see _FILTER_TEMPLATES
+
+    def _add_filter(self, op: str, field: str, value: Any) -> 'QueryBuilder':
+        if not isinstance(field, str):
+            raise TypeError(f"Field names must be strings, got {field!r}")
+        self._filters.append((op, field, value))
+        return self
 
     def where(self, field: str, value: Any) -> 'QueryBuilder':
         """Filter records where field equals value"""
-        self._filters.append(lambda x: x.get(field) == value)
-        return self
+        return self._add_filter('eq', field, value)
 
     def where_in(self, field: str, values: List[Any]) -> 'QueryBuilder':
         """Filter records where field is in values"""
-        self._filters.append(lambda x: x.get(field) in values)
-        return self
+        try:
+            # Hashed membership test instead of scanning the list per record
+            return self._add_filter('in_set', field, frozenset(values))
+        except TypeError:
+            return self._add_filter('in', field, values)
 
     def where_contains(self, field: str, value: str) -> 'QueryBuilder':
         """Filter records where field contains value (case-insensitive)"""
-        self._filters.append(
-            lambda x: value.lower() in str(x.get(field, '')).lower()
-        )
-        return self
+        return self._add_filter('contains', field, value.lower())
 
     def order_by(self, field: str, descending: bool = False) -> 'QueryBuilder':
         """Order results by field"""
@@ -139,10 +178,11 @@ class QueryBuilder:
 
     def execute(self) -> List[Dict[str, Any]]:
         """Execute the query and return results"""
-        result = self._data
-        for filter_fn in self._filters:
-            result = [x for x in result if filter_fn(x)]
-        return result
+        if not self._filters:
+            return self._data
+        signature = tuple((op, field) for op, field, _ in self._filters)
+        predicate = _compile_filters(signature)(*(value for _, _, value in self._filters))
+        return list(filter(predicate, self._data))
 
 
 __all__ = ['BaseRepository', 'QueryBuilder']
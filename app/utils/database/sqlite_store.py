@@ -0,0 +1,153 @@
+"""
+SQLite Store Module
+Optional SQLite storage for tables that are written often
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# One connection per database file, shared by all threads under _lock
+_connections: Dict[str, sqlite3.Connection] = {}
+_lock = threading.RLock()
+
+# Writes made through this process, per database file; combined with
+# PRAGMA data_version (which only counts other connections) in stamp()
+_local_versions: Dict[str, int] = {}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    file_type TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    id TEXT,
+    data BLOB NOT NULL,
+    PRIMARY KEY (file_type, seq)
+);
+CREATE INDEX IF NOT EXISTS records_id ON records (file_type, id);
+CREATE TABLE IF NOT EXISTS imported (file_type TEXT PRIMARY KEY);
+"""
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Open (once) the database at db_path in WAL mode and create the schema"""
+    conn = _connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SCHEMA)
+        _connections[db_path] = conn
+    return conn
+
+
+def _write(db_path: str, statements) -> int:
+    """Run statements(conn) in one transaction and bump the local version"""
+    with _lock:
+        conn = _connect(db_path)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = statements(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        _local_versions[db_path] = _local_versions.get(db_path, 0) + 1
+        return result
+
+
+def is_imported(db_path: str, file_type: str) -> bool:
+    """Whether file_type has been loaded into the database yet"""
+    with _lock:
+        row = _connect(db_path).execute(
+            'SELECT 1 FROM imported WHERE file_type = ?', (file_type,)
+        ).fetchone()
+    return row is not None
+
+
+def stamp(db_path: str) -> Tuple[str, int, int]:
+    """Version of the database, changing whenever any connection commits"""
+    with _lock:
+        data_version = _connect(db_path).execute('PRAGMA data_version').fetchone()[0]
+        return (db_path, data_version, _local_versions.get(db_path, 0))
+
+
+def load(db_path: str, file_type: str) -> bytes:
+    """All records of file_type, in order, as one encoded JSON array"""
+    with _lock:
+        rows = _connect(db_path).execute(
+            'SELECT data FROM records WHERE file_type = ? ORDER BY seq', (file_type,)
+        ).fetchall()
+    return b'[' + b','.join(row[0] for row in rows) + b']'
+
+
+def replace(db_path: str, file_type: str, records: Iterable[Tuple[Optional[str], bytes]]):
+    """Replace every record of file_type with (id, encoded record) pairs"""
+    def statements(conn):
+        conn.execute('DELETE FROM records WHERE file_type = ?', (file_type,))
+        conn.executemany(
+            'INSERT INTO records (file_type, seq, id, data) VALUES (?, ?, ?, ?)',
+            ((file_type, seq, record_id, data) for seq, (record_id, data) in enumerate(records))
+        )
+        conn.execute('INSERT OR IGNORE INTO imported (file_type) VALUES (?)', (file_type,))
+
+    _write(db_path, statements)
+
+
+def append(db_path: str, file_type: str, record_id: Optional[str], data: bytes):
+    """Add one encoded record after the last record of file_type"""
+    def statements(conn):
+        conn.execute(
+            'INSERT INTO records (file_type, seq, id, data) '
+            'SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ? FROM records WHERE file_type = ?',
+            (file_type, record_id, data, file_type)
+        )
+
+    _write(db_path, statements)
+
+
+def update(db_path: str, file_type: str, record_id: str, change: Callable[[bytes], bytes]) -> bool:
+    """Replace the first record of file_type with record_id by change(its data)
+
+    Reading and rewriting the row happen in one transaction. Returns False
+    if there is no such record.
+    """
+    def statements(conn):
+        row = conn.execute(
+            'SELECT seq, data FROM records WHERE file_type = ? AND id = ? ORDER BY seq LIMIT 1',
+            (file_type, record_id)
+        ).fetchone()
+        if row is None:
+            return False
+        conn.execute(
+            'UPDATE records SET data = ? WHERE file_type = ? AND seq = ?',
+            (change(row[1]), file_type, row[0])
+        )
+        return True
+
+    return _write(db_path, statements)
+
+
+def delete(db_path: str, file_type: str, record_ids: List[str]) -> int:
+    """Delete records of file_type by id, returning how many were removed"""
+    def statements(conn):
+        removed = 0
+        for record_id in record_ids:
+            removed += conn.execute(
+                'DELETE FROM records WHERE file_type = ? AND id = ?', (file_type, record_id)
+            ).rowcount
+        return removed
+
+    return _write(db_path, statements)
+
+
+def close_all():
+    """Close every open connection (e.g. before the database file is replaced)"""
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
+__all__ = ['is_imported', 'stamp', 'load', 'replace', 'append', 'update', 'delete', 'close_all']
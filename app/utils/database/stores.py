@@ -3,10 +3,16 @@ Store Repository Module
 Store management functions
 """
 
-from datetime import datetime
+from collections import Counter
 from typing import List, Dict, Optional
 
-from .base import load_data, save_data, generate_id, renumber_ids, cascade_update_store_references
+from .base import (
+    load_data, get_by_id, get_index, save_data, update_record, delete_records, generate_id,
+    renumber_after_delete, batched_writes, cascade_update_store_references, _now_iso
+)
+from .activity import log_activity
+from .users import delete_department_users
+from .transfers import save_transfer
 
 
 def get_stores() -> List[Dict]:
@@ -15,21 +21,13 @@ def get_stores() -> List[Dict]:
 
 
 def get_store_by_id(store_id: str) -> Optional[Dict]:
-    """Get store by ID"""
-    stores = get_stores()
-    return next((s for s in stores if s['id'] == store_id), None)
+    """Get store by ID (read-only; use update_store to change it)"""
+    return get_by_id('stores', store_id)
 
 
 def update_store(store_id: str, store_data: Dict):
     """Update existing store"""
-    stores = get_stores()
-    for i, store in enumerate(stores):
-        if store['id'] == store_id:
-            store_data['id'] = store_id
-            store_data['updated_at'] = datetime.now().isoformat()
-            stores[i] = {**store, **store_data}
-            break
-    save_data('stores', stores)
+    update_record('stores', store_id, store_data)
 
 
 def create_store_for_department(department_id: str, department_name: str) -> str:
@@ -41,17 +39,19 @@ def create_store_for_department(department_id: str, department_name: str) -> str
         'name': f"{department_name} Store",
         'department_id': department_id,
         'inventory': {},
-        'created_at': datetime.now().isoformat()
+        'created_at': _now_iso()
     }
     stores.append(store_data)
     save_data('stores', stores)
     return store_id
 
 
-def delete_store(store_id: str):
-    """Delete store and transfer inventory to main store"""
+@batched_writes()
+def delete_store(store_id: str, skip_renumber: bool = False):
+    """Delete store, transfer its inventory to main store and optionally renumber"""
     stores = get_stores()
-    store_to_delete = next((s for s in stores if s['id'] == store_id), None)
+    stores_by_id = {s['id']: s for s in stores}
+    store_to_delete = stores_by_id.get(store_id)
 
     if not store_to_delete:
         return False, "Store not found"
@@ -62,7 +62,7 @@ def delete_store(store_id: str):
 
     # Transfer inventory to main store if any exists
     if store_to_delete.get('inventory'):
-        main_store = next((s for s in stores if s['id'] == '01'), None)
+        main_store = stores_by_id.get('01')
         if main_store:
             # Create transfer record for audit trail
             transfer_data = {
@@ -70,8 +70,7 @@ def delete_store(store_id: str):
                 'destination_store_id': '01',
                 'medicines': [],
                 'notes': f'Automatic transfer due to store deletion: {store_to_delete["name"]}',
-                'status': 'completed',
-                'created_at': datetime.now().isoformat()
+                'status': 'completed'
             }
 
             # Transfer each medicine
@@ -82,47 +81,38 @@ def delete_store(store_id: str):
                         'quantity': quantity
                     })
 
-                    # Add to main store inventory
-                    current_stock = main_store['inventory'].get(medicine_id, 0)
-                    main_store['inventory'][medicine_id] = current_stock + quantity
+            # Add to main store inventory
+            _apply_inventory_change(
+                main_store.setdefault('inventory', {}), transfer_data['medicines'], 'add'
+            )
 
             # Save transfer record if there were medicines to transfer
             if transfer_data['medicines']:
-                from .transfers import get_transfers
-                transfers = get_transfers()
-                transfer_id = generate_id('transfers')
-                transfer_data['id'] = transfer_id
-                transfers.append(transfer_data)
-                save_data('transfers', transfers)
-
-    # Remove store from stores list
-    stores = [s for s in stores if s['id'] != store_id]
+                save_transfer(transfer_data)
+
+    # Remove store from stores list in place
+    stores.remove(store_to_delete)
     save_data('stores', stores)
 
-    # Renumber stores and cascade update all references (protect Main Store)
-    id_mapping = renumber_ids('stores', protect_ids=['01'])
-    cascade_update_store_references(id_mapping)
+    # Renumber stores and cascade update all references (protect Main Store, unless skipped)
+    if not skip_renumber:
+        renumber_after_delete('stores', protect_ids=['01'], cascade=cascade_update_store_references)
 
     return True, "Store deleted successfully and inventory transferred to main store"
 
 
+@batched_writes()
 def delete_department_and_store(department_id: str):
     """Delete department, its associated store, and department users"""
-    from .departments import get_departments
-    from .users import delete_department_users
-    from .activity import log_activity
-
     # Get department info for logging
-    departments = get_departments()
-    department_to_delete = next((d for d in departments if d['id'] == department_id), None)
+    department_to_delete = get_by_id('departments', department_id)
     department_name = department_to_delete.get('name', 'Unknown') if department_to_delete else 'Unknown'
 
     # First delete associated users
     deleted_users = delete_department_users(department_id)
 
     # Then delete the associated store
-    stores = get_stores()
-    store_to_delete = next((s for s in stores if s.get('department_id') == department_id), None)
+    store_to_delete = get_index('stores', 'department_id').get(department_id)
 
     if store_to_delete:
         success, message = delete_store(store_to_delete['id'])
@@ -130,8 +120,7 @@ def delete_department_and_store(department_id: str):
             return False, f"Failed to delete store: {message}"
 
     # Finally delete the department
-    departments = [d for d in departments if d['id'] != department_id]
-    save_data('departments', departments)
+    delete_records('departments', [department_id])
 
     # Log department deletion
     log_activity('DELETE', 'department', department_id, {
@@ -146,22 +135,34 @@ def delete_department_and_store(department_id: str):
 
 def update_main_store_inventory(medicines: list, operation: str):
     """Update main store inventory (for purchases)"""
+    if not medicines:
+        return
+
     stores = get_stores()
     main_store = next((s for s in stores if s['id'] == '01'), None)
 
     if main_store:
-        for medicine in medicines:
-            medicine_id = medicine['medicine_id']
-            quantity = medicine['quantity']
+        _apply_inventory_change(main_store['inventory'], medicines, operation)
+        save_data('stores', stores)
 
-            current_stock = main_store['inventory'].get(medicine_id, 0)
 
-            if operation == 'add':
-                main_store['inventory'][medicine_id] = current_stock + quantity
-            elif operation == 'subtract':
-                main_store['inventory'][medicine_id] = max(0, current_stock - quantity)
+def _apply_inventory_change(inventory: Dict[str, int], medicines: list, operation: str):
+    """Add or subtract (not below 0) the quantities of medicine lines in an inventory
 
-        save_data('stores', stores)
+    Lines for the same medicine are summed first, so each inventory entry
+    is read and written once. Quantities are converted to int here, so
+    inventories only ever hold ints and readers need no conversion.
+    """
+    delta = Counter()
+    for medicine in medicines:
+        delta[medicine['medicine_id']] += int(medicine['quantity'])
+
+    if operation == 'add':
+        for medicine_id, quantity in delta.items():
+            inventory[medicine_id] = inventory.get(medicine_id, 0) + quantity
+    elif operation == 'subtract':
+        for medicine_id, quantity in delta.items():
+            inventory[medicine_id] = max(0, inventory.get(medicine_id, 0) - quantity)
 
 
 __all__ = [
@@ -3,11 +3,13 @@ Transfer Repository Module
 Transfer management functions
 """
 
-from datetime import datetime
+from collections import Counter
 from typing import List, Dict
 
-from .base import load_data, save_data, generate_id, renumber_ids
-from .medicines import get_medicines
+from .base import (
+    load_data, get_by_id, save_data, update_record, append_data, delete_records, generate_id,
+    renumber_after_delete, _now_iso
+)
 
 
 def get_transfers():
@@ -17,50 +19,46 @@ def get_transfers():
 
 def save_transfer(transfer_data):
     """Save a new inventory transfer"""
-    transfers = load_data('transfers')
     transfer_data['id'] = generate_id('transfers')
-    transfer_data['created_at'] = datetime.now().isoformat()
-    transfers.append(transfer_data)
-    save_data('transfers', transfers)
+    transfer_data['created_at'] = _now_iso()
+    append_data('transfers', transfer_data)
     return transfer_data['id']
 
 
 def process_inventory_transfer(source_store_id, destination_store_id, medicines_data):
     """Process inventory transfer between stores"""
-    from .stores import get_stores
-    stores = get_stores()
+    stores = load_data('stores')
 
-    # Find source and destination stores
-    source_store = next((s for s in stores if s['id'] == source_store_id), None)
-    destination_store = next((s for s in stores if s['id'] == destination_store_id), None)
+    # Find source and destination stores in one pass
+    stores_by_id = {s['id']: s for s in stores}
+    source_store = stores_by_id.get(source_store_id)
+    destination_store = stores_by_id.get(destination_store_id)
 
     if not source_store or not destination_store:
         return False, "Source or destination store not found"
 
-    # Validate sufficient stock in source store
+    # Convert quantities once, totalling repeated lines for the same medicine
+    quantities = Counter()
     for medicine_data in medicines_data:
-        medicine_id = medicine_data['medicine_id']
-        quantity = int(medicine_data['quantity'])
+        quantities[medicine_data['medicine_id']] += int(medicine_data['quantity'])
+
+    if not quantities:
+        return True, "No medicines to transfer"
 
-        current_stock = source_store.get('inventory', {}).get(medicine_id, 0)
+    source_inventory = source_store.setdefault('inventory', {})
+    destination_inventory = destination_store.setdefault('inventory', {})
+
+    # Validate sufficient stock in source store
+    for medicine_id, quantity in quantities.items():
+        current_stock = source_inventory.get(medicine_id, 0)
         if current_stock < quantity:
             medicine_name = get_medicine_name(medicine_id)
             return False, f"Insufficient stock for {medicine_name}. Available: {current_stock}, Requested: {quantity}"
 
     # Process the transfer
-    for medicine_data in medicines_data:
-        medicine_id = medicine_data['medicine_id']
-        quantity = int(medicine_data['quantity'])
-
-        # Deduct from source store
-        if 'inventory' not in source_store:
-            source_store['inventory'] = {}
-        source_store['inventory'][medicine_id] = source_store['inventory'].get(medicine_id, 0) - quantity
-
-        # Add to destination store
-        if 'inventory' not in destination_store:
-            destination_store['inventory'] = {}
-        destination_store['inventory'][medicine_id] = destination_store['inventory'].get(medicine_id, 0) + quantity
+    for medicine_id, quantity in quantities.items():
+        source_inventory[medicine_id] = source_inventory.get(medicine_id, 0) - quantity
+        destination_inventory[medicine_id] = destination_inventory.get(medicine_id, 0) + quantity
 
     # Save updated stores
     save_data('stores', stores)
@@ -70,31 +68,22 @@ def process_inventory_transfer(source_store_id, destination_store_id, medicines_
 
 def get_medicine_name(medicine_id):
     """Get medicine name by ID"""
-    medicines = get_medicines()
-    medicine = next((m for m in medicines if m['id'] == medicine_id), None)
+    medicine = get_by_id('medicines', medicine_id)
     return medicine['name'] if medicine else 'Unknown Medicine'
 
 
-def delete_transfer(transfer_id: str):
-    """Delete transfer and renumber remaining records"""
-    transfers = get_transfers()
-    transfers = [t for t in transfers if t['id'] != transfer_id]
-    save_data('transfers', transfers)
+def delete_transfer(transfer_id: str, skip_renumber: bool = False):
+    """Delete transfer and optionally renumber remaining records"""
+    delete_records('transfers', [transfer_id])
 
-    # Renumber transfers (no cascade needed)
-    renumber_ids('transfers', protect_ids=[])
+    # Renumber transfers (no cascade needed, unless skipped for bulk operations)
+    if not skip_renumber:
+        renumber_after_delete('transfers', protect_ids=[])
 
 
 def update_transfer(transfer_id: str, transfer_data: Dict):
     """Update existing transfer"""
-    transfers = get_transfers()
-    for i, transfer in enumerate(transfers):
-        if transfer['id'] == transfer_id:
-            transfer_data['id'] = transfer_id
-            transfer_data['updated_at'] = datetime.now().isoformat()
-            transfers[i] = {**transfer, **transfer_data}
-            break
-    save_data('transfers', transfers)
+    update_record('transfers', transfer_id, transfer_data)
 
 
 __all__ = [
@@ -3,6 +3,8 @@ User Repository Module
 User management functions
 """
 
+import hmac
+import re
 import secrets
 import string
 from datetime import datetime
@@ -10,9 +12,80 @@ from typing import List, Dict, Any, Optional
 from flask import session
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from .base import load_data, save_data, generate_id, renumber_ids, cascade_update_user_references
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+except ImportError:  # Fall back to Werkzeug's PBKDF2 hashes
+    PasswordHasher = None
+
+from .base import (
+    load_data, get_by_id, get_index, save_data, generate_id, renumber_after_delete,
+    cascade_update_user_references
+)
 from .activity import log_activity
 
+# Characters that count as special in validate_password_strength
+_SPECIAL_CHARS = frozenset("!@#$%^&*()_+-=[]{}|;:,.<>?")
+
+# Character sets generated passwords draw from, at least one of each
+_PASSWORD_CLASSES = tuple(
+    frozenset(chars) for chars in
+    (string.ascii_lowercase, string.ascii_uppercase, string.digits, "!@#$%^&*")
+)
+_PASSWORD_ALPHABET = ''.join(sorted(set().union(*_PASSWORD_CLASSES)))
+_PASSWORD_BYTE_LIMIT = 256 - 256 % len(_PASSWORD_ALPHABET)
+
+# Letters, numbers, hyphens and underscores, with at least one letter or number
+_USERNAME_RE = re.compile(r'[\w-]*[^\W_][\w-]*')
+
+# Werkzeug hash methods; a stored password starting with one of these is a hash
+_PASSWORD_HASH_PREFIXES = ('pbkdf2:', 'scrypt:', '$argon2')
+
+# Argon2id hasher for new passwords when argon2-cffi is installed; older
+# hashes are still checked and are replaced on the next successful login
+_argon2 = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1) if PasswordHasher else None
+
+# Longest password validate_user will hash; anything longer cannot be a real one
+_MAX_PASSWORD_LENGTH = 1024
+
+# Hash checked when a username is unknown, so that a miss costs as much as a
+# wrong password; created on first use to keep the hashing out of imports
+_dummy_password_hash = None
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with Argon2id if available, otherwise Werkzeug's default"""
+    if _argon2 is not None:
+        return _argon2.hash(password)
+    return generate_password_hash(password)
+
+
+def _verify_password(password_hash: str, password: str) -> bool:
+    """Check a password against an Argon2 or Werkzeug hash"""
+    if password_hash.startswith('$argon2'):
+        if _argon2 is None:
+            return False
+        try:
+            return _argon2.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(password_hash, password)
+
+
+def _needs_rehash(password_hash: str) -> bool:
+    """Whether a verified hash should be replaced with one from hash_password"""
+    if _argon2 is None:
+        return False
+    return not password_hash.startswith('$argon2') or _argon2.check_needs_rehash(password_hash)
+
+
+def _check_dummy_password(password: str):
+    """Spend the time of a real password check without any account to check"""
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = hash_password(secrets.token_hex(16))
+    _verify_password(_dummy_password_hash, password or '')
+
 
 def get_users() -> List[Dict]:
     """Get all users"""
@@ -21,104 +94,111 @@ def get_users() -> List[Dict]:
 
 def validate_user(username: str, password: str) -> Optional[Dict]:
     """Validate user credentials with enhanced security and audit logging"""
-    users = get_users()
+    # One timestamp for everything this attempt records
+    now = datetime.now().isoformat()
 
     # Log authentication attempt
     log_activity('AUTH_ATTEMPT', 'user', None, {
         'username': username,
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': now,
         'ip_address': 'localhost'  # Could be enhanced with real IP
     })
 
-    for user in users:
-        if user.get('username') == username:
-            # Check if account is locked
-            if user.get('account_locked', False):
-                log_activity('AUTH_FAILED', 'user', user.get('id'), {
-                    'username': username,
-                    'reason': 'account_locked',
-                    'timestamp': datetime.now().isoformat()
-                })
-                return None
-
-            # Check if password is hashed (new format) or plain text (legacy)
-            stored_password = user.get('password', '')
-            if stored_password.startswith('pbkdf2:sha256:'):
-                # Hashed password - use secure check
-                if check_password_hash(stored_password, password):
-                    # Reset failed login attempts on successful login
-                    if user.get('failed_login_attempts', 0) > 0:
-                        update_user(user['id'], {
-                            'failed_login_attempts': 0,
-                            'last_successful_login': datetime.now().isoformat()
-                        })
-
-                    log_activity('AUTH_SUCCESS', 'user', user.get('id'), {
-                        'username': username,
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    return user
-                else:
-                    # Handle failed login attempt
-                    handle_failed_login(user)
-                    return None
-            else:
-                # Plain text password - legacy support (should be migrated)
-                if stored_password == password:
-                    # Reset failed login attempts on successful login
-                    if user.get('failed_login_attempts', 0) > 0:
-                        update_user(user['id'], {
-                            'failed_login_attempts': 0,
-                            'last_successful_login': datetime.now().isoformat()
-                        })
-
-                    log_activity('AUTH_SUCCESS', 'user', user.get('id'), {
-                        'username': username,
-                        'timestamp': datetime.now().isoformat(),
-                        'note': 'legacy_password_used'
-                    })
-                    return user
-                else:
-                    # Handle failed login attempt
-                    handle_failed_login(user)
-                    return None
-
-    # User not found
-    log_activity('AUTH_FAILED', 'user', None, {
-        'username': username,
-        'reason': 'user_not_found',
-        'timestamp': datetime.now().isoformat()
-    })
-    return None
+    # Reject passwords no account can have before spending a hash on them;
+    # this does not depend on the username, so it reveals nothing about it
+    if not password or len(password) > _MAX_PASSWORD_LENGTH:
+        log_activity('AUTH_FAILED', 'user', None, {
+            'username': username,
+            'reason': 'invalid_password_format',
+            'timestamp': now
+        })
+        return None
+
+    # Find the account with one username lookup
+    user = get_user_by_username(username)
+    if user is None:
+        # User not found; still hash the password so the response time
+        # does not reveal whether the username exists
+        _check_dummy_password(password)
+        log_activity('AUTH_FAILED', 'user', None, {
+            'username': username,
+            'reason': 'user_not_found',
+            'timestamp': now
+        })
+        return None
+
+    user_id = user.get('id')
+
+    # Check if account is locked
+    if user.get('account_locked', False):
+        log_activity('AUTH_FAILED', 'user', user_id, {
+            'username': username,
+            'reason': 'account_locked',
+            'timestamp': now
+        })
+        return None
+
+    # Check if password is hashed (new format) or plain text (legacy)
+    stored_password = user.get('password', '')
+    legacy_password = not is_password_hash(stored_password)
+    if legacy_password:
+        # Plain text password - legacy support (should be migrated)
+        password_matches = hmac.compare_digest(stored_password.encode(), password.encode())
+    else:
+        # Hashed password - use secure check
+        password_matches = _verify_password(stored_password, password)
+
+    if not password_matches:
+        # Handle failed login attempt
+        handle_failed_login(user)
+        return None
+
+    # Reset failed login attempts and upgrade an older hash on successful login
+    update_data = {}
+    if user.get('failed_login_attempts', 0) > 0:
+        update_data['failed_login_attempts'] = 0
+        update_data['last_successful_login'] = now
+    if not legacy_password and _needs_rehash(stored_password):
+        update_data['password'] = hash_password(password)
+    if update_data:
+        update_user(user_id, update_data)
+
+    details = {'username': username, 'timestamp': now}
+    if legacy_password:
+        details['note'] = 'legacy_password_used'
+    log_activity('AUTH_SUCCESS', 'user', user_id, details)
+    return user
 
 
 def handle_failed_login(user: Dict):
     """Handle failed login attempts with account locking"""
+    now = datetime.now().isoformat()
     user_id = user.get('id')
+    username = user.get('username')
     failed_attempts = user.get('failed_login_attempts', 0) + 1
     max_attempts = 5  # Maximum failed attempts before locking
 
     update_data = {
         'failed_login_attempts': failed_attempts,
-        'last_failed_login': datetime.now().isoformat()
+        'last_failed_login': now
     }
 
     # Lock account if max attempts reached
     if failed_attempts >= max_attempts:
         update_data['account_locked'] = True
-        update_data['account_locked_at'] = datetime.now().isoformat()
+        update_data['account_locked_at'] = now
 
         log_activity('ACCOUNT_LOCKED', 'user', user_id, {
-            'username': user.get('username'),
+            'username': username,
             'failed_attempts': failed_attempts,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now
         })
     else:
         log_activity('AUTH_FAILED', 'user', user_id, {
-            'username': user.get('username'),
+            'username': username,
             'reason': 'invalid_password',
             'failed_attempts': failed_attempts,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now
         })
 
     update_user(user_id, update_data)
@@ -126,22 +206,40 @@ def handle_failed_login(user: Dict):
 
 def unlock_user_account(user_id: str):
     """Unlock a locked user account (admin only)"""
+    now = datetime.now().isoformat()
     update_user(user_id, {
         'account_locked': False,
         'failed_login_attempts': 0,
-        'account_unlocked_at': datetime.now().isoformat()
+        'account_unlocked_at': now
     })
 
     user = get_user_by_id(user_id)
     log_activity('ACCOUNT_UNLOCKED', 'user', user_id, {
         'username': user.get('username') if user else 'unknown',
         'unlocked_by': session.get('username', 'system'),
-        'timestamp': datetime.now().isoformat()
+        'timestamp': now
     })
 
 
+def is_password_hash(password: str) -> bool:
+    """Check whether a password value is already an Argon2 or Werkzeug password hash"""
+    return password.startswith(_PASSWORD_HASH_PREFIXES)
+
+
 def validate_password_strength(password: str) -> Dict[str, Any]:
     """Validate password strength and return detailed feedback"""
+    # Classify each distinct character once instead of rescanning per rule
+    distinct_chars = set(password)
+    has_upper = has_lower = has_digit = False
+    for c in distinct_chars:
+        if c.isupper():
+            has_upper = True
+        elif c.islower():
+            has_lower = True
+        elif c.isdigit():
+            has_digit = True
+    has_special = not _SPECIAL_CHARS.isdisjoint(distinct_chars)
+
     result = {
         'is_valid': True,
         'score': 0,
@@ -164,7 +262,7 @@ def validate_password_strength(password: str) -> Dict[str, Any]:
         result['feedback'].append('Password must be at least 8 characters long')
 
     # Check for uppercase letter
-    if any(c.isupper() for c in password):
+    if has_upper:
         result['requirements_met']['uppercase'] = True
         result['score'] += 20
     else:
@@ -172,7 +270,7 @@ def validate_password_strength(password: str) -> Dict[str, Any]:
         result['feedback'].append('Password must contain at least one uppercase letter')
 
     # Check for lowercase letter
-    if any(c.islower() for c in password):
+    if has_lower:
         result['requirements_met']['lowercase'] = True
         result['score'] += 20
     else:
@@ -180,7 +278,7 @@ def validate_password_strength(password: str) -> Dict[str, Any]:
         result['feedback'].append('Password must contain at least one lowercase letter')
 
     # Check for digit
-    if any(c.isdigit() for c in password):
+    if has_digit:
         result['requirements_met']['digit'] = True
         result['score'] += 20
     else:
@@ -188,8 +286,7 @@ def validate_password_strength(password: str) -> Dict[str, Any]:
         result['feedback'].append('Password must contain at least one digit')
 
     # Check for special character
-    special_chars = "!@#$%^&*()_+-=[]{}|;:,.<>?"
-    if any(c in special_chars for c in password):
+    if has_special:
         result['requirements_met']['special'] = True
         result['score'] += 20
     else:
@@ -199,7 +296,7 @@ def validate_password_strength(password: str) -> Dict[str, Any]:
     # Additional strength checks
     if len(password) >= 12:
         result['score'] += 10
-    if len(set(password)) >= len(password) * 0.7:  # Character diversity
+    if len(distinct_chars) >= len(password) * 0.7:  # Character diversity
         result['score'] += 10
 
     return result
@@ -216,8 +313,7 @@ def generate_username(department_name: str) -> str:
         base_username = base_username[:15]
 
     # Check if username exists and add number if needed
-    users = get_users()
-    existing_usernames = [u.get('username', '') for u in users]
+    existing_usernames = get_index('users', 'username')
 
     username = f"{base_username}_user"
     counter = 1
@@ -230,32 +326,26 @@ def generate_username(department_name: str) -> str:
 
 def generate_secure_password(length: int = 12) -> str:
     """Generate a secure random password"""
-    # Define character sets
-    lowercase = string.ascii_lowercase
-    uppercase = string.ascii_uppercase
-    digits = string.digits
-    special = "!@#$%^&*"
-
-    # Ensure at least one character from each set
-    password = [
-        secrets.choice(lowercase),
-        secrets.choice(uppercase),
-        secrets.choice(digits),
-        secrets.choice(special)
-    ]
-
-    # Fill the rest with random characters from all sets
-    all_chars = lowercase + uppercase + digits + special
-    for _ in range(length - 4):
-        password.append(secrets.choice(all_chars))
-
-    # Shuffle the password list
-    secrets.SystemRandom().shuffle(password)
-    return ''.join(password)
+    # Room for at least one character from each set
+    length = max(length, len(_PASSWORD_CLASSES))
+
+    # Draw all characters from one read of random bytes, skipping the bytes
+    # that would favour the start of the alphabet, until every set is covered
+    while True:
+        password = [
+            _PASSWORD_ALPHABET[byte % len(_PASSWORD_ALPHABET)]
+            for byte in secrets.token_bytes(length * 2)
+            if byte < _PASSWORD_BYTE_LIMIT
+        ][:length]
+        if len(password) == length and all(
+            not char_class.isdisjoint(password) for char_class in _PASSWORD_CLASSES
+        ):
+            return ''.join(password)
 
 
 def save_user(user_data: Dict) -> str:
     """Save new user with enhanced security validation and password hashing"""
+    now = datetime.now().isoformat()
     users = get_users()
 
     # Validate required fields
@@ -264,32 +354,31 @@ def save_user(user_data: Dict) -> str:
         if not user_data.get(field):
             raise ValueError(f"Field '{field}' is required")
 
-    # Check for duplicate username
-    existing_usernames = [u.get('username', '') for u in users]
-    if user_data.get('username') in existing_usernames:
+    # Check for duplicate username against the cached username index
+    if user_data.get('username') in get_index('users', 'username'):
         raise ValueError(f"Username '{user_data.get('username')}' already exists")
 
     # Validate username format
     username = user_data.get('username', '')
     if len(username) < 3:
         raise ValueError("Username must be at least 3 characters long")
-    if not username.replace('_', '').replace('-', '').isalnum():
+    if not _USERNAME_RE.fullmatch(username):
         raise ValueError("Username can only contain letters, numbers, hyphens, and underscores")
 
-    # Validate password strength
-    password = user_data.get('password', '')
-    password_validation = validate_password_strength(password)
-    if not password_validation['is_valid']:
-        raise ValueError(f"Password validation failed: {'; '.join(password_validation['feedback'])}")
+    # Validate and hash the password unless it is already hashed (e.g. restored users)
+    password = user_data['password']
+    password_strength_score = None
+    if not is_password_hash(password):
+        password_validation = validate_password_strength(password)
+        if not password_validation['is_valid']:
+            raise ValueError(f"Password validation failed: {'; '.join(password_validation['feedback'])}")
+        password_strength_score = password_validation['score']
+        user_data['password'] = hash_password(password)
 
     # Generate user ID
     user_id = generate_id('users')
     user_data['id'] = user_id
-    user_data['created_at'] = datetime.now().isoformat()
-
-    # Hash password if it's not already hashed
-    if 'password' in user_data and not user_data['password'].startswith('pbkdf2:sha256:'):
-        user_data['password'] = generate_password_hash(user_data['password'])
+    user_data['created_at'] = now
 
     # Set default security values
     user_data.setdefault('role', 'department_user')
@@ -297,7 +386,7 @@ def save_user(user_data: Dict) -> str:
     user_data.setdefault('email', f"{user_data.get('username', '')}@hospital.com")
     user_data.setdefault('failed_login_attempts', 0)
     user_data.setdefault('account_locked', False)
-    user_data.setdefault('password_changed_at', datetime.now().isoformat())
+    user_data.setdefault('password_changed_at', now)
     user_data.setdefault('must_change_password', False)
 
     users.append(user_data)
@@ -309,7 +398,7 @@ def save_user(user_data: Dict) -> str:
         'role': user_data.get('role'),
         'department_id': user_data.get('department_id'),
         'created_by': session.get('username', 'system'),
-        'password_strength_score': password_validation['score']
+        'password_strength_score': password_strength_score
     })
 
     return user_id
@@ -317,50 +406,45 @@ def save_user(user_data: Dict) -> str:
 
 def update_user(user_id: str, user_data: Dict):
     """Update existing user with enhanced security validation"""
+    now = datetime.now().isoformat()
     users = get_users()
-    user_found = False
-    original_user = None
-
-    for i, user in enumerate(users):
-        if user['id'] == user_id:
-            original_user = user.copy()
-
-            # Validate username if being updated
-            if 'username' in user_data:
-                username = user_data['username']
-                if len(username) < 3:
-                    raise ValueError("Username must be at least 3 characters long")
-                if not username.replace('_', '').replace('-', '').isalnum():
-                    raise ValueError("Username can only contain letters, numbers, hyphens, and underscores")
-
-                # Check for duplicate username (excluding current user)
-                existing_usernames = [u.get('username', '') for u in users if u['id'] != user_id]
-                if username in existing_usernames:
-                    raise ValueError(f"Username '{username}' already exists")
-
-            # Validate and hash password if provided
-            if 'password' in user_data and user_data['password']:
-                if not user_data['password'].startswith('pbkdf2:sha256:'):
-                    # Validate password strength
-                    password_validation = validate_password_strength(user_data['password'])
-                    if not password_validation['is_valid']:
-                        raise ValueError(f"Password validation failed: {'; '.join(password_validation['feedback'])}")
-
-                    # Hash the password
-                    user_data['password'] = generate_password_hash(user_data['password'])
-                    user_data['password_changed_at'] = datetime.now().isoformat()
-                    user_data['must_change_password'] = False
-
-            # Update user data
-            user_data['id'] = user_id
-            user_data['updated_at'] = datetime.now().isoformat()
-            users[i] = {**user, **user_data}
-            user_found = True
-            break
-
-    if not user_found:
+    user = next((u for u in users if u['id'] == user_id), None)
+
+    if user is None:
         raise ValueError(f"User with ID '{user_id}' not found")
 
+    original_user = user.copy()
+
+    # Validate username if being updated
+    if 'username' in user_data:
+        username = user_data['username']
+        if len(username) < 3:
+            raise ValueError("Username must be at least 3 characters long")
+        if not _USERNAME_RE.fullmatch(username):
+            raise ValueError("Username can only contain letters, numbers, hyphens, and underscores")
+
+        # Check for duplicate username (excluding current user)
+        if any(u.get('username') == username and u['id'] != user_id for u in users):
+            raise ValueError(f"Username '{username}' already exists")
+
+    # Validate and hash password if provided
+    if 'password' in user_data and user_data['password']:
+        if not is_password_hash(user_data['password']):
+            # Validate password strength
+            password_validation = validate_password_strength(user_data['password'])
+            if not password_validation['is_valid']:
+                raise ValueError(f"Password validation failed: {'; '.join(password_validation['feedback'])}")
+
+            # Hash the password
+            user_data['password'] = hash_password(user_data['password'])
+            user_data['password_changed_at'] = now
+            user_data['must_change_password'] = False
+
+    # Update user data
+    user_data['id'] = user_id
+    user_data['updated_at'] = now
+    user.update(user_data)
+
     save_data('users', users)
 
     # Log activity with detailed changes
@@ -390,13 +474,12 @@ def delete_user(user_id: str):
 
     # Prevent deletion of admin users if it's the last admin
     if user_to_delete.get('role') == 'admin':
-        admin_count = len([u for u in users if u.get('role') == 'admin'])
+        admin_count = sum(1 for u in users if u.get('role') == 'admin')
         if admin_count <= 1:
             raise ValueError("Cannot delete the last admin user")
 
-    # Remove user
-    users = [u for u in users if u['id'] != user_id]
-    save_data('users', users)
+    # Remove user in place; the renumbering below saves the list
+    users.remove(user_to_delete)
 
     # Log activity
     log_activity('DELETE', 'user', user_id, {
@@ -405,20 +488,18 @@ def delete_user(user_id: str):
     })
 
     # Renumber users and cascade update all references (protect default admin users)
-    id_mapping = renumber_ids('users', protect_ids=['01', '02'])
-    cascade_update_user_references(id_mapping)
+    renumber_after_delete('users', protect_ids=['01', '02'],
+                          cascade=cascade_update_user_references, data=users)
 
 
 def get_user_by_id(user_id: str) -> Optional[Dict]:
-    """Get user by ID"""
-    users = get_users()
-    return next((u for u in users if u['id'] == user_id), None)
+    """Get user by ID (read-only; use update_user to change it)"""
+    return get_by_id('users', user_id)
 
 
 def get_user_by_username(username: str) -> Optional[Dict]:
-    """Get user by username"""
-    users = get_users()
-    return next((u for u in users if u.get('username') == username), None)
+    """Get user by username (read-only; use update_user to change it)"""
+    return get_index('users', 'username').get(username)
 
 
 def get_users_by_department(department_id: str) -> List[Dict]:
@@ -457,26 +538,49 @@ def create_department_user(department_id: str, department_name: str) -> Dict:
 
 
 def delete_department_users(department_id: str):
-    """Delete all users associated with a department"""
+    """Delete all users associated with a department
+
+    Removes them with one load and save and renumbers once at the end;
+    deleting them one by one would renumber between deletions and shift
+    the ids of the users still to be deleted.
+    """
     users = get_users()
-    department_users = [u for u in users if u.get('department_id') == department_id]
+    admin_count = sum(1 for u in users if u.get('role') == 'admin')
 
-    deleted_users = []
-    for user in department_users:
-        try:
-            delete_user(user['id'])
-            deleted_users.append(user['username'])
-        except ValueError as e:
+    kept_users = []
+    removed_users = []
+    for user in users:
+        if user.get('department_id') != department_id:
+            kept_users.append(user)
+        elif user.get('role') == 'admin' and admin_count <= 1:
             # Log error but continue with other users
-            print(f"Error deleting user {user['username']}: {e}")
+            print(f"Error deleting user {user['username']}: Cannot delete the last admin user")
+            kept_users.append(user)
+        else:
+            if user.get('role') == 'admin':
+                admin_count -= 1
+            removed_users.append(user)
+
+    if not removed_users:
+        return []
+
+    for user in removed_users:
+        log_activity('DELETE', 'user', user['id'], {
+            'username': user.get('username'),
+            'role': user.get('role')
+        })
+
+    # Renumber users and cascade update all references (protect default admin users)
+    renumber_after_delete('users', protect_ids=['01', '02'],
+                          cascade=cascade_update_user_references, data=kept_users)
 
-    return deleted_users
+    return [user['username'] for user in removed_users]
 
 
 __all__ = [
     'get_users', 'validate_user', 'save_user', 'update_user', 'delete_user',
     'get_user_by_id', 'get_user_by_username', 'get_users_by_department',
-    'handle_failed_login', 'unlock_user_account', 'validate_password_strength',
-    'generate_username', 'generate_secure_password', 'create_department_user',
-    'delete_department_users',
+    'handle_failed_login', 'unlock_user_account', 'is_password_hash', 'hash_password',
+    'validate_password_strength', 'generate_username', 'generate_secure_password',
+    'create_department_user', 'delete_department_users',
 ]
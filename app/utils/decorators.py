@@ -13,6 +13,39 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def _role_required(roles: frozenset, message: str, denied_endpoint: str):
+    """Build a decorator that requires login and a role in roles
+
+    The session proxy is resolved once per request for both checks.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            current_session = session._get_current_object()
+            if 'user_id' not in current_session:
+                return redirect(url_for('auth.login'))
+
+            if current_session.get('role') not in roles:
+                flash(message, 'error')
+                return redirect(url_for(denied_endpoint))
+
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+_admin_only = _role_required(
+    frozenset({'admin'}), 'Admin access required for this page.', 'dashboard.index'
+)
+_department_user_only = _role_required(
+    frozenset({'department_user'}), 'Department user access required for this page.', 'dashboard.index'
+)
+_admin_or_department_user = _role_required(
+    frozenset({'admin', 'department_user'}),
+    'Access denied. Admin or department user role required.', 'auth.login'
+)
+
+
 def login_required(f):
     """Decorator to require login"""
     @wraps(f)
@@ -25,47 +58,17 @@ def login_required(f):
 
 def admin_required(f):
     """Decorator to require admin role"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-
-        if session.get('role') != 'admin':
-            flash('Admin access required for this page.', 'error')
-            return redirect(url_for('dashboard.index'))
-
-        return f(*args, **kwargs)
-    return decorated_function
+    return _admin_only(f)
 
 
 def department_user_required(f):
     """Decorator to require department user role"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-
-        if session.get('role') != 'department_user':
-            flash('Department user access required for this page.', 'error')
-            return redirect(url_for('dashboard.index'))
-
-        return f(*args, **kwargs)
-    return decorated_function
+    return _department_user_only(f)
 
 
 def admin_or_department_user_required(f):
     """Decorator to require admin or department user role"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-
-        if session.get('role') not in ['admin', 'department_user']:
-            flash('Access denied. Admin or department user role required.', 'error')
-            return redirect(url_for('auth.login'))
-
-        return f(*args, **kwargs)
-    return decorated_function
+    return _admin_or_department_user(f)
 
 
 def restrict_department_user_action(action_name):
@@ -73,10 +76,11 @@ def restrict_department_user_action(action_name):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if 'user_id' not in session:
+            current_session = session._get_current_object()
+            if 'user_id' not in current_session:
                 return redirect(url_for('auth.login'))
 
-            if session.get('role') == 'department_user':
+            if current_session.get('role') == 'department_user':
                 flash(f'Department users cannot perform {action_name} operations.', 'error')
                 return redirect(request.referrer or url_for('dashboard.index'))
 
@@ -86,18 +90,22 @@ def restrict_department_user_action(action_name):
 
 
 def log_execution_time(f):
-    """Decorator to log function execution time for performance monitoring"""
+    """Decorator to log function execution time for performance monitoring
+
+    The time is always measured, since failures are logged with it at
+    ERROR level; the messages are only formatted if they are emitted.
+    """
     @wraps(f)
     def decorated_function(*args, **kwargs):
         start_time = perf_counter()
         try:
             result = f(*args, **kwargs)
             execution_time = perf_counter() - start_time
-            logger.debug(f"{f.__name__} executed in {execution_time:.4f}s")
+            logger.debug("%s executed in %.4fs", f.__name__, execution_time)
             return result
         except Exception as e:
             execution_time = perf_counter() - start_time
-            logger.error(f"{f.__name__} failed after {execution_time:.4f}s: {str(e)}")
+            logger.error("%s failed after %.4fs: %s", f.__name__, execution_time, e)
             raise
     return decorated_function
 
@@ -106,7 +114,8 @@ def log_request(f):
     """Decorator to log incoming request details"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user_id = session.get('user_id', 'anonymous')
-        logger.info(f"Request: {f.__name__} by user {user_id}")
+        # Skip the session lookup entirely when INFO records are dropped
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Request: %s by user %s", f.__name__, session.get('user_id', 'anonymous'))
         return f(*args, **kwargs)
     return decorated_function
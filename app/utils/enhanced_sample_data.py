@@ -3,15 +3,21 @@ Enhanced Sample Data Generator for Hospital Pharmacy Management System
 Creates 5 records for each section and provides backup with CSV exports in ZIP format
 """
 
+import io
 import json
 import os
 import csv
 import zipfile
-import shutil
 from datetime import datetime, timedelta
 import random
-import tempfile
-from app.utils.database import DATA_DIR, DB_FILES, generate_id
+from app.utils.database import DATA_DIR, DB_FILES, generate_id, load_data, save_data
+
+# Compress backup ZIP entries with Zstandard where zipfile supports it (Python 3.14+),
+# e.g. BACKUP_ZIP_ZSTD=True; many unzip tools cannot open such archives
+if os.environ.get('BACKUP_ZIP_ZSTD', 'False') == 'True' and hasattr(zipfile, 'ZIP_ZSTD'):
+    BACKUP_COMPRESSION, BACKUP_COMPRESSLEVEL = zipfile.ZIP_ZSTD, 3
+else:
+    BACKUP_COMPRESSION, BACKUP_COMPRESSLEVEL = zipfile.ZIP_DEFLATED, None
 
 class EnhancedSampleDataGenerator:
     def __init__(self):
@@ -23,39 +29,31 @@ class EnhancedSampleDataGenerator:
         zip_filename = f'pharmacy_data_backup_{timestamp}.zip'
         zip_path = os.path.join(DATA_DIR, zip_filename)
 
-        # Create temporary directory for CSV files
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Export all data to CSV files
-            self.export_all_to_csv(temp_dir)
-
-            # Create ZIP file
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Add JSON files
-                for data_type, file_path in DB_FILES.items():
-                    if os.path.exists(file_path):
-                        zipf.write(file_path, f'json/{data_type}.json')
-
-                # Add CSV files
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        if file.endswith('.csv'):
-                            file_path = os.path.join(root, file)
-                            zipf.write(file_path, f'csv/{file}')
-
-                # Add backup metadata
-                metadata = {
-                    'backup_date': datetime.now().isoformat(),
-                    'backup_type': 'enhanced_sample_data',
-                    'description': 'Complete data backup with JSON and CSV formats',
-                    'version': '2.0.0',
-                    'files_included': list(DB_FILES.keys())
-                }
-                zipf.writestr('backup_metadata.json', json.dumps(metadata, indent=2))
+        with zipfile.ZipFile(zip_path, 'w', BACKUP_COMPRESSION,
+                             compresslevel=BACKUP_COMPRESSLEVEL) as zipf:
+            # Add JSON files, read through load_data so gzip and SQLite tables
+            # are backed up as plain JSON
+            for data_type in DB_FILES:
+                zipf.writestr(f'json/{data_type}.json',
+                              json.dumps(load_data(data_type), indent=2, ensure_ascii=False))
+
+            # Add CSV files, compressed as they are written
+            self.export_all_to_csv(zipf)
+
+            # Add backup metadata
+            metadata = {
+                'backup_date': datetime.now().isoformat(),
+                'backup_type': 'enhanced_sample_data',
+                'description': 'Complete data backup with JSON and CSV formats',
+                'version': '2.0.0',
+                'files_included': list(DB_FILES.keys())
+            }
+            zipf.writestr('backup_metadata.json', json.dumps(metadata, indent=2))
 
         return zip_path
 
-    def export_all_to_csv(self, output_dir):
-        """Export all data to CSV files"""
+    def export_all_to_csv(self, zipf):
+        """Export all data to CSV files under csv/ in an open ZIP file"""
         csv_exporters = {
             'medicines': self.export_medicines_csv,
             'patients': self.export_patients_csv,
@@ -72,18 +70,18 @@ class EnhancedSampleDataGenerator:
 
         for data_type, exporter in csv_exporters.items():
             try:
-                file_path = DB_FILES.get(data_type)
-                if file_path and os.path.exists(file_path):
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-
-                    csv_path = os.path.join(output_dir, f'{data_type}.csv')
-                    exporter(data, csv_path)
-                    print(f"Exported {data_type} to CSV: {len(data)} records")
+                data = load_data(data_type)
+                if not data:
+                    continue
+
+                with zipf.open(f'csv/{data_type}.csv', 'w', force_zip64=True) as raw, \
+                        io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+                    exporter(data, f)
+                print(f"Exported {data_type} to CSV: {len(data)} records")
             except Exception as e:
                 print(f"Error exporting {data_type} to CSV: {str(e)}")
 
-    def export_medicines_csv(self, data, csv_path):
+    def export_medicines_csv(self, data, f):
         """Export medicines data to CSV"""
         if not data:
             return
@@ -91,15 +89,14 @@ class EnhancedSampleDataGenerator:
         fieldnames = ['id', 'name', 'supplier_id', 'category', 'form_dosage', 'strength',
                      'low_stock_limit', 'unit_price', 'notes', 'created_at']
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for record in data:
-                # Only write fields that exist in fieldnames
-                filtered_record = {k: v for k, v in record.items() if k in fieldnames}
-                writer.writerow(filtered_record)
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for record in data:
+            # Only write fields that exist in fieldnames
+            filtered_record = {k: v for k, v in record.items() if k in fieldnames}
+            writer.writerow(filtered_record)
 
-    def export_patients_csv(self, data, csv_path):
+    def export_patients_csv(self, data, f):
         """Export patients data to CSV"""
         if not data:
             return
@@ -107,14 +104,13 @@ class EnhancedSampleDataGenerator:
         fieldnames = ['id', 'name', 'age', 'gender', 'phone', 'address',
                      'medical_history', 'allergies', 'created_at']
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for record in data:
-                filtered_record = {k: v for k, v in record.items() if k in fieldnames}
-                writer.writerow(filtered_record)
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for record in data:
+            filtered_record = {k: v for k, v in record.items() if k in fieldnames}
+            writer.writerow(filtered_record)
 
-    def export_suppliers_csv(self, data, csv_path):
+    def export_suppliers_csv(self, data, f):
         """Export suppliers data to CSV"""
         if not data:
             return
@@ -122,14 +118,13 @@ class EnhancedSampleDataGenerator:
         fieldnames = ['id', 'name', 'contact_person', 'phone', 'email',
                      'address', 'city', 'created_at']
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for record in data:
-                filtered_record = {k: v for k, v in record.items() if k in fieldnames}
-                writer.writerow(filtered_record)
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for record in data:
+            filtered_record = {k: v for k, v in record.items() if k in fieldnames}
+            writer.writerow(filtered_record)
 
-    def export_departments_csv(self, data, csv_path):
+    def export_departments_csv(self, data, f):
         """Export departments data to CSV"""
         if not data:
             return
@@ -137,14 +132,13 @@ class EnhancedSampleDataGenerator:
         fieldnames = ['id', 'name', 'description', 'responsible_person',
                      'telephone', 'notes', 'created_at']
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for record in data:
-                filtered_record = {k: v for k, v in record.items() if k in fieldnames}
-                writer.writerow(filtered_record)
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for record in data:
+            filtered_record = {k: v for k, v in record.items() if k in fieldnames}
+            writer.writerow(filtered_record)
 
-    def export_doctors_csv(self, data, csv_path):
+    def export_doctors_csv(self, data, f):
         """Export doctors data to CSV"""
         if not data:
             return
@@ -153,160 +147,155 @@ class EnhancedSampleDataGenerator:
                      'position', 'type', 'mobile_no', 'email', 'license_number', 'note',
                      'created_at', 'updated_at']
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for record in data:
-                filtered_record = {k: v for k, v in record.items() if k in fieldnames}
-                writer.writerow(filtered_record)
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for record in data:
+            filtered_record = {k: v for k, v in record.items() if k in fieldnames}
+            writer.writerow(filtered_record)
 
-    def export_stores_csv(self, data, csv_path):
+    def export_stores_csv(self, data, f):
         """Export stores data to CSV"""
         if not data:
             return
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Store ID', 'Store Name', 'Department ID', 'Location',
-                           'Medicine ID', 'Medicine Stock', 'Created At'])
-
-            for store in data:
-                inventory = store.get('inventory', {})
-                if inventory:
-                    for med_id, stock in inventory.items():
-                        writer.writerow([
-                            store.get('id', ''),
-                            store.get('name', ''),
-                            store.get('department_id', ''),
-                            store.get('location', ''),
-                            med_id,
-                            stock,
-                            store.get('created_at', '')
-                        ])
-                else:
+        writer = csv.writer(f)
+        writer.writerow(['Store ID', 'Store Name', 'Department ID', 'Location',
+                       'Medicine ID', 'Medicine Stock', 'Created At'])
+
+        for store in data:
+            inventory = store.get('inventory', {})
+            if inventory:
+                for med_id, stock in inventory.items():
                     writer.writerow([
                         store.get('id', ''),
                         store.get('name', ''),
                         store.get('department_id', ''),
                         store.get('location', ''),
-                        '', '',
+                        med_id,
+                        stock,
                         store.get('created_at', '')
                     ])
-
-    def export_purchases_csv(self, data, csv_path):
+            else:
+                writer.writerow([
+                    store.get('id', ''),
+                    store.get('name', ''),
+                    store.get('department_id', ''),
+                    store.get('location', ''),
+                    '', '',
+                    store.get('created_at', '')
+                ])
+
+    def export_purchases_csv(self, data, f):
         """Export purchases data to CSV"""
         if not data:
             return
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Purchase ID', 'Supplier ID', 'Invoice Number', 'Purchase Date',
-                           'Medicine ID', 'Quantity', 'Unit Price', 'Total Price',
-                           'Status', 'Notes', 'Created At'])
-
-            for purchase in data:
-                medicines = purchase.get('medicines', [])
-                if medicines:
-                    for med in medicines:
-                        writer.writerow([
-                            purchase.get('id', ''),
-                            purchase.get('supplier_id', ''),
-                            purchase.get('invoice_number', ''),
-                            purchase.get('purchase_date', ''),
-                            med.get('medicine_id', ''),
-                            med.get('quantity', ''),
-                            med.get('unit_price', ''),
-                            med.get('total_price', ''),
-                            purchase.get('status', ''),
-                            purchase.get('notes', ''),
-                            purchase.get('created_at', '')
-                        ])
-                else:
+        writer = csv.writer(f)
+        writer.writerow(['Purchase ID', 'Supplier ID', 'Invoice Number', 'Purchase Date',
+                       'Medicine ID', 'Quantity', 'Unit Price', 'Total Price',
+                       'Status', 'Notes', 'Created At'])
+
+        for purchase in data:
+            medicines = purchase.get('medicines', [])
+            if medicines:
+                for med in medicines:
                     writer.writerow([
                         purchase.get('id', ''),
                         purchase.get('supplier_id', ''),
                         purchase.get('invoice_number', ''),
                         purchase.get('purchase_date', ''),
-                        '', '', '', '',
+                        med.get('medicine_id', ''),
+                        med.get('quantity', ''),
+                        med.get('unit_price', ''),
+                        med.get('total_price', ''),
                         purchase.get('status', ''),
                         purchase.get('notes', ''),
                         purchase.get('created_at', '')
                     ])
-
-    def export_consumption_csv(self, data, csv_path):
+            else:
+                writer.writerow([
+                    purchase.get('id', ''),
+                    purchase.get('supplier_id', ''),
+                    purchase.get('invoice_number', ''),
+                    purchase.get('purchase_date', ''),
+                    '', '', '', '',
+                    purchase.get('status', ''),
+                    purchase.get('notes', ''),
+                    purchase.get('created_at', '')
+                ])
+
+    def export_consumption_csv(self, data, f):
         """Export consumption data to CSV"""
         if not data:
             return
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Consumption ID', 'Patient ID', 'Date', 'Medicine ID',
-                           'Quantity', 'Prescribed By', 'Notes', 'Created At'])
-
-            for consumption in data:
-                medicines = consumption.get('medicines', [])
-                if medicines:
-                    for med in medicines:
-                        writer.writerow([
-                            consumption.get('id', ''),
-                            consumption.get('patient_id', ''),
-                            consumption.get('date', ''),
-                            med.get('medicine_id', ''),
-                            med.get('quantity', ''),
-                            consumption.get('prescribed_by', ''),
-                            consumption.get('notes', ''),
-                            consumption.get('created_at', '')
-                        ])
-                else:
+        writer = csv.writer(f)
+        writer.writerow(['Consumption ID', 'Patient ID', 'Date', 'Medicine ID',
+                       'Quantity', 'Prescribed By', 'Notes', 'Created At'])
+
+        for consumption in data:
+            medicines = consumption.get('medicines', [])
+            if medicines:
+                for med in medicines:
                     writer.writerow([
                         consumption.get('id', ''),
                         consumption.get('patient_id', ''),
                         consumption.get('date', ''),
-                        '', '',
+                        med.get('medicine_id', ''),
+                        med.get('quantity', ''),
                         consumption.get('prescribed_by', ''),
                         consumption.get('notes', ''),
                         consumption.get('created_at', '')
                     ])
-
-    def export_transfers_csv(self, data, csv_path):
+            else:
+                writer.writerow([
+                    consumption.get('id', ''),
+                    consumption.get('patient_id', ''),
+                    consumption.get('date', ''),
+                    '', '',
+                    consumption.get('prescribed_by', ''),
+                    consumption.get('notes', ''),
+                    consumption.get('created_at', '')
+                ])
+
+    def export_transfers_csv(self, data, f):
         """Export transfers data to CSV"""
         if not data:
             return
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Transfer ID', 'Source Store ID', 'Destination Store ID',
-                           'Medicine ID', 'Quantity', 'Transfer Date', 'Status',
-                           'Notes', 'Created At'])
-
-            for transfer in data:
-                medicines = transfer.get('medicines', [])
-                if medicines:
-                    for med in medicines:
-                        writer.writerow([
-                            transfer.get('id', ''),
-                            transfer.get('source_store_id', ''),
-                            transfer.get('destination_store_id', ''),
-                            med.get('medicine_id', ''),
-                            med.get('quantity', ''),
-                            transfer.get('transfer_date', ''),
-                            transfer.get('status', ''),
-                            transfer.get('notes', ''),
-                            transfer.get('created_at', '')
-                        ])
-                else:
+        writer = csv.writer(f)
+        writer.writerow(['Transfer ID', 'Source Store ID', 'Destination Store ID',
+                       'Medicine ID', 'Quantity', 'Transfer Date', 'Status',
+                       'Notes', 'Created At'])
+
+        for transfer in data:
+            medicines = transfer.get('medicines', [])
+            if medicines:
+                for med in medicines:
                     writer.writerow([
                         transfer.get('id', ''),
                         transfer.get('source_store_id', ''),
                         transfer.get('destination_store_id', ''),
-                        '', '',
+                        med.get('medicine_id', ''),
+                        med.get('quantity', ''),
                         transfer.get('transfer_date', ''),
                         transfer.get('status', ''),
                         transfer.get('notes', ''),
                         transfer.get('created_at', '')
                     ])
-
-    def export_users_csv(self, data, csv_path):
+            else:
+                writer.writerow([
+                    transfer.get('id', ''),
+                    transfer.get('source_store_id', ''),
+                    transfer.get('destination_store_id', ''),
+                    '', '',
+                    transfer.get('transfer_date', ''),
+                    transfer.get('status', ''),
+                    transfer.get('notes', ''),
+                    transfer.get('created_at', '')
+                ])
+
+    def export_users_csv(self, data, f):
         """Export users data to CSV"""
         if not data:
             return
@@ -314,15 +303,14 @@ class EnhancedSampleDataGenerator:
         fieldnames = ['id', 'username', 'role', 'name', 'email',
                      'department_id', 'created_at']
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for record in data:
-                # Exclude password for security
-                filtered_record = {k: v for k, v in record.items() if k in fieldnames}
-                writer.writerow(filtered_record)
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for record in data:
+            # Exclude password for security
+            filtered_record = {k: v for k, v in record.items() if k in fieldnames}
+            writer.writerow(filtered_record)
 
-    def export_history_csv(self, data, csv_path):
+    def export_history_csv(self, data, f):
         """Export history data to CSV"""
         if not data:
             return
@@ -330,15 +318,14 @@ class EnhancedSampleDataGenerator:
         fieldnames = ['id', 'action', 'entity_type', 'entity_id', 'user_id',
                      'timestamp', 'details']
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for record in data:
-                # Convert details dict to string if needed
-                if 'details' in record and isinstance(record['details'], dict):
-                    record['details'] = json.dumps(record['details'])
-                filtered_record = {k: v for k, v in record.items() if k in fieldnames}
-                writer.writerow(filtered_record)
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for record in data:
+            # Convert details dict to string if needed
+            if 'details' in record and isinstance(record['details'], dict):
+                record['details'] = json.dumps(record['details'])
+            filtered_record = {k: v for k, v in record.items() if k in fieldnames}
+            writer.writerow(filtered_record)
 
     def safe_backup_and_save(self, data_type, data):
         """Safely backup existing data and save new data"""
@@ -346,30 +333,31 @@ class EnhancedSampleDataGenerator:
         if not file_path:
             return
 
-        # Create backup if file exists
-        if os.path.exists(file_path):
+        # Back up the current table as plain JSON, whatever it is stored as
+        existing = load_data(data_type)
+        if existing:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_path = file_path.replace('.json', f'_backup_{timestamp}.json')
+            backup_dir = os.path.dirname(file_path)
+            backup_path = os.path.join(backup_dir, f'{data_type}_backup_{timestamp}.json')
 
             # Ensure backup doesn't already exist
             counter = 1
             while os.path.exists(backup_path):
-                backup_path = file_path.replace('.json', f'_backup_{timestamp}_{counter}.json')
+                backup_path = os.path.join(backup_dir, f'{data_type}_backup_{timestamp}_{counter}.json')
                 counter += 1
 
             try:
-                shutil.copy2(file_path, backup_path)
-                print(f"Backed up existing {data_type}.json to {os.path.basename(backup_path)}")
+                with open(backup_path, 'w', encoding='utf-8') as f:
+                    json.dump(existing, f, indent=2, ensure_ascii=False)
+                print(f"Backed up existing {data_type} to {os.path.basename(backup_path)}")
             except Exception as e:
-                print(f"Warning: Could not backup {data_type}.json: {str(e)}")
+                print(f"Warning: Could not backup {data_type}: {str(e)}")
 
         # Save new data
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+        if save_data(data_type, data):
             print(f"Generated {len(data)} {data_type} records")
-        except Exception as e:
-            print(f"Error saving {data_type}.json: {str(e)}")
+        else:
+            print(f"Error saving {data_type}")
 
     def generate_sample_data(self):
         """Generate sample data with 5 records for each section"""
@@ -0,0 +1,11 @@
+"""
+Shared Model Helpers
+Dataclass options common to all entity models
+"""
+
+import sys
+
+# Slotted dataclasses drop the per-instance __dict__, which cuts memory and
+# speeds attribute access when many records are held at once.
+# dataclass(slots=True) needs Python 3.10+.
+DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
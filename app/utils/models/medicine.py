@@ -2,12 +2,14 @@
 Medicine Data Model
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from typing import Optional, List
 
+from .base import DATACLASS_OPTIONS
 
-@dataclass
+
+@dataclass(**DATACLASS_OPTIONS)
 class Medicine:
     """Medicine entity model"""
     id: str
@@ -24,7 +26,7 @@ class Medicine:
 
     def to_dict(self) -> dict:
         """Convert to dictionary"""
-        return {k: v for k, v in self.__dict__.items()}
+        return {f.name: getattr(self, f.name) for f in fields(self)}
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Medicine':
@@ -2,12 +2,14 @@
 Patient Data Model
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from typing import Optional
 
+from .base import DATACLASS_OPTIONS
 
-@dataclass
+
+@dataclass(**DATACLASS_OPTIONS)
 class Patient:
     """Patient entity model"""
     id: str
@@ -22,7 +24,7 @@ class Patient:
 
     def to_dict(self) -> dict:
         """Convert to dictionary"""
-        return {k: v for k, v in self.__dict__.items()}
+        return {f.name: getattr(self, f.name) for f in fields(self)}
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Patient':
@@ -2,12 +2,14 @@
 Purchase Data Model
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from typing import List, Dict, Optional
 
+from .base import DATACLASS_OPTIONS
 
-@dataclass
+
+@dataclass(**DATACLASS_OPTIONS)
 class Purchase:
     """Purchase entity model"""
     id: str
@@ -23,7 +25,7 @@ class Purchase:
 
     def to_dict(self) -> dict:
         """Convert to dictionary"""
-        return {k: v for k, v in self.__dict__.items()}
+        return {f.name: getattr(self, f.name) for f in fields(self)}
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Purchase':
@@ -15,6 +15,8 @@ from collections import defaultdict
 import weakref
 import hashlib
 
+from app.utils.database.base import _loads, _dumps
+
 # Thread-safe file locking
 _file_locks = defaultdict(threading.RLock)
 
@@ -133,8 +135,8 @@ class OptimizedDatabase:
         # Use file locking for thread safety
         with _file_locks[file_path]:
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with open(file_path, 'rb') as f:
+                    data = _loads(f.read())
 
                 # Update cache and hash
                 if use_cache:
@@ -160,8 +162,8 @@ class OptimizedDatabase:
                     os.rename(file_path, backup_path)
 
                 # Write new data
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
+                with open(file_path, 'wb') as f:
+                    f.write(_dumps(data))
 
                 # Update cache
                 if update_cache:
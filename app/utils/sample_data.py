@@ -7,7 +7,7 @@ import json
 import os
 from datetime import datetime, timedelta
 import random
-from app.utils.database import DATA_DIR, DB_FILES, generate_id
+from app.utils.database import DATA_DIR, DB_FILES, generate_id, load_data, save_data
 
 def generate_sample_data():
     """Generate comprehensive sample data for the system"""
@@ -392,17 +392,16 @@ def save_sample_data():
     # Save each data type to its respective file
     for data_type, data in sample_data.items():
         if data_type in DB_FILES:
-            file_path = DB_FILES[data_type]
-
-            # Create backup of existing data
-            if os.path.exists(file_path):
-                backup_path = file_path.replace('.json', '_backup.json')
-                os.rename(file_path, backup_path)
+            # Create backup of existing data, as plain JSON whatever the table is stored as
+            existing = load_data(data_type)
+            if existing:
+                backup_path = os.path.join(os.path.dirname(DB_FILES[data_type]), f'{data_type}_backup.json')
+                with open(backup_path, 'w', encoding='utf-8') as f:
+                    json.dump(existing, f, indent=2, ensure_ascii=False)
                 print(f"Backed up existing {data_type}.json to {data_type}_backup.json")
 
             # Save new data
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            save_data(data_type, data)
 
             print(f"Generated {len(data)} {data_type} records")
 
@@ -23,6 +23,12 @@ class TestCSRFProtection:
         assert 'header_name' in data
         assert 'form_name' in data
 
+    def test_csrf_token_reused_within_session(self, client):
+        """Test that repeated token requests return the same session token"""
+        first = client.get('/csrf-token').get_json()['csrf_token']
+        second = client.get('/csrf-token').get_json()['csrf_token']
+        assert first == second
+
     def test_csrf_protection_on_login(self, client):
         """Test CSRF protection on login endpoint"""
         # Attempt login without CSRF token
@@ -52,6 +58,33 @@ class TestCSRFProtection:
         # Should get proper response (even if credentials are wrong)
         assert response.status_code in [200, 302, 400, 401, 403]
 
+    def test_csrf_token_in_json_body(self, client):
+        """Test that a CSRF token supplied in the JSON body is accepted"""
+        csrf_token = client.get('/csrf-token').get_json()['csrf_token']
+
+        response = client.post('/auth/login',
+                               json={'username': 'test', 'password': 'test',
+                                     'csrf_token': csrf_token})
+
+        assert response.status_code != 403
+
+    def test_csrf_malformed_json_body_rejected(self, client):
+        """Test that an unparseable JSON body fails CSRF validation cleanly"""
+        client.get('/csrf-token')
+
+        response = client.post('/auth/login', data='{not json',
+                               content_type='application/json')
+
+        assert response.status_code == 403
+
+    def test_csrf_non_object_json_body_rejected(self, client):
+        """Test that a JSON body that is not an object fails CSRF validation"""
+        client.get('/csrf-token')
+
+        response = client.post('/auth/login', json=['csrf_token'])
+
+        assert response.status_code == 403
+
     def test_csrf_token_validation(self, client):
         """Test CSRF token validation"""
         # Test with invalid CSRF token
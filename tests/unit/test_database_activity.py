@@ -0,0 +1,191 @@
+"""
+Unit tests for activity logging and history functions
+"""
+
+import pytest
+import json
+import os
+
+# Mark all tests in this module as unit tests
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def history_file(temp_dir):
+    """Point the history table at a temporary file"""
+    import app.utils.database.base as base_module
+    original_files = base_module.DB_FILES.copy()
+
+    test_file = os.path.join(temp_dir, 'history.json')
+    base_module.DB_FILES['history'] = test_file
+
+    def write(records):
+        with open(test_file, 'w') as f:
+            json.dump(records, f, indent=2)
+
+    yield write
+
+    base_module.DB_FILES = original_files
+
+
+class TestGetHistory:
+    """Test suite for get_history function"""
+
+    def test_get_history_newest_first_with_limit(self, history_file):
+        """Test that history is returned newest first and limited"""
+        from app.utils.database.activity import get_history
+
+        history_file([
+            {'id': '01', 'timestamp': '2024-01-01T10:00:00'},
+            {'id': '02', 'timestamp': '2024-01-03T10:00:00'},
+            {'id': '03', 'timestamp': '2024-01-02T10:00:00'}
+        ])
+
+        result = get_history(limit=2)
+        assert [h['id'] for h in result] == ['02', '03']
+
+    def test_get_history_filters(self, history_file):
+        """Test filtering by user and entity type"""
+        from app.utils.database.activity import get_history
+
+        history_file([
+            {'id': '01', 'user_id': '01', 'entity_type': 'medicine', 'timestamp': '2024-01-01'},
+            {'id': '02', 'user_id': '02', 'entity_type': 'medicine', 'timestamp': '2024-01-02'},
+            {'id': '03', 'user_id': '01', 'entity_type': 'patient', 'timestamp': '2024-01-03'}
+        ])
+
+        assert [h['id'] for h in get_history(user_id='01')] == ['03', '01']
+        assert [h['id'] for h in get_history(user_id='01', entity_type='medicine')] == ['01']
+
+
+class TestUserActivitySummary:
+    """Test suite for get_user_activity_summary function"""
+
+    def test_summary_for_user(self, history_file):
+        """Test action counts, entities and last login for one user"""
+        from app.utils.database.activity import get_user_activity_summary
+
+        history_file([
+            {'user_id': '01', 'action': 'LOGIN', 'timestamp': '2024-01-01'},
+            {'user_id': '01', 'action': 'UPDATE', 'entity_type': 'medicine', 'entity_id': '01'},
+            {'user_id': '01', 'action': 'UPDATE', 'entity_type': 'medicine', 'entity_id': '01'},
+            {'user_id': '01', 'action': 'UPDATE', 'entity_type': 'patient', 'entity_id': '01'},
+            {'user_id': '01', 'action': 'LOGIN', 'timestamp': '2024-01-05'},
+            {'user_id': '02', 'action': 'DELETE', 'entity_type': 'medicine', 'entity_id': '02'}
+        ])
+
+        summary = get_user_activity_summary('01')
+        assert summary['total_actions'] == 5
+        assert summary['last_login'] == '2024-01-05'
+        assert summary['most_common_action'] == 'UPDATE'
+        assert summary['entities_modified'] == 2
+        assert summary['action_breakdown'] == {'LOGIN': 2, 'UPDATE': 3}
+
+    def test_summary_for_user_without_history(self, history_file):
+        """Test the empty summary for a user with no activity"""
+        from app.utils.database.activity import get_user_activity_summary
+
+        history_file([{'user_id': '02', 'action': 'LOGIN'}])
+
+        summary = get_user_activity_summary('01')
+        assert summary['total_actions'] == 0
+        assert summary['most_common_action'] is None
+
+
+class TestUpdateHistoryRecord:
+    """Test suite for update_history_record function"""
+
+    def test_update_by_id_and_timestamp(self, history_file, temp_dir):
+        """Test updating records matched by id or by timestamp"""
+        from app.utils.database.activity import update_history_record
+
+        history_file([
+            {'id': '01', 'timestamp': '2024-01-01', 'details': {'a': 1}},
+            {'timestamp': '2024-01-02'}
+        ])
+
+        assert update_history_record('01', {'note': 'first'}) is True
+        assert update_history_record('2024-01-02', {'note': 'second'}) is True
+        assert update_history_record('99', {'note': 'missing'}) is False
+
+        with open(os.path.join(temp_dir, 'history.json')) as f:
+            history = json.load(f)
+        assert history[0]['details'] == {'a': 1, 'note': 'first'}
+        assert history[1]['details'] == {'note': 'second'}
+
+    def test_update_after_history_rewritten(self, history_file, temp_dir):
+        """Test that the lookup index follows changes to the history file"""
+        from app.utils.database.activity import update_history_record
+
+        history_file([{'id': '01'}, {'id': '02'}])
+        assert update_history_record('02', {'note': 'before'}) is True
+
+        history_file([{'id': '02'}])
+        assert update_history_record('02', {'note': 'after'}) is True
+
+        with open(os.path.join(temp_dir, 'history.json')) as f:
+            assert json.load(f) == [{'id': '02', 'details': {'note': 'after'}}]
+
+
+class TestLogActivity:
+    """Test suite for log_activity function"""
+
+    def test_log_activity_assigns_sequential_ids(self, app, history_file, temp_dir):
+        """Test that consecutive log entries get consecutive ids"""
+        from app.utils.database.activity import log_activity
+
+        history_file([{'id': '07', 'timestamp': '2024-01-01'}])
+
+        with app.test_request_context():
+            log_activity('CREATE', 'medicine', '01')
+            log_activity('UPDATE', 'medicine', '01')
+
+        with open(os.path.join(temp_dir, 'history.json')) as f:
+            assert [h['id'] for h in json.load(f)] == ['07', '08', '09']
+
+    def test_log_activity_after_history_rewritten(self, app, history_file, temp_dir):
+        """Test that ids follow changes made to the history file elsewhere"""
+        from app.utils.database.activity import log_activity
+
+        history_file([{'id': '01'}])
+        with app.test_request_context():
+            log_activity('CREATE', 'medicine', '01')
+
+        history_file([{'id': '20'}])
+        with app.test_request_context():
+            log_activity('CREATE', 'medicine', '02')
+
+        with open(os.path.join(temp_dir, 'history.json')) as f:
+            assert [h['id'] for h in json.load(f)] == ['20', '21']
+
+    def test_log_history_shares_id_sequence(self, app, history_file, temp_dir):
+        """Test that log_history and log_activity draw from the same id sequence"""
+        from app.utils.database.activity import log_activity
+        from app.utils.database.base import log_history
+
+        history_file([{'id': '01'}])
+        log_history('DELETE', 'medicines', '05', '01')
+        with app.test_request_context():
+            log_activity('CREATE', 'medicine', '06')
+
+        with open(os.path.join(temp_dir, 'history.json')) as f:
+            history = json.load(f)
+        assert [h['id'] for h in history] == ['01', '02', '03']
+        assert history[1]['table'] == 'medicines'
+
+    def test_async_log_activity_written_by_flush(self, app, history_file, temp_dir, monkeypatch):
+        """Test that queued entries keep their order and are written before reads"""
+        from app.utils.database import activity
+
+        monkeypatch.setattr(activity, 'ASYNC_ACTIVITY', True)
+        history_file([{'id': '01', 'timestamp': '2024-01-01'}])
+
+        with app.test_request_context():
+            for entity_id in ('01', '02', '03'):
+                activity.log_activity('CREATE', 'medicine', entity_id)
+
+        assert activity.flush_activity() is True
+        with open(os.path.join(temp_dir, 'history.json')) as f:
+            history = json.load(f)
+        assert [h['id'] for h in history] == ['01', '02', '03', '04']
+        assert [h.get('entity_id') for h in history[1:]] == ['01', '02', '03']
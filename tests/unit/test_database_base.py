@@ -113,6 +113,74 @@ class TestSaveData:
         finally:
             base_module.DB_FILES = original_files
 
+    def test_save_data_failure_keeps_existing_file(self, test_data_dir):
+        """Test that a failed save leaves the previous file contents intact"""
+        from app.utils.database.base import save_data
+
+        test_file = os.path.join(test_data_dir, 'atomic_test.json')
+        existing_data = [{'id': '01', 'name': 'Existing'}]
+        with open(test_file, 'w') as f:
+            json.dump(existing_data, f)
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['atomic_test'] = test_file
+
+        try:
+            # Sets are not JSON serializable, so the write fails part-way
+            result = save_data('atomic_test', [{'id': '02', 'tags': {'a'}}])
+            assert result is False
+
+            with open(test_file, 'r') as f:
+                assert json.load(f) == existing_data
+            assert not any(name.endswith('.tmp') for name in os.listdir(test_data_dir))
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_save_data_failed_replace_removes_temp_file(self, test_data_dir, monkeypatch):
+        """Test that a save failing at the final move leaves no temporary file behind"""
+        from app.utils.database.base import save_data
+
+        test_file = os.path.join(test_data_dir, 'replace_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([{'id': '01'}], f)
+
+        import app.utils.database.base as base_module
+        monkeypatch.setitem(base_module.DB_FILES, 'replace_test', test_file)
+
+        def failing_replace(src, dst):
+            raise OSError("replace failed")
+
+        monkeypatch.setattr(base_module.os, 'replace', failing_replace)
+
+        assert save_data('replace_test', [{'id': '02'}]) is False
+        with open(test_file, 'r') as f:
+            assert json.load(f) == [{'id': '01'}]
+        assert not any(name.endswith('.tmp') for name in os.listdir(test_data_dir))
+
+    @pytest.mark.parametrize('pretty', [True, False])
+    @pytest.mark.parametrize('use_orjson', [True, False])
+    def test_save_data_round_trip_unicode(self, test_data_dir, monkeypatch, use_orjson, pretty):
+        """Test that saved data loads back unchanged with either JSON backend and layout"""
+        from app.utils.database.base import save_data, load_data
+
+        import app.utils.database.base as base_module
+        if not use_orjson:
+            monkeypatch.setattr(base_module, 'orjson', None)
+        monkeypatch.setattr(base_module, 'PRETTY_JSON', pretty)
+
+        test_file = os.path.join(test_data_dir, 'unicode_test.json')
+        test_data = [{'id': '01', 'name': 'باراسيتامول', 'inventory': {'01': 5}, 'price': 1.5}]
+
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['unicode_test'] = test_file
+
+        try:
+            assert save_data('unicode_test', test_data) is True
+            assert load_data('unicode_test') == test_data
+        finally:
+            base_module.DB_FILES = original_files
+
     def test_save_data_invalid_file_type(self):
         """Test saving data with an invalid file type"""
         from app.utils.database.base import save_data
@@ -136,6 +204,179 @@ class TestSaveData:
         assert result is False
 
 
+class TestAppendData:
+    """Test suite for append_data function"""
+
+    def _append_and_read(self, test_file, records):
+        from app.utils.database.base import append_data
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['append_test'] = test_file
+
+        try:
+            for record in records:
+                assert append_data('append_test', record) is True
+            with open(test_file, 'r') as f:
+                return json.load(f)
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_append_data_empty_array(self, test_data_dir):
+        """Test appending to a file holding an empty array"""
+        test_file = os.path.join(test_data_dir, 'append_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([], f, indent=2)
+
+        records = [{'id': '01', 'details': {'note': 'first'}}, {'id': '02', 'tags': []}]
+        assert self._append_and_read(test_file, records) == records
+
+    def test_append_data_existing_records(self, test_data_dir):
+        """Test appending keeps existing records and order"""
+        test_file = os.path.join(test_data_dir, 'append_test.json')
+        existing = [{'id': '01', 'items': [1, 2]}]
+        with open(test_file, 'w') as f:
+            json.dump(existing, f, indent=2)
+            f.write('\n')
+
+        new_record = {'id': '02', 'name': 'Appended'}
+        assert self._append_and_read(test_file, [new_record]) == existing + [new_record]
+
+    @pytest.mark.parametrize('pretty', [True, False])
+    def test_append_data_after_save(self, test_data_dir, monkeypatch, pretty):
+        """Test appending to a file written by save_data in either layout"""
+        from app.utils.database.base import save_data
+
+        import app.utils.database.base as base_module
+        monkeypatch.setattr(base_module, 'PRETTY_JSON', pretty)
+
+        test_file = os.path.join(test_data_dir, 'append_test.json')
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['append_test'] = test_file
+        try:
+            assert save_data('append_test', []) is True
+        finally:
+            base_module.DB_FILES = original_files
+
+        records = [{'id': '01', 'details': {'note': 'first'}}, {'id': '02'}]
+        assert self._append_and_read(test_file, records) == records
+
+    def test_append_data_missing_file(self, test_data_dir):
+        """Test appending creates the file when it does not exist"""
+        test_file = os.path.join(test_data_dir, 'append_test.json')
+
+        records = [{'id': '01'}]
+        assert self._append_and_read(test_file, records) == records
+
+    def test_append_data_refuses_unreadable_file(self, test_data_dir, monkeypatch):
+        """Test that a file that is not a JSON array is left alone instead of replaced"""
+        from app.utils.database.base import append_data
+
+        import app.utils.database.base as base_module
+        test_file = os.path.join(test_data_dir, 'append_test.json')
+        monkeypatch.setitem(base_module.DB_FILES, 'append_test', test_file)
+
+        for contents in ('[{"id": "01"}', '[{"id": "01"}]{"id": "02"}', '{"id": "01"}'):
+            with open(test_file, 'w') as f:
+                f.write(contents)
+            assert append_data('append_test', {'id': '03'}) is False
+            with open(test_file, 'r') as f:
+                assert f.read() == contents
+
+    @pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+    def test_append_data_concurrent_processes_and_threads(self, test_data_dir, monkeypatch):
+        """Test that appends from several worker processes and threads all land"""
+        import multiprocessing
+        import threading
+        from app.utils.database.base import append_data
+
+        import app.utils.database.base as base_module
+        test_file = os.path.join(test_data_dir, 'append_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([], f)
+        monkeypatch.setitem(base_module.DB_FILES, 'append_test', test_file)
+
+        def append_many(prefix):
+            for i in range(300):
+                assert append_data('append_test', {'id': f'{prefix}-{i}', 'pad': 'x' * 200})
+
+        def worker(prefix):
+            threads = [threading.Thread(target=append_many, args=(f'{prefix}{t}',)) for t in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=worker, args=(f'p{n}',)) for n in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert all(process.exitcode == 0 for process in processes)
+
+        with open(test_file, 'r') as f:
+            records = json.load(f)
+        assert len(records) == 4 * 3 * 300
+        assert len({record['id'] for record in records}) == len(records)
+
+
+class TestLoadDataCached:
+    """Test suite for load_data_cached function"""
+
+    def test_load_data_cached_reuses_parsed_table(self, test_data_dir):
+        """Test that unchanged files are parsed once and changes are picked up"""
+        from app.utils.database.base import load_data_cached, save_data
+
+        test_file = os.path.join(test_data_dir, 'cached_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([{'id': '01'}], f)
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['cached_test'] = test_file
+
+        try:
+            first = load_data_cached('cached_test')
+            assert first == [{'id': '01'}]
+            assert load_data_cached('cached_test') is first
+
+            save_data('cached_test', [{'id': '01'}, {'id': '02'}])
+            assert load_data_cached('cached_test') == [{'id': '01'}, {'id': '02'}]
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_get_index_and_get_by_id(self, test_data_dir):
+        """Test field indexes over a cached table, first match winning"""
+        from app.utils.database.base import get_index, get_by_id
+
+        test_file = os.path.join(test_data_dir, 'cached_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([
+                {'id': '01', 'department_id': '01'},
+                {'id': '02', 'department_id': '02'},
+                {'id': '03', 'department_id': '02'}
+            ], f)
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['cached_test'] = test_file
+
+        try:
+            assert get_by_id('cached_test', '02')['department_id'] == '02'
+            assert get_by_id('cached_test', '99') is None
+            assert get_index('cached_test', 'department_id')['02']['id'] == '02'
+            assert get_by_id('nonexistent', '01') is None
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_load_data_cached_missing_file(self):
+        """Test that a missing table loads as an empty list"""
+        from app.utils.database.base import load_data_cached
+
+        assert load_data_cached('nonexistent') == []
+
+
 class TestGenerateID:
     """Test suite for generate_id function"""
 
@@ -246,6 +487,404 @@ class TestGenerateID:
         finally:
             base_module.DB_FILES = original_files
 
+    def test_generate_id_tracks_writes_without_reloading(self, test_data_dir, monkeypatch):
+        """Test that saves and appends keep the max id current without a reload"""
+        from app.utils.database.base import generate_id, save_data, append_data
+
+        test_file = os.path.join(test_data_dir, 'counter_test.json')
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['counter_test'] = test_file
+
+        try:
+            save_data('counter_test', [{'id': '01'}, {'id': '05'}])
+
+            def fail(file_type):
+                raise AssertionError('table reloaded')
+
+            with monkeypatch.context() as m:
+                m.setattr(base_module, 'load_data', fail)
+                assert generate_id('counter_test') == '06'
+                assert generate_id('counter_test') == '06'
+                assert append_data('counter_test', {'id': '06'}) is True
+                assert generate_id('counter_test') == '07'
+
+            # A rewrite from outside the module is picked up
+            with open(test_file, 'w') as f:
+                json.dump([{'id': '01'}, {'id': '02'}, {'id': '12'}], f)
+            assert generate_id('counter_test') == '13'
+        finally:
+            base_module.DB_FILES = original_files
+
+    @pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+    def test_append_history_ids_unique_across_processes(self, test_data_dir, monkeypatch):
+        """Test that worker processes logging at once never hand out the same history id"""
+        import multiprocessing
+        from app.utils.database.base import append_history, generate_id
+
+        import app.utils.database.base as base_module
+        test_file = os.path.join(test_data_dir, 'history_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([], f)
+        monkeypatch.setitem(base_module.DB_FILES, 'history', test_file)
+        # Every process starts with the same cached max id
+        assert generate_id('history') == '01'
+
+        def worker():
+            for _ in range(100):
+                assert append_history({'id': None, 'action': 'LOGIN'})
+
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=worker) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert all(process.exitcode == 0 for process in processes)
+
+        with open(test_file, 'r') as f:
+            ids = sorted(int(entry['id']) for entry in json.load(f))
+        assert ids == list(range(1, 401))
+
+
+class TestNowIso:
+    """Test suite for _now_iso function"""
+
+    def test_now_iso_shared_within_request(self, app):
+        """Test that one request reuses a single timestamp"""
+        from app.utils.database.base import _now_iso
+
+        with app.test_request_context():
+            first = _now_iso()
+            assert _now_iso() == first
+            datetime.fromisoformat(first)
+
+        with app.test_request_context():
+            assert _now_iso() >= first
+
+    def test_now_iso_outside_request(self):
+        """Test that a fresh timestamp is returned outside a request"""
+        from app.utils.database.base import _now_iso
+
+        datetime.fromisoformat(_now_iso())
+
+
+class TestRenumberIDs:
+    """Test suite for renumber_ids function"""
+
+    def test_renumber_ids_closes_gaps_around_protected(self, test_data_dir):
+        """Test that ids are renumbered sequentially, skipping protected ids"""
+        from app.utils.database.base import renumber_ids, load_data
+
+        test_file = os.path.join(test_data_dir, 'renumber_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([{'id': '01'}, {'id': '03'}, {'id': '07'}], f)
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['renumber_test'] = test_file
+
+        try:
+            mapping = renumber_ids('renumber_test', protect_ids=['01'])
+            assert mapping == {'01': '01', '03': '02', '07': '03'}
+            assert [r['id'] for r in load_data('renumber_test')] == ['01', '02', '03']
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_renumber_ids_sequential_data_not_rewritten(self, test_data_dir):
+        """Test that already sequential data is left untouched on disk"""
+        from app.utils.database.base import renumber_ids
+
+        test_file = os.path.join(test_data_dir, 'renumber_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([{'id': '01'}, {'id': '02'}], f)
+        before = os.stat(test_file).st_mtime_ns
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['renumber_test'] = test_file
+
+        try:
+            assert renumber_ids('renumber_test') == {'01': '01', '02': '02'}
+            assert os.stat(test_file).st_mtime_ns == before
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_renumber_ids_saves_supplied_data(self, test_data_dir):
+        """Test that a caller's already-changed list is renumbered and saved in one write"""
+        from app.utils.database.base import renumber_ids, load_data
+
+        test_file = os.path.join(test_data_dir, 'renumber_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([{'id': '01'}, {'id': '02'}, {'id': '03'}], f)
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['renumber_test'] = test_file
+
+        try:
+            data = load_data('renumber_test')
+            del data[1]
+            assert renumber_ids('renumber_test', data=data) == {'01': '01', '03': '02'}
+            assert load_data('renumber_test') == [{'id': '01'}, {'id': '02'}]
+
+            # Supplied data is saved even when no id changes
+            data = [{'id': '01'}]
+            assert renumber_ids('renumber_test', data=data) == {'01': '01'}
+            assert load_data('renumber_test') == [{'id': '01'}]
+        finally:
+            base_module.DB_FILES = original_files
+
+
+class TestBulkOperation:
+    """Test suite for renumber_after_delete and bulk_operation"""
+
+    def test_renumbering_deferred_until_block_exits(self, test_data_dir):
+        """Test that deletes inside bulk_operation renumber and cascade once on exit"""
+        from app.utils.database.base import (
+            bulk_operation, delete_records, load_data, renumber_after_delete
+        )
+
+        test_file = os.path.join(test_data_dir, 'bulk_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([{'id': '01'}, {'id': '02'}, {'id': '03'}, {'id': '04'}], f)
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['bulk_test'] = test_file
+
+        mappings = []
+        try:
+            with bulk_operation():
+                for record_id in ('02', '03'):
+                    delete_records('bulk_test', [record_id])
+                    renumber_after_delete('bulk_test', cascade=mappings.append)
+                with bulk_operation():
+                    pass
+                assert mappings == []
+                assert [r['id'] for r in load_data('bulk_test')] == ['01', '04']
+
+            assert mappings == [{'01': '01', '04': '02'}]
+            assert [r['id'] for r in load_data('bulk_test')] == ['01', '02']
+        finally:
+            base_module.DB_FILES = original_files
+
+
+class TestBatchedWrites:
+    """Test suite for batched_writes"""
+
+    def test_writes_held_until_block_exits(self, test_data_dir):
+        """Test that saves inside the block are visible to reads but written once on exit"""
+        from app.utils.database.base import (
+            batched_writes, save_data, append_data, load_data, generate_id, renumber_ids
+        )
+
+        test_file = os.path.join(test_data_dir, 'batch_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([{'id': '01'}, {'id': '02'}, {'id': '03'}], f)
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['batch_test'] = test_file
+
+        try:
+            with batched_writes():
+                save_data('batch_test', [{'id': '01'}, {'id': '03'}])
+                with batched_writes():
+                    renumber_ids('batch_test')
+                assert generate_id('batch_test') == '03'
+                append_data('batch_test', {'id': '03'})
+
+                assert [r['id'] for r in load_data('batch_test')] == ['01', '02', '03']
+                with open(test_file) as f:
+                    assert [r['id'] for r in json.load(f)] == ['01', '02', '03']
+
+            with open(test_file) as f:
+                assert json.load(f) == [{'id': '01'}, {'id': '02'}, {'id': '03'}]
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_writes_dropped_when_block_raises(self, test_data_dir):
+        """Test that an exception inside the block leaves the files untouched"""
+        from app.utils.database.base import batched_writes, save_data, load_data
+
+        test_file = os.path.join(test_data_dir, 'batch_test.json')
+        with open(test_file, 'w') as f:
+            json.dump([{'id': '01'}], f)
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['batch_test'] = test_file
+
+        try:
+            with pytest.raises(RuntimeError):
+                with batched_writes():
+                    save_data('batch_test', [])
+                    raise RuntimeError('failed half way')
+
+            assert load_data('batch_test') == [{'id': '01'}]
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_appends_held_but_history_written_through(self, test_data_dir):
+        """Test that appends are held like saves, while history entries are written at once"""
+        from app.utils.database.base import batched_writes, append_data, append_history, load_data
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['batch_test'] = os.path.join(test_data_dir, 'batch_test.json')
+        base_module.DB_FILES['history'] = os.path.join(test_data_dir, 'history.json')
+        for file_type in ('batch_test', 'history'):
+            with open(base_module.DB_FILES[file_type], 'w') as f:
+                json.dump([{'id': '01'}], f)
+
+        try:
+            with pytest.raises(RuntimeError):
+                with batched_writes():
+                    append_data('batch_test', {'id': '02'})
+                    append_history({'id': None, 'action': 'DELETE'})
+                    assert [r['id'] for r in load_data('batch_test')] == ['01', '02']
+                    raise RuntimeError('failed half way')
+
+            assert load_data('batch_test') == [{'id': '01'}]
+            assert [h['id'] for h in load_data('history')] == ['01', '02']
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_failed_flush_raises(self, test_data_dir):
+        """Test that a held table that cannot be written is reported"""
+        from app.utils.database.base import batched_writes, save_data
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['batch_test'] = os.path.join(test_data_dir, 'batch_test.json')
+        base_module.DB_FILES['missing_dir'] = os.path.join(test_data_dir, 'missing', 'table.json')
+
+        try:
+            with pytest.raises(OSError, match='missing_dir'):
+                with batched_writes():
+                    save_data('batch_test', [{'id': '01'}])
+                    save_data('missing_dir', [{'id': '01'}])
+
+            with open(base_module.DB_FILES['batch_test']) as f:
+                assert json.load(f) == [{'id': '01'}]
+        finally:
+            base_module.DB_FILES = original_files
+
+
+class TestGzipTables:
+    """Test suite for gzip-compressed table files"""
+
+    def test_uncompressed_file_migrated_on_save(self, test_data_dir):
+        """Test that a .json.gz table reads its old .json file until the next save"""
+        import gzip
+        from app.utils.database.base import load_data, load_data_cached, save_data, append_data
+
+        plain_file = os.path.join(test_data_dir, 'gzip_test.json')
+        with open(plain_file, 'w') as f:
+            json.dump([{'id': '01'}], f)
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['gzip_test'] = plain_file + '.gz'
+
+        try:
+            assert load_data('gzip_test') == [{'id': '01'}]
+            assert load_data_cached('gzip_test') == [{'id': '01'}]
+
+            assert save_data('gzip_test', [{'id': '01'}, {'id': '02'}]) is True
+            assert append_data('gzip_test', {'id': '03'}) is True
+
+            with gzip.open(plain_file + '.gz', 'rb') as f:
+                assert [r['id'] for r in json.load(f)] == ['01', '02', '03']
+            assert [r['id'] for r in load_data_cached('gzip_test')] == ['01', '02', '03']
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_contents_detected_by_magic_bytes(self, test_data_dir):
+        """Test that plain JSON at a .gz path is read, and a corrupt gzip file raises"""
+        import gzip
+        from app.utils.database.base import load_data, save_data
+
+        gz_file = os.path.join(test_data_dir, 'gzip_test.json.gz')
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+        base_module.DB_FILES['gzip_test'] = gz_file
+
+        try:
+            save_data('gzip_test', [{'id': '01'}])
+
+            # e.g. a restore moving a plain JSON file into place
+            with open(gz_file, 'w') as f:
+                json.dump([{'id': '01'}, {'id': '02'}], f)
+            assert [r['id'] for r in load_data('gzip_test')] == ['01', '02']
+
+            with open(gz_file, 'wb') as f:
+                f.write(gzip.compress(b'[{"id": "01"}]')[:12])
+            with pytest.raises((gzip.BadGzipFile, EOFError)):
+                load_data('gzip_test')
+        finally:
+            base_module.DB_FILES = original_files
+
+
+class TestCascadeReferences:
+    """Test suite for cascade_references function"""
+
+    def _use_tables(self, temp_dir, tables):
+        import app.utils.database.base as base_module
+        for table, records in tables.items():
+            path = os.path.join(temp_dir, f'{table}.json')
+            with open(path, 'w') as f:
+                json.dump(records, f)
+            base_module.DB_FILES[table] = path
+
+    def test_cascade_medicine_references(self, temp_dir):
+        """Test remapping inventory keys and medicine lines, skipping untouched tables"""
+        from app.utils.database.base import cascade_references, load_data
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            self._use_tables(temp_dir, {
+                'stores': [{'id': '01', 'inventory': {'01': 5, '03': 2}}],
+                'purchases': [{'id': '01', 'medicines': [{'medicine_id': '03'}, {'medicine_id': '01'}]}],
+                'consumption': [{'id': '01', 'medicines': [{'medicine_id': '01'}]}],
+                'transfers': []
+            })
+            consumption_mtime = os.stat(base_module.DB_FILES['consumption']).st_mtime_ns
+
+            cascade_references('medicines', {'01': '01', '03': '02'})
+
+            assert load_data('stores')[0]['inventory'] == {'01': 5, '02': 2}
+            assert load_data('purchases')[0]['medicines'] == [{'medicine_id': '02'}, {'medicine_id': '01'}]
+            assert os.stat(base_module.DB_FILES['consumption']).st_mtime_ns == consumption_mtime
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_cascade_user_references(self, temp_dir):
+        """Test that history entity_id is only remapped for user entities"""
+        from app.utils.database.base import cascade_references, load_data
+
+        import app.utils.database.base as base_module
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            self._use_tables(temp_dir, {'history': [
+                {'user_id': '03', 'entity_type': 'user', 'entity_id': '03'},
+                {'user_id': '01', 'entity_type': 'medicine', 'entity_id': '03'}
+            ]})
+
+            cascade_references('users', {'03': '02'})
+
+            assert load_data('history') == [
+                {'user_id': '02', 'entity_type': 'user', 'entity_id': '02'},
+                {'user_id': '01', 'entity_type': 'medicine', 'entity_id': '03'}
+            ]
+        finally:
+            base_module.DB_FILES = original_files
+
 
 class TestInitDatabase:
     """Test suite for init_database function"""
@@ -314,6 +953,39 @@ class TestInitDatabase:
             base_module.DATA_DIR = original_data_dir
             base_module.DB_FILES = original_files
 
+    def test_init_database_skips_unchanged_main_entity_check(self, temp_dir, monkeypatch):
+        """Test that the main entity check only reruns when its tables change"""
+        from app.utils.database.base import init_database
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            base_module.DB_FILES = {
+                key: os.path.join(temp_dir, f'{key}.json') for key in original_files
+            }
+
+            init_database()
+
+            calls = []
+            monkeypatch.setattr(base_module, 'ensure_main_entities', lambda: calls.append(1))
+
+            init_database()
+            assert calls == []
+
+            init_database(force=True)
+            assert calls == [1]
+
+            with open(base_module.DB_FILES['departments'], 'w') as f:
+                json.dump([], f)
+            init_database()
+            assert calls == [1, 1]
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
 
 class TestEnsureMainEntities:
     """Test suite for ensure_main_entities function"""
@@ -140,6 +140,167 @@ class TestUserRepository:
             base_module.DATA_DIR = original_data_dir
             base_module.DB_FILES = original_files
 
+    def test_user_lookups_follow_updates(self, temp_dir):
+        """Test that cached id and username lookups see saved changes"""
+        from app.utils.database.users import get_user_by_id, get_user_by_username
+        from app.utils.database.base import save_data
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            test_file = os.path.join(temp_dir, 'users.json')
+            with open(test_file, 'w') as f:
+                json.dump([{'id': '01', 'username': 'admin', 'role': 'admin'}], f)
+            base_module.DB_FILES['users'] = test_file
+
+            assert get_user_by_username('admin')['id'] == '01'
+
+            save_data('users', [{'id': '01', 'username': 'root', 'role': 'admin'}])
+            assert get_user_by_username('admin') is None
+            assert get_user_by_username('root')['id'] == '01'
+            assert get_user_by_id('01')['username'] == 'root'
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
+    def test_validate_user_hashes_for_unknown_username(self, temp_dir, monkeypatch):
+        """Test that an unknown username still costs a password hash check"""
+        import app.utils.database.users as users_module
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        # Werkzeug hashing, whether or not argon2-cffi is installed
+        monkeypatch.setattr(users_module, '_argon2', None)
+        monkeypatch.setattr(users_module, '_dummy_password_hash', None)
+
+        checked = []
+        real_check = users_module.check_password_hash
+        monkeypatch.setattr(users_module, 'check_password_hash',
+                            lambda pwhash, password: checked.append(password) or real_check(pwhash, password))
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            test_file = os.path.join(temp_dir, 'users.json')
+            with open(test_file, 'w') as f:
+                json.dump([{'id': '01', 'username': 'legacy', 'password': 'plain-secret'}], f)
+            base_module.DB_FILES['users'] = test_file
+            base_module.DB_FILES['history'] = os.path.join(temp_dir, 'history.json')
+
+            assert users_module.validate_user('nobody', 'guess') is None
+            assert checked == ['guess']
+
+            # Empty and oversized passwords are rejected without hashing
+            assert users_module.validate_user('legacy', '') is None
+            assert users_module.validate_user('legacy', 'x' * 2000) is None
+            assert checked == ['guess']
+
+            assert users_module.validate_user('legacy', 'plain-secret')['id'] == '01'
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
+    def test_validate_user_upgrades_werkzeug_hash(self, app, temp_dir, monkeypatch):
+        """Test that a successful login replaces a PBKDF2 hash when Argon2 is available"""
+        import app.utils.database.users as users_module
+        import app.utils.database.base as base_module
+        from werkzeug.security import generate_password_hash
+
+        class FakeArgon2:
+            def hash(self, password):
+                return '$argon2id$' + password
+
+            def verify(self, password_hash, password):
+                return password_hash == '$argon2id$' + password
+
+            def check_needs_rehash(self, password_hash):
+                return False
+
+        monkeypatch.setattr(users_module, '_argon2', FakeArgon2())
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DB_FILES['users'] = os.path.join(temp_dir, 'users.json')
+            base_module.DB_FILES['history'] = os.path.join(temp_dir, 'history.json')
+            base_module.save_data('users', [{
+                'id': '01', 'username': 'nurse',
+                'password': generate_password_hash('Secret1!', method='pbkdf2:sha256:1000')
+            }])
+
+            with app.test_request_context():
+                assert users_module.validate_user('nurse', 'Secret1!')['id'] == '01'
+                assert users_module.get_user_by_id('01')['password'] == '$argon2id$Secret1!'
+
+                assert users_module.validate_user('nurse', 'Secret1!')['id'] == '01'
+                assert users_module.validate_user('nurse', 'wrong') is None
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_validate_password_strength(self):
+        """Test each character class requirement and the bonus points"""
+        from app.utils.database.users import validate_password_strength
+
+        result = validate_password_strength('Passw0rd!xyzQ')
+        assert result['is_valid'] is True
+        assert result['score'] == 120
+        assert all(result['requirements_met'].values())
+
+        result = validate_password_strength('abcdefgh')
+        assert result['is_valid'] is False
+        assert result['requirements_met'] == {
+            'length': True, 'uppercase': False, 'lowercase': True,
+            'digit': False, 'special': False
+        }
+        assert len(result['feedback']) == 3
+
+    def test_generate_secure_password_covers_each_set(self):
+        """Test generated passwords have the requested length and pass validation"""
+        from app.utils.database.users import generate_secure_password, validate_password_strength
+
+        for _ in range(50):
+            password = generate_secure_password()
+            assert len(password) == 12
+            assert validate_password_strength(password)['is_valid'] is True
+
+        assert len(generate_secure_password(2)) == 4
+
+    def test_save_user_keeps_existing_hash(self, app, temp_dir, monkeypatch):
+        """Test that restored password hashes are neither validated nor rehashed"""
+        import app.utils.database.users as users_module
+        import app.utils.database.base as base_module
+        from werkzeug.security import generate_password_hash, check_password_hash
+
+        original_files = base_module.DB_FILES.copy()
+        password_hash = generate_password_hash('weak', method='pbkdf2:sha256:1000')
+        hashed = []
+        monkeypatch.setattr(users_module, 'generate_password_hash', hashed.append)
+
+        try:
+            base_module.DB_FILES['users'] = os.path.join(temp_dir, 'users.json')
+            base_module.DB_FILES['history'] = os.path.join(temp_dir, 'history.json')
+
+            with app.test_request_context():
+                user_id = users_module.save_user({'username': 'restored', 'password': password_hash})
+
+            assert hashed == []
+            saved = users_module.get_user_by_id(user_id)
+            assert saved['password'] == password_hash
+            assert check_password_hash(saved['password'], 'weak')
+        finally:
+            base_module.DB_FILES = original_files
+
+    def test_save_user_rejects_invalid_usernames(self):
+        """Test the username character rules before anything is saved"""
+        from app.utils.database.users import save_user
+
+        for username in ('ab c', 'ab!', '___', '-_-'):
+            with pytest.raises(ValueError, match='letters, numbers'):
+                save_user({'username': username, 'password': 'Passw0rd!xyz'})
+
     def test_create_user(self, temp_dir):
         """Test creating a new user"""
         from app.utils.database.users import create_user
@@ -277,6 +438,39 @@ class TestUserRepository:
             base_module.DATA_DIR = original_data_dir
             base_module.DB_FILES = original_files
 
+    def test_delete_department_users(self, temp_dir):
+        """Test that every user of a department is deleted before renumbering"""
+        from app.utils.database.users import delete_department_users
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            test_file = os.path.join(temp_dir, 'users.json')
+            with open(test_file, 'w') as f:
+                json.dump([
+                    {'id': '01', 'username': 'admin', 'role': 'admin'},
+                    {'id': '02', 'username': 'pharmacy', 'role': 'department_user', 'department_id': '01'},
+                    {'id': '03', 'username': 'ward_a', 'role': 'department_user', 'department_id': '02'},
+                    {'id': '04', 'username': 'ward_b', 'role': 'department_user', 'department_id': '03'},
+                    {'id': '05', 'username': 'ward_a2', 'role': 'department_user', 'department_id': '02'}
+                ], f)
+            base_module.DB_FILES['users'] = test_file
+            base_module.DB_FILES['history'] = os.path.join(temp_dir, 'history.json')
+
+            assert delete_department_users('02') == ['ward_a', 'ward_a2']
+
+            with open(test_file, 'r') as f:
+                users = json.load(f)
+            assert [(u['id'], u['username']) for u in users] == [
+                ('01', 'admin'), ('02', 'pharmacy'), ('03', 'ward_b')
+            ]
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
 
 class TestMedicineRepository:
     """Test suite for Medicine repository functions"""
@@ -621,6 +815,37 @@ class TestStoreRepository:
             base_module.DATA_DIR = original_data_dir
             base_module.DB_FILES = original_files
 
+    def test_update_main_store_inventory(self, temp_dir):
+        """Test adding and subtracting purchase lines, including repeated medicines"""
+        from app.utils.database.stores import update_main_store_inventory, get_stores
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            test_file = os.path.join(temp_dir, 'stores.json')
+            with open(test_file, 'w') as f:
+                json.dump([{'id': '01', 'name': 'Main Store', 'inventory': {'01': 5}}], f)
+            base_module.DB_FILES['stores'] = test_file
+
+            update_main_store_inventory([
+                {'medicine_id': '01', 'quantity': 2},
+                {'medicine_id': '02', 'quantity': 4},
+                {'medicine_id': '01', 'quantity': '3'}
+            ], 'add')
+            assert get_stores()[0]['inventory'] == {'01': 10, '02': 4}
+
+            update_main_store_inventory([
+                {'medicine_id': '01', 'quantity': 6},
+                {'medicine_id': '02', 'quantity': 9}
+            ], 'subtract')
+            assert get_stores()[0]['inventory'] == {'01': 4, '02': 0}
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
 
 class TestPatientRepository:
     """Test suite for Patient repository functions"""
@@ -678,6 +903,39 @@ class TestPatientRepository:
             base_module.DATA_DIR = original_data_dir
             base_module.DB_FILES = original_files
 
+    def test_delete_patients_with_consumption(self, temp_dir):
+        """Test bulk deleting patients removes their consumption and renumbers"""
+        from app.utils.database.patients import delete_patients
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            patients_file = os.path.join(temp_dir, 'patients.json')
+            consumption_file = os.path.join(temp_dir, 'consumption.json')
+            with open(patients_file, 'w') as f:
+                json.dump([{'id': '01'}, {'id': '02'}, {'id': '03'}], f)
+            with open(consumption_file, 'w') as f:
+                json.dump([
+                    {'id': '01', 'patient_id': '01'},
+                    {'id': '02', 'patient_id': '02'},
+                    {'id': '03', 'patient_id': '03'}
+                ], f)
+            base_module.DB_FILES['patients'] = patients_file
+            base_module.DB_FILES['consumption'] = consumption_file
+
+            assert delete_patients(['01', '02']) == 2
+
+            with open(patients_file) as f:
+                assert json.load(f) == [{'id': '01'}]
+            with open(consumption_file) as f:
+                assert json.load(f) == [{'id': '03', 'patient_id': '01'}]
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
 
 class TestPurchaseRepository:
     """Test suite for Purchase repository functions"""
@@ -735,6 +993,65 @@ class TestPurchaseRepository:
             base_module.DATA_DIR = original_data_dir
             base_module.DB_FILES = original_files
 
+    def test_delete_purchases_in_bulk_operation(self, temp_dir):
+        """Test that ids stay stable until a bulk delete renumbers once"""
+        from app.utils.database.purchases import delete_purchase, get_purchases
+        from app.utils.database.base import bulk_operation
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            test_file = os.path.join(temp_dir, 'purchases.json')
+            with open(test_file, 'w') as f:
+                json.dump([{'id': f'0{i}', 'supplier_id': f'0{i}'} for i in range(1, 5)], f)
+            base_module.DB_FILES['purchases'] = test_file
+
+            with bulk_operation():
+                delete_purchase('02')
+                delete_purchase('03')
+
+            assert [(p['id'], p['supplier_id']) for p in get_purchases()] == [
+                ('01', '01'), ('02', '04')
+            ]
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
+    def test_save_purchase_appends_without_rewriting(self, temp_dir, monkeypatch):
+        """Test that a new purchase is appended and only the stores table is saved"""
+        from app.utils.database.purchases import save_purchase, get_purchases
+        from app.utils.database.stores import get_stores
+
+        import app.utils.database.base as base_module
+        import app.utils.database.stores as stores_module
+        monkeypatch.setattr(base_module, 'DATA_DIR', temp_dir)
+        for table, records in (('purchases', [{'id': '01'}]),
+                               ('stores', [{'id': '01', 'name': 'Main Store', 'inventory': {}}])):
+            test_file = os.path.join(temp_dir, f'{table}.json')
+            with open(test_file, 'w') as f:
+                json.dump(records, f)
+            monkeypatch.setitem(base_module.DB_FILES, table, test_file)
+
+        saved = []
+        real_save_data = base_module.save_data
+
+        def recording_save_data(file_type, data):
+            saved.append(file_type)
+            return real_save_data(file_type, data)
+
+        monkeypatch.setattr(stores_module, 'save_data', recording_save_data)
+        monkeypatch.setattr(base_module, 'save_data', recording_save_data)
+
+        purchase_id = save_purchase({'medicines': [{'medicine_id': '03', 'quantity': 4}]})
+
+        assert purchase_id == '02'
+        assert [p['id'] for p in get_purchases()] == ['01', '02']
+        assert get_stores()[0]['inventory'] == {'03': 4}
+        assert saved == ['stores']
+
 
 class TestConsumptionRepository:
     """Test suite for Consumption repository functions"""
@@ -792,6 +1109,84 @@ class TestConsumptionRepository:
             base_module.DATA_DIR = original_data_dir
             base_module.DB_FILES = original_files
 
+    def test_stock_helpers_per_department_and_total(self, temp_dir):
+        """Test low stock, available medicines and validation use store inventories"""
+        from app.utils.database.consumption import (
+            get_low_stock_medicines, get_available_medicines_for_consumption,
+            validate_consumption_stock
+        )
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            medicines_file = os.path.join(temp_dir, 'medicines.json')
+            stores_file = os.path.join(temp_dir, 'stores.json')
+            with open(medicines_file, 'w') as f:
+                json.dump([
+                    {'id': '01', 'name': 'Paracetamol', 'low_stock_limit': 10},
+                    {'id': '02', 'name': 'Ibuprofen', 'low_stock_limit': 10}
+                ], f)
+            with open(stores_file, 'w') as f:
+                json.dump([
+                    {'id': '01', 'department_id': '01', 'inventory': {'01': 8, '02': 20}},
+                    {'id': '02', 'department_id': '02', 'inventory': {'01': 5}}
+                ], f)
+            base_module.DB_FILES['medicines'] = medicines_file
+            base_module.DB_FILES['stores'] = stores_file
+
+            low_stock = get_low_stock_medicines('01')
+            assert [(m['medicine']['id'], m['current_stock']) for m in low_stock] == [('01', 8)]
+            assert get_low_stock_medicines() == []
+
+            available = get_available_medicines_for_consumption('02')
+            assert [(m['id'], m['available_stock']) for m in available] == [('01', 5)]
+
+            result = validate_consumption_stock(
+                [{'medicine_id': '01', 'quantity': 10}, {'medicine_id': '02', 'quantity': 1}], '02'
+            )
+            assert result['valid'] is False
+            assert result['errors'] == [
+                'Paracetamol: Requested 10, but only 5 available',
+                'Ibuprofen: Requested 1, but only 0 available'
+            ]
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
+    def test_get_medicine_stock_totals_follow_store_updates(self, temp_dir):
+        """Test that cached all-stores totals are rebuilt when stores change"""
+        from app.utils.database.consumption import get_medicine_stock, update_store_inventory
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            stores_file = os.path.join(temp_dir, 'stores.json')
+            with open(stores_file, 'w') as f:
+                json.dump([
+                    {'id': '01', 'department_id': '01', 'inventory': {'01': 8, '02': 20}},
+                    {'id': '02', 'department_id': '02', 'inventory': {'01': 5}}
+                ], f)
+            base_module.DB_FILES['stores'] = stores_file
+
+            assert get_medicine_stock('01') == 13
+            assert get_medicine_stock('02') == 20
+            assert get_medicine_stock('99') == 0
+            assert get_medicine_stock('01', '02') == 5
+
+            update_store_inventory('02', [{'medicine_id': '01', 'quantity': 3}], 'subtract')
+
+            assert get_medicine_stock('01') == 10
+            assert get_medicine_stock('01', '02') == 2
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
 
 class TestTransferRepository:
     """Test suite for Transfer repository functions"""
@@ -848,3 +1243,116 @@ class TestTransferRepository:
         finally:
             base_module.DATA_DIR = original_data_dir
             base_module.DB_FILES = original_files
+
+    def test_save_transfer_appends(self, temp_dir):
+        """Test that a new transfer is appended after the existing ones"""
+        from app.utils.database.transfers import save_transfer
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            test_file = os.path.join(temp_dir, 'transfers.json')
+            with open(test_file, 'w') as f:
+                json.dump([{'id': '01', 'source_store_id': '01'}], f, indent=2)
+            base_module.DB_FILES['transfers'] = test_file
+
+            transfer_id = save_transfer({'source_store_id': '02', 'medicines': []})
+            assert transfer_id == '02'
+
+            with open(test_file) as f:
+                saved = json.load(f)
+            assert [t['id'] for t in saved] == ['01', '02']
+            assert saved[1]['source_store_id'] == '02'
+            assert 'created_at' in saved[1]
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
+    def test_process_inventory_transfer(self, temp_dir):
+        """Test moving stock between stores, with repeated lines checked as a total"""
+        from app.utils.database.transfers import process_inventory_transfer
+        from app.utils.database.stores import get_stores
+
+        import app.utils.database.base as base_module
+        original_data_dir = base_module.DATA_DIR
+        original_files = base_module.DB_FILES.copy()
+
+        try:
+            base_module.DATA_DIR = temp_dir
+            stores_file = os.path.join(temp_dir, 'stores.json')
+            medicines_file = os.path.join(temp_dir, 'medicines.json')
+            with open(stores_file, 'w') as f:
+                json.dump([
+                    {'id': '01', 'inventory': {'01': 10}},
+                    {'id': '02'}
+                ], f)
+            with open(medicines_file, 'w') as f:
+                json.dump([{'id': '01', 'name': 'Paracetamol'}], f)
+            base_module.DB_FILES['stores'] = stores_file
+            base_module.DB_FILES['medicines'] = medicines_file
+
+            success, message = process_inventory_transfer('01', '02', [
+                {'medicine_id': '01', 'quantity': '6'},
+                {'medicine_id': '01', 'quantity': '6'}
+            ])
+            assert success is False
+            assert message == 'Insufficient stock for Paracetamol. Available: 10, Requested: 12'
+
+            success, _ = process_inventory_transfer('01', '02', [
+                {'medicine_id': '01', 'quantity': '4'},
+                {'medicine_id': '01', 'quantity': 3}
+            ])
+            assert success is True
+            assert [s['inventory'] for s in get_stores()] == [{'01': 3}, {'01': 7}]
+
+            # An empty transfer leaves the stores file untouched
+            modified = os.stat(stores_file).st_mtime_ns
+            assert process_inventory_transfer('01', '02', []) == (True, 'No medicines to transfer')
+            assert os.stat(stores_file).st_mtime_ns == modified
+        finally:
+            base_module.DATA_DIR = original_data_dir
+            base_module.DB_FILES = original_files
+
+
+class TestQueryBuilder:
+    """Test suite for QueryBuilder"""
+
+    RECORDS = [
+        {'id': '01', 'name': 'Paracetamol', 'form': 'Tablet', 'tags': ['pain']},
+        {'id': '02', 'name': 'Ibuprofen', 'form': 'Tablet', 'tags': []},
+        {'id': '03', 'name': 'Amoxicillin', 'form': 'Capsule'},
+        {'id': '04', 'name': "O'Brien's Syrup", 'form': 'Syrup'}
+    ]
+
+    def test_chained_filters(self):
+        """Test that chained filters all apply to each record"""
+        from app.utils.database.repository import QueryBuilder
+
+        result = (
+            QueryBuilder(self.RECORDS)
+            .where('form', 'Tablet')
+            .where_in('id', ['01', '02', '03'])
+            .where_contains('name', 'PARA')
+            .execute()
+        )
+        assert [r['id'] for r in result] == ['01']
+
+    def test_where_in_with_unhashable_values(self):
+        """Test where_in over unhashable record values and unhashable filter values"""
+        from app.utils.database.repository import QueryBuilder
+
+        assert [r['id'] for r in QueryBuilder(self.RECORDS).where_in('tags', ['pain']).execute()] == []
+        assert [r['id'] for r in QueryBuilder(self.RECORDS).where_in('tags', [[]]).execute()] == ['02']
+
+    def test_values_and_fields_are_not_source_code(self):
+        """Test that quotes in fields and values are matched literally"""
+        from app.utils.database.repository import QueryBuilder
+
+        result = QueryBuilder(self.RECORDS).where('name', "O'Brien's Syrup").execute()
+        assert [r['id'] for r in result] == ['04']
+        assert QueryBuilder(self.RECORDS).where("name') or ('x", 'x').execute() == []
+        with pytest.raises(TypeError):
+            QueryBuilder(self.RECORDS).where(1, 'x')
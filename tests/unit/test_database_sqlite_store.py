@@ -0,0 +1,112 @@
+"""
+Unit tests for SQLite-backed tables
+"""
+
+import pytest
+import json
+import os
+
+# Mark all tests in this module as unit tests
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def sqlite_tables(temp_dir, monkeypatch):
+    """Keep consumption and history in SQLite under a temporary data directory"""
+    import app.utils.database.base as base_module
+    from app.utils.database import sqlite_store
+
+    original_files = base_module.DB_FILES.copy()
+    for file_type in ('consumption', 'history'):
+        base_module.DB_FILES[file_type] = os.path.join(temp_dir, f'{file_type}.json')
+    monkeypatch.setattr(base_module, 'DATA_DIR', temp_dir)
+    monkeypatch.setattr(base_module, 'SQLITE_TABLES', frozenset({'consumption', 'history'}))
+
+    yield temp_dir
+
+    sqlite_store.close_all()
+    base_module._sqlite_imported.clear()
+    base_module._table_cache.clear()
+    base_module._max_ids.clear()
+    base_module.DB_FILES = original_files
+
+
+class TestSQLiteTables:
+    """Test suite for tables kept in SQLite"""
+
+    def test_json_file_imported_on_first_use(self, sqlite_tables):
+        """Test that an existing JSON table is copied into the database once"""
+        from app.utils.database.base import load_data
+
+        json_file = os.path.join(sqlite_tables, 'consumption.json')
+        with open(json_file, 'w') as f:
+            json.dump([{'id': '01', 'patient_id': '02'}, {'id': '02', 'patient_id': '01'}], f)
+
+        assert load_data('consumption') == [
+            {'id': '01', 'patient_id': '02'}, {'id': '02', 'patient_id': '01'}
+        ]
+
+        # Later changes to the JSON file are not picked up
+        with open(json_file, 'w') as f:
+            json.dump([], f)
+        assert [c['id'] for c in load_data('consumption')] == ['01', '02']
+        assert os.path.exists(os.path.join(sqlite_tables, 'app.db'))
+
+    def test_save_append_and_delete_keep_order(self, sqlite_tables):
+        """Test writes through save_data, append_data and delete_records"""
+        from app.utils.database.base import (
+            load_data, save_data, append_data, delete_records, generate_id
+        )
+
+        assert save_data('consumption', [{'id': '01'}, {'id': '02'}]) is True
+        assert append_data('consumption', {'id': '03', 'medicines': [{'medicine_id': '01'}]}) is True
+        assert generate_id('consumption') == '04'
+
+        assert delete_records('consumption', ['02', '99']) == 1
+        assert load_data('consumption') == [
+            {'id': '01'}, {'id': '03', 'medicines': [{'medicine_id': '01'}]}
+        ]
+
+        assert save_data('consumption', [{'id': '01'}, {'id': '02'}]) is True
+        assert [c['id'] for c in load_data('consumption')] == ['01', '02']
+
+    def test_cached_reads_follow_writes(self, sqlite_tables):
+        """Test that load_data_cached is invalidated by database writes"""
+        from app.utils.database.base import load_data_cached, append_data, get_by_id
+
+        assert load_data_cached('history') == []
+        append_data('history', {'id': '01', 'action': 'LOGIN'})
+        assert get_by_id('history', '01') == {'id': '01', 'action': 'LOGIN'}
+
+    def test_append_history_ids(self, sqlite_tables):
+        """Test that history entries get sequential ids from the database"""
+        from app.utils.database.base import log_history, load_data
+
+        log_history('DELETE', 'medicines', '05', '01')
+        log_history('DELETE', 'medicines', '06', '01')
+
+        assert [h['id'] for h in load_data('history')] == ['01', '02']
+
+    def test_update_record_rewrites_one_row(self, sqlite_tables):
+        """Test that update_record merges into a single row and keeps its position"""
+        from app.utils.database.base import save_data, update_record, load_data, get_by_id
+        from app.utils.database import sqlite_store
+
+        save_data('consumption', [{'id': '01', 'quantity': 1}, {'id': '02', 'quantity': 2}])
+        assert get_by_id('consumption', '01')['quantity'] == 1
+
+        replaced = []
+        real_replace = sqlite_store.replace
+        sqlite_store.replace = lambda *args: replaced.append(args) or real_replace(*args)
+        try:
+            assert update_record('consumption', '01', {'quantity': 5, 'id': '99'}) is True
+            assert update_record('consumption', '07', {'quantity': 5}) is False
+        finally:
+            sqlite_store.replace = real_replace
+
+        assert replaced == []
+        records = load_data('consumption')
+        assert [r['id'] for r in records] == ['01', '02']
+        assert records[0]['quantity'] == 5 and 'updated_at' in records[0]
+        assert records[1] == {'id': '02', 'quantity': 2}
+        assert get_by_id('consumption', '01')['quantity'] == 5
@@ -38,6 +38,23 @@ class TestAdminRequired:
         assert decorated.__name__ == 'test_function'
         assert decorated.__doc__ == test_function.__doc__
 
+    def test_admin_required_checks_login_then_role(self, app):
+        """Test the redirects for anonymous and non-admin users"""
+        from flask import session
+        from app.utils.decorators import admin_required
+
+        decorated = admin_required(lambda: 'ok')
+
+        with app.test_request_context():
+            assert decorated().location.endswith('/auth/login')
+
+            session['user_id'] = '02'
+            session['role'] = 'department_user'
+            assert '/auth/login' not in decorated().location
+
+            session['role'] = 'admin'
+            assert decorated() == 'ok'
+
 
 class TestDepartmentUserRequired:
     """Test suite for department_user_required decorator"""